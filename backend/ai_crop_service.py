@@ -1,9 +1,27 @@
 import os
+import re
 import json
+import hashlib
+import time
 import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from flask import jsonify
 from dotenv import load_dotenv
+from google.api_core.exceptions import ResourceExhausted
+
+from cache import TTLCache
+from crop_scoring import recommend_crops, season_key
+from compact_prompt import (
+    COMPACT_MAX_OUTPUT_TOKENS, COMPACT_SECTION_TYPES, CROPS_KEY, build_compact_prompt, build_packed_compact_prompt,
+    expand_compact_response, expand_crop, expand_section, packed_labels
+)
+from metrics import GEMINI_CALLS, cache_observer, upstream_call
+from rate_limit import RateLimiter
+from serving import SERVING_MODE, offload, offload_iter
+from singleflight import SingleFlight
+from streaming_json import SectionStreamer
+from tracing import log, span
 
 # Load environment variables from .env file
 load_dotenv()
@@ -11,20 +29,221 @@ load_dotenv()
 # Configure Gemini AI
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+    # gRPC does not cooperate with gevent's monkey-patching; REST does
+    genai.configure(api_key=GEMINI_API_KEY, transport='rest' if SERVING_MODE == 'gevent' else None)
     model = genai.GenerativeModel('gemini-1.5-flash')
 else:
     model = None
     print("⚠️ GEMINI_API_KEY not found. AI recommendations will not be available.")
 
-def generate_ai_crop_recommendations(field_data, weather_data=None, vegetation_data=None):
+# ✅ Prompt modes
+# 'verbose' sends the full descriptive schema; 'compact' sends a short-key
+# schema with length caps and expands the answer server-side
+PROMPT_MODES = ('verbose', 'compact')
+DEFAULT_PROMPT_MODE = os.getenv('AI_PROMPT_MODE', 'verbose')
+
+def resolve_prompt_mode(prompt_mode=None):
+    """Return the prompt mode to use, raising ValueError for unknown modes."""
+    prompt_mode = prompt_mode or DEFAULT_PROMPT_MODE
+    if prompt_mode not in PROMPT_MODES:
+        raise ValueError(f"Unknown prompt_mode: {prompt_mode}. Available modes: {list(PROMPT_MODES)}")
+    return prompt_mode
+
+# ✅ Gemini rate limit
+# Every model call in this process takes a token first; quota errors (429)
+# are retried with exponential backoff
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60'))
+MODEL_RATE_LIMIT_RETRIES = 3
+MODEL_RETRY_BASE_SECONDS = 2
+
+model_rate_limiter = RateLimiter(GEMINI_REQUESTS_PER_MINUTE)
+
+def call_model(prompt, **options):
+    """
+    generate_content behind the shared rate limiter, retrying quota errors.
+
+    The call (and, for stream=True, each chunk) is offloaded so gRPC waits do
+    not block other requests in the gevent serving mode.
+    """
+    kind = 'stream' if options.get('stream') else 'generate'
+    for attempt in range(MODEL_RATE_LIMIT_RETRIES + 1):
+        with span('ai.rate_limit'):
+            model_rate_limiter.acquire()
+        try:
+            with span('ai.gemini'), upstream_call('gemini'):
+                response = offload(model.generate_content, prompt, **options)
+            if options.get('stream'):
+                # The outcome is only known once the stream has been consumed
+                return timed_stream(offload_iter(response))
+            GEMINI_CALLS.labels(kind, 'ok').inc()
+            return response
+        except ResourceExhausted as e:
+            GEMINI_CALLS.labels(kind, 'quota').inc()
+            if attempt == MODEL_RATE_LIMIT_RETRIES or options.get('stream'):
+                raise
+            wait = MODEL_RETRY_BASE_SECONDS * 2 ** attempt
+            log('gemini_quota_exceeded', level='warning', retry_in_seconds=wait, error=str(e))
+            time.sleep(wait)
+        except Exception:
+            GEMINI_CALLS.labels(kind, 'error').inc()
+            raise
+
+def timed_stream(chunks):
+    """
+    Record the time spent waiting for streamed chunks as the 'ai.gemini_stream'
+    stage, and count the call once the stream ends: 'ok' when it is fully
+    consumed, 'quota' / 'error' when it fails part way and 'cancelled' when
+    the consumer stops early.
+    """
+    outcome = 'cancelled'
+    try:
+        with upstream_call('gemini'):
+            while True:
+                with span('ai.gemini_stream'):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    outcome = 'ok'
+                    return
+                yield chunk
+    except ResourceExhausted:
+        outcome = 'quota'
+        raise
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        GEMINI_CALLS.labels('stream', outcome).inc()
+
+# ✅ Recommendation cache
+# Identical (after normalization) requests within the TTL reuse the previous
+# Gemini answer instead of spending another call
+RECOMMENDATION_CACHE_TTL_SECONDS = int(os.getenv('RECOMMENDATION_CACHE_TTL_SECONDS', str(6 * 60 * 60)))
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv('RECOMMENDATION_CACHE_MAX_ENTRIES', '512'))
+
+recommendation_cache = TTLCache(
+    maxsize=RECOMMENDATION_CACHE_MAX_ENTRIES, ttl=RECOMMENDATION_CACHE_TTL_SECONDS,
+    on_lookup=cache_observer('recommendations')
+)
+
+# Equivalent requests arriving while Gemini is still answering wait for that
+# answer, but not forever if the request answering it never finishes
+RECOMMENDATION_WAIT_SECONDS = float(os.getenv('RECOMMENDATION_WAIT_SECONDS', '120'))
+
+recommendation_flights = SingleFlight(timeout=RECOMMENDATION_WAIT_SECONDS)
+
+# Prompt inputs and how finely numbers are compared; None keeps a string as-is
+# (after case and whitespace folding)
+FINGERPRINT_FIELDS = {
+    'field_data': {
+        'location': None, 'area': 0.1, 'soil_type': 'soil', 'soil_ph': 0.1,
+        'irrigation': 'irrigation', 'experience': None, 'budget': None
+    },
+    'weather_data': {'avg_temp': 1, 'rainfall': 10, 'humidity': 5, 'pattern': None},
+    'vegetation_data': {'ndvi': 0.01, 'health_status': None, 'soil_moisture': None}
+}
+
+SOIL_TYPE_ALIASES = {
+    'clayey': 'clay', 'sand': 'sandy', 'loam': 'loamy', 'silty': 'silt', 'chalk': 'chalky',
+    'peat': 'peaty', 'black cotton': 'black', 'regur': 'black', 'laterite': 'lateritic'
+}
+
+IRRIGATION_ALIASES = {
+    'rainwater': 'rainfed', 'rainwater dependent': 'rainfed', 'rain fed': 'rainfed', 'rain-fed': 'rainfed',
+    'no': 'rainfed', 'none': 'rainfed', 'not available': 'rainfed',
+    'bore well': 'borewell', 'tube well': 'borewell', 'tubewell': 'borewell',
+    'canal water': 'canal', 'yes': 'available'
+}
+
+def _normalize_text(value):
+    return re.sub(r'\s+', ' ', str(value)).strip().casefold()
+
+def _normalize_value(value, rule):
+    """Round numbers (numeric strings included) to `rule` and fold strings to a canonical form."""
+    if value is None or value == '':
+        return None
+    if isinstance(rule, (int, float)) and not isinstance(value, bool):
+        try:
+            return round(round(float(value) / rule) * rule, 6)
+        except (TypeError, ValueError):
+            pass
+    text = _normalize_text(value)
+    if rule == 'soil':
+        text = re.sub(r'\s+soils?$', '', text)
+        return SOIL_TYPE_ALIASES.get(text, text)
+    if rule == 'irrigation':
+        text = re.sub(r'\s+irrigation$', '', text)
+        return IRRIGATION_ALIASES.get(text, text)
+    return text
+
+def provided_inputs(section, values):
+    """
+    The inputs of an optional prompt section that were actually given.
+
+    Keys the prompts do not use and empty values are dropped; a section left
+    with nothing is None, so the prompts leave it out and the fingerprint
+    treats it like a missing one.
+
+    Args:
+        section: 'weather_data' or 'vegetation_data'
+        values: The request's dict for that section, or None
+
+    Returns:
+        Dict of the given inputs, or None
+    """
+    provided = {
+        key: (values or {}).get(key) for key in FINGERPRINT_FIELDS[section]
+        if (values or {}).get(key) not in (None, '')
+    }
+    return provided or None
+
+def recommendation_fingerprint(field_data, weather_data=None, vegetation_data=None, season=None, prompt_mode=None,
+                               now=None):
+    """
+    Cache key for a recommendation request.
+
+    Only the inputs the prompt actually uses are included, numbers are
+    rounded, soil and irrigation strings are mapped to canonical names and
+    the month and year, season bucket and prompt mode the prompt is built
+    with are added, so equivalent submissions share a key and an answer is
+    never reused in a later month.
+
+    Returns:
+        Hex digest string
+    """
+    now = now or datetime.now()
+    season = season or get_current_season(now)[0]
+    sections = {
+        'field_data': field_data,
+        'weather_data': provided_inputs('weather_data', weather_data),
+        'vegetation_data': provided_inputs('vegetation_data', vegetation_data)
+    }
+    normalized = {'date': now.strftime('%Y-%m'), 'season': season, 'prompt_mode': resolve_prompt_mode(prompt_mode)}
+    for section, rules in FINGERPRINT_FIELDS.items():
+        values = sections[section] or {}
+        normalized[section] = {key: _normalize_value(values.get(key), rule) for key, rule in rules.items()}
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def recommendation_cache_stats():
+    """Hit/miss counters of the recommendation cache, coalesced in-flight requests and the Gemini rate limiter."""
+    return dict(recommendation_cache.stats(), in_flight=recommendation_flights.stats(), rate_limit=model_rate_limiter.stats())
+
+def generate_ai_crop_recommendations(field_data, weather_data=None, vegetation_data=None, use_cache=True,
+                                     prompt_mode=None):
     """
     Generate AI-powered crop recommendations using Gemini AI
     
+    Successful answers are cached under recommendation_fingerprint(); a
+    repeat of an equivalent request returns the stored answer with
+    "cached": true. Equivalent requests made while Gemini is still working
+    on the first one wait for it instead of making their own call.
+    
     Args:
         field_data: Dictionary containing field information (location, soil, size, etc.)
         weather_data: Optional weather data for the field
         vegetation_data: Optional vegetation index data (NDVI, etc.)
+        use_cache: When False, Gemini is always called and the cache refreshed
+        prompt_mode: 'verbose' or 'compact'; defaults to AI_PROMPT_MODE
     
     Returns:
         Dictionary with AI-generated crop recommendations
@@ -36,39 +255,381 @@ def generate_ai_crop_recommendations(field_data, weather_data=None, vegetation_d
             "fallback": True
         }
     
+    prompt_mode = resolve_prompt_mode(prompt_mode)
+    cache_key = recommendation_fingerprint(field_data, weather_data, vegetation_data, prompt_mode=prompt_mode)
+    failure = {}
+
+    def load():
+        try:
+            result, _ = recommendation_flights.do(
+                cache_key, lambda: request_ai_crop_recommendations(field_data, weather_data, vegetation_data, prompt_mode)
+            )
+        except TimeoutError as e:
+            result = {"error": f"AI recommendation failed: {str(e)}", "fallback": True}
+        if result.get('status') != 'success':
+            # Errors are returned but never cached
+            failure['result'] = result
+            return None
+        return result
+
+    if use_cache:
+        result, cached = recommendation_cache.get_or_load(cache_key, load)
+    else:
+        result, cached = load(), False
+        if result is not None:
+            recommendation_cache.set(cache_key, result)
+
+    if result is None:
+        return failure['result']
+    return dict(result, cached=cached)
+
+def request_ai_crop_recommendations(field_data, weather_data=None, vegetation_data=None, prompt_mode=None):
+    """Call Gemini for one recommendation request, bypassing the cache."""
     try:
-        # Build comprehensive prompt for AI
-        prompt = build_crop_recommendation_prompt(field_data, weather_data, vegetation_data)
+        # Build the prompt for the selected mode
+        prompt_mode = resolve_prompt_mode(prompt_mode)
+        prompt, generation_options = build_prompt(field_data, weather_data, vegetation_data, prompt_mode)
         
         # Generate response from Gemini
-        response = model.generate_content(prompt)
+        response = call_model(prompt, **generation_options)
         
         # Parse AI response
-        ai_recommendations = parse_ai_response(response.text)
+        ai_recommendations = parse_model_response(response.text, prompt_mode)
         
-        return {
-            "status": "success",
-            "ai_generated": True,
-            "recommendations": ai_recommendations,
-            "generated_at": datetime.now().isoformat(),
-            "field_location": field_data.get('location', 'Unknown')
-        }
+        return build_recommendation_result(field_data, ai_recommendations)
         
     except Exception as e:
-        print(f"Error generating AI recommendations: {e}")
+        log('ai_recommendation_failed', level='error', error=str(e))
         return {
             "error": f"AI recommendation failed: {str(e)}",
             "fallback": True
         }
 
-def build_crop_recommendation_prompt(field_data, weather_data, vegetation_data):
-    """Build a comprehensive prompt for intelligent, descriptive crop recommendations"""
+def build_prompt(field_data, weather_data, vegetation_data, prompt_mode):
+    """
+    Prompt text and extra generate_content arguments for a prompt mode.
+
+    Returns:
+        Tuple of (prompt, dict of keyword arguments for generate_content)
+    """
+    with span('ai.prompt'):
+        if prompt_mode == 'compact':
+            prompt = build_compact_prompt(field_data, weather_data, vegetation_data, get_current_season()[0])
+            return prompt, {'generation_config': {'max_output_tokens': COMPACT_MAX_OUTPUT_TOKENS}}
+        return build_crop_recommendation_prompt(field_data, weather_data, vegetation_data), {}
+
+def parse_model_response(ai_text, prompt_mode, streamer=None):
+    """
+    Parse a model answer for a prompt mode into the verbose response shape.
+
+    Args:
+        ai_text: Full model output
+        prompt_mode: 'verbose' or 'compact'
+        streamer: Parser that already consumed ai_text while it streamed in;
+            the text is parsed from scratch when omitted
+    """
+    with span('ai.parse'):
+        if streamer is None:
+            streamer = response_streamer(prompt_mode)
+            streamer.feed(ai_text)
+        recovered = streamer.salvage()
+        if prompt_mode == 'compact':
+            recovered = expand_compact_response(recovered)
+        return recommendations_from_sections(recovered, streamer.complete, ai_text)
+
+def recommendations_from_sections(recovered, complete, ai_text):
+    """
+    Response from the sections recovered out of a model answer.
+
+    Sections that came through intact are kept even when the rest of the
+    answer is malformed or cut off. If a required section is missing, the
+    recovered sections are laid over the text fallback instead.
+    """
+    if complete and all(key in recovered for key in REQUIRED_SECTIONS):
+        return recovered
+    if not recovered:
+        return parse_text_response(ai_text)
+
+    if all(key in recovered for key in REQUIRED_SECTIONS):
+        recommendations = dict(recovered)
+    else:
+        recommendations = parse_text_response(ai_text)
+        recommendations.update(recovered)
+    missing = [key for key in RESPONSE_SECTION_TYPES if key not in recovered]
+    recommendations['ai_note'] = (
+        f"Part of the AI response was malformed; recovered {', '.join(recovered)}"
+        + (f" (missing: {', '.join(missing)})" if missing else "")
+    )
+    log('ai_response_salvaged', level='warning', sections=sorted(recovered))
+    return recommendations
+
+def build_recommendation_result(field_data, ai_recommendations):
+    """Wrap parsed recommendations in the response payload."""
+    return {
+        "status": "success",
+        "ai_generated": True,
+        "recommendations": ai_recommendations,
+        "generated_at": datetime.now().isoformat(),
+        "field_location": field_data.get('location', 'Unknown')
+    }
+
+# Sections whose array items are streamed one by one instead of as a whole
+STREAMED_ITEM_SECTIONS = ('recommended_crops',)
+
+# ✅ Expected response structure
+# Streamed answers are validated section by section against these types; a
+# result is usable once the required sections have been recovered
+RESPONSE_SECTION_TYPES = {
+    'land_analysis': dict,
+    'season_analysis': dict,
+    'recommended_crops': list,
+    'market_insights': dict,
+    'action_plan': dict,
+    'sustainability_advice': dict
+}
+REQUIRED_SECTIONS = ('land_analysis', 'recommended_crops', 'market_insights')
+
+def response_streamer(prompt_mode='verbose'):
+    """Incremental parser for a model answer in the given prompt mode."""
+    if prompt_mode == 'compact':
+        return SectionStreamer(item_keys=(CROPS_KEY,), schema=COMPACT_SECTION_TYPES)
+    return SectionStreamer(item_keys=STREAMED_ITEM_SECTIONS, schema=RESPONSE_SECTION_TYPES)
+
+def stream_ai_crop_recommendations(field_data, weather_data=None, vegetation_data=None, use_cache=True,
+                                   prompt_mode=None):
+    """
+    Generate recommendations with Gemini's streaming API, yielding each
+    section as soon as it has been generated.
     
-    current_month = datetime.now().strftime("%B")
-    current_year = datetime.now().year
+    Yields dicts with a 'type':
+        'started': {'cached'}; sent first
+        'preliminary': {'recommended_crops'} ranked by the local scoring
+            engine, sent straight away while Gemini is still generating
+        'section': {'key', 'value'} for each finished top-level section
+        'crop': {'index', 'value'} for each finished recommended_crops item
+        'done': {'result'}, the payload generate_ai_crop_recommendations returns
+        'error': {'error', 'fallback'}
     
-    # Determine current season for India
-    month_num = datetime.now().month
+    A cached answer is replayed section by section; a newly generated
+    answer is added to the recommendation cache. Compact answers are
+    expanded section by section, so events look the same in both modes.
+    Equivalent requests made while Gemini is still working on one (streamed
+    or not) wait for it and replay its answer instead of making their own call.
+    """
+    if not model:
+        yield {"type": "error", "error": "AI service not available. Please configure GEMINI_API_KEY.", "fallback": True}
+        return
+
+    prompt_mode = resolve_prompt_mode(prompt_mode)
+    cache_key = recommendation_fingerprint(field_data, weather_data, vegetation_data, prompt_mode=prompt_mode)
+    cached = recommendation_cache.get(cache_key) if use_cache else None
+    if cached is not None:
+        yield {"type": "started", "cached": True}
+        yield from replay_events(cached['recommendations'])
+        yield {"type": "done", "result": dict(cached, cached=True)}
+        return
+
+    yield {"type": "started", "cached": False}
+    yield {"type": "preliminary", "recommended_crops": local_crop_recommendations(field_data, weather_data, vegetation_data)}
+    # Joined only now, so that from here on the leader always reaches finish()
+    call, leader = recommendation_flights.join(cache_key)
+    if not leader:
+        try:
+            result = recommendation_flights.wait(call)
+        except TimeoutError as e:
+            result = {"error": f"AI recommendation failed: {str(e)}"}
+        if result.get('status') != 'success':
+            yield {"type": "error", "error": result.get('error'), "fallback": True}
+            return
+        yield from replay_events(result['recommendations'])
+        yield {"type": "done", "result": dict(result, cached=False)}
+        return
+
+    # Published to waiting requests however the stream ends, including a client disconnect
+    outcome = {"error": "AI recommendation stream was interrupted", "fallback": True}
+    try:
+        compact = prompt_mode == 'compact'
+        streamer = response_streamer(prompt_mode)
+        try:
+            prompt, generation_options = build_prompt(field_data, weather_data, vegetation_data, prompt_mode)
+            for chunk in call_model(prompt, stream=True, **generation_options):
+                for event in streamer.feed(chunk.text):
+                    if event[0] == 'item':
+                        value = expand_crop(event[3]) if compact else event[3]
+                        yield {"type": "crop", "index": event[2], "value": value}
+                        continue
+                    key, value = expand_section(event[1], event[2]) if compact else event[1:]
+                    if key and key not in STREAMED_ITEM_SECTIONS:
+                        yield {"type": "section", "key": key, "value": value}
+            ai_recommendations = parse_model_response(streamer.text, prompt_mode, streamer=streamer)
+        except Exception as e:
+            log('ai_stream_failed', level='error', error=str(e))
+            outcome = {"error": f"AI recommendation failed: {str(e)}", "fallback": True}
+            yield dict(outcome, type="error")
+            return
+
+        outcome = build_recommendation_result(field_data, ai_recommendations)
+        recommendation_cache.set(cache_key, outcome)
+    finally:
+        recommendation_flights.finish(cache_key, call, outcome)
+    yield {"type": "done", "result": dict(outcome, cached=False)}
+
+# ✅ Batch recommendations
+# Identical fields are answered once, compact-mode fields are packed several
+# to a call, and calls run on one bounded pool shared by all batches
+BATCH_CONCURRENCY = int(os.getenv('RECOMMENDATION_BATCH_CONCURRENCY', '4'))
+BATCH_PACK_SIZE = int(os.getenv('RECOMMENDATION_BATCH_PACK_SIZE', '4'))
+BATCH_DEFAULT_PROMPT_MODE = 'compact'
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='agriscope-recommend')
+
+def batch_ai_crop_recommendations(items, use_cache=True, prompt_mode=None, pack_size=None):
+    """
+    Recommendations for many fields, yielded per field as they finish.
+    
+    Args:
+        items: List of {'id', 'field_data', 'weather_data', 'vegetation_data'}
+        use_cache: When False, cached answers are ignored (and refreshed)
+        prompt_mode: Defaults to 'compact', the only mode whose answers are packed
+        pack_size: Fields per packed call; defaults to RECOMMENDATION_BATCH_PACK_SIZE
+    
+    Yields dicts with a 'type':
+        'field': {'id', 'result', 'duplicate'}; result is what
+            generate_ai_crop_recommendations returns for that field
+        'done': {'fields', 'unique', 'cached', 'model_calls', 'failed'}
+    """
+    prompt_mode = resolve_prompt_mode(prompt_mode or BATCH_DEFAULT_PROMPT_MODE)
+    pack_size = pack_size or BATCH_PACK_SIZE
+    groups = {}
+    for item in items:
+        key = recommendation_fingerprint(
+            item['field_data'], item.get('weather_data'), item.get('vegetation_data'), prompt_mode=prompt_mode
+        )
+        groups.setdefault(key, []).append(item)
+    totals = {'fields': len(items), 'unique': len(groups), 'cached': 0, 'model_calls': 0, 'failed': 0}
+
+    def field_events(key, result, cached=False):
+        if result.get('status') == 'success':
+            result = dict(result, cached=cached)
+        else:
+            totals['failed'] += len(groups[key])
+        for position, item in enumerate(groups[key]):
+            yield {"type": "field", "id": item['id'], "result": result, "duplicate": position > 0}
+
+    if not model:
+        for key in groups:
+            yield from field_events(key, {"error": "AI service not available. Please configure GEMINI_API_KEY.", "fallback": True})
+        yield dict(totals, type="done")
+        return
+
+    pending = []
+    for key in groups:
+        cached = recommendation_cache.get(key) if use_cache else None
+        if cached is not None:
+            totals['cached'] += 1
+            yield from field_events(key, cached, cached=True)
+        else:
+            pending.append(key)
+
+    if prompt_mode == 'compact' and pack_size > 1:
+        units = [pending[i:i + pack_size] for i in range(0, len(pending), pack_size)]
+    else:
+        units = [[key] for key in pending]
+    requests = {key: groups[key][0] for key in pending}
+    futures = [batch_executor.submit(run_batch_unit, unit, requests, prompt_mode) for unit in units]
+    try:
+        for future in as_completed(futures):
+            results, calls = future.result()
+            totals['model_calls'] += calls
+            for key, result in results.items():
+                yield from field_events(key, result)
+        yield dict(totals, type="done")
+    finally:
+        # Client went away or we finished: drop calls that have not started
+        for future in futures:
+            future.cancel()
+
+def run_batch_unit(keys, requests, prompt_mode):
+    """
+    Answer one unit of a batch: a single field or a pack of compact fields.
+    
+    Fields a packed answer leaves out (or garbles) are retried on their own,
+    as are all of its fields when the packed call itself fails. Successful
+    answers are cached under their fingerprints.
+    
+    Returns:
+        Tuple of ({key: result}, number of model calls made)
+    """
+    results, calls = {}, 0
+    if len(keys) > 1:
+        calls += 1
+        try:
+            results = request_packed_recommendations(keys, requests)
+        except Exception as e:
+            log('ai_packed_recommendation_failed', level='error', error=str(e))
+
+    for key in keys:
+        if key not in results:
+            item = requests[key]
+            try:
+                results[key], shared = recommendation_flights.do(key, lambda: request_ai_crop_recommendations(
+                    item['field_data'], item.get('weather_data'), item.get('vegetation_data'), prompt_mode
+                ))
+            except TimeoutError as e:
+                results[key], shared = {"error": f"AI recommendation failed: {str(e)}", "fallback": True}, True
+            if not shared:  # a shared answer came from another request's call
+                calls += 1
+        if results[key].get('status') == 'success':
+            recommendation_cache.set(key, results[key])
+    return results, calls
+
+def request_packed_recommendations(keys, requests):
+    """
+    One compact-mode model call covering several fields.
+    
+    Returns:
+        {key: result} for the fields whose section of the answer was complete
+    """
+    inputs = [
+        (requests[key]['field_data'], requests[key].get('weather_data'), requests[key].get('vegetation_data'))
+        for key in keys
+    ]
+    labels = packed_labels(len(keys))
+    prompt = build_packed_compact_prompt(inputs, get_current_season()[0])
+    response = call_model(prompt, generation_config={'max_output_tokens': COMPACT_MAX_OUTPUT_TOKENS * len(keys)})
+
+    streamer = SectionStreamer(schema={label: dict for label in labels})
+    streamer.feed(response.text)
+    results = {}
+    for key, label, (field_data, _, _) in zip(keys, labels, inputs):
+        section = streamer.sections.get(label)
+        expanded = expand_compact_response(section) if section else {}
+        if all(name in expanded for name in REQUIRED_SECTIONS):
+            results[key] = build_recommendation_result(field_data, expanded)
+    return results
+
+def replay_events(recommendations):
+    """Stream events for a complete answer: the response sections, as a live stream emits them."""
+    for key in RESPONSE_SECTION_TYPES:
+        if key in recommendations:
+            yield from section_events(key, recommendations[key])
+
+def section_events(key, value):
+    """Stream events for one complete section."""
+    if key in STREAMED_ITEM_SECTIONS and isinstance(value, list):
+        for index, item in enumerate(value):
+            yield {"type": "crop", "index": index, "value": item}
+    else:
+        yield {"type": "section", "key": key, "value": value}
+
+def get_current_season(now=None):
+    """
+    Determine the Indian cropping season for a date (default: today).
+
+    Returns:
+        Tuple of (season, season_context)
+    """
+    month_num = (now or datetime.now()).month
     if month_num in [3, 4, 5]:
         season = "Summer (Zaid season)"
         season_context = "Hot and dry season requiring heat-tolerant crops with efficient irrigation"
@@ -81,6 +642,18 @@ def build_crop_recommendation_prompt(field_data, weather_data, vegetation_data):
     else:
         season = "Transition period"
         season_context = "Season transition - plan for upcoming season requirements"
+    return season, season_context
+
+def build_crop_recommendation_prompt(field_data, weather_data, vegetation_data):
+    """Build a comprehensive prompt for intelligent, descriptive crop recommendations"""
+    
+    weather_data = provided_inputs('weather_data', weather_data)
+    vegetation_data = provided_inputs('vegetation_data', vegetation_data)
+    current_month = datetime.now().strftime("%B")
+    current_year = datetime.now().year
+    
+    # Determine current season for India
+    season, season_context = get_current_season()
 
     prompt = f"""
 You are an expert agricultural consultant with deep knowledge of Indian farming, market trends, and sustainable agriculture. 
@@ -206,30 +779,13 @@ Respond ONLY with the JSON structure above, no additional text.
     return prompt
 
 def parse_ai_response(ai_text):
-    """Parse the AI response and extract the new descriptive format"""
-    
-    try:
-        # Try to find JSON content in the response
-        start_idx = ai_text.find('{')
-        end_idx = ai_text.rfind('}') + 1
-        
-        if start_idx != -1 and end_idx != -1:
-            json_str = ai_text[start_idx:end_idx]
-            recommendations = json.loads(json_str)
-            
-            # Validate that we have the expected structure
-            if all(key in recommendations for key in ['land_analysis', 'recommended_crops', 'market_insights']):
-                return recommendations
-            else:
-                # If structure is wrong, use fallback
-                return parse_text_response(ai_text)
-        else:
-            # If JSON parsing fails, create structured response from text
-            return parse_text_response(ai_text)
-            
-    except json.JSONDecodeError:
-        # Fallback: parse as text and structure it
-        return parse_text_response(ai_text)
+    """
+    Parse the AI response and extract the new descriptive format.
+
+    The text goes through the same incremental parser used for streaming,
+    so valid sections survive a malformed or truncated tail.
+    """
+    return parse_model_response(ai_text, 'verbose')
 
 def parse_text_response(text):
     """Fallback parser for non-JSON responses - creates a descriptive format"""
@@ -266,8 +822,32 @@ def parse_text_response(text):
         "ai_note": "The AI provided a text response instead of structured format. Full response is available in the recommended crops section."
     }
 
-def get_fallback_recommendations():
-    """Fallback recommendations when AI is not available - descriptive format"""
+def local_crop_recommendations(field_data=None, weather_data=None, vegetation_data=None, season=None):
+    """Rank catalog crops for the request with the local scoring engine (no Gemini call)."""
+    field_data, weather_data, vegetation_data = field_data or {}, weather_data or {}, vegetation_data or {}
+
+    def number(values, key):
+        value = _normalize_value(values.get(key), 1e-6)
+        return value if isinstance(value, float) else None
+
+    return recommend_crops(
+        soil=_normalize_value(field_data.get('soil_type'), 'soil'),
+        ph=number(field_data, 'soil_ph'),
+        rainfall=number(weather_data, 'rainfall'),
+        irrigation=_normalize_value(field_data.get('irrigation'), 'irrigation'),
+        avg_temp=number(weather_data, 'avg_temp'),
+        ndvi=number(vegetation_data, 'ndvi'),
+        season=season_key(season or get_current_season()[0])
+    )
+
+def get_fallback_recommendations(field_data=None, weather_data=None, vegetation_data=None):
+    """
+    Fallback recommendations when AI is not available - descriptive format
+
+    Crops are ranked for the given field by the local scoring engine in
+    crop_scoring.py, so the fallback is specific to the request and
+    returns in well under a millisecond.
+    """
     
     current_month = datetime.now().strftime("%B")
     
@@ -292,19 +872,7 @@ def get_fallback_recommendations():
             "price_outlook": "Market prices vary by region and season",
             "market_timing": "Harvest timing affects market prices significantly"
         },
-        "recommended_crops": [
-            {
-                "name": "Wheat (Winter Season) / Rice (Monsoon) / Sugarcane (Annual)",
-                "variety": "Local adapted varieties recommended",
-                "why_suitable": "These are generally suitable crops based on traditional farming practices",
-                "market_potential": "Stable market demand for staple crops",
-                "investment_needed": "Moderate investment for seeds, fertilizers, and irrigation",
-                "expected_returns": "Returns depend on yield and market prices",
-                "growing_tips": "Follow recommended agricultural practices for your region",
-                "harvest_timeline": "Varies by crop and planting time",
-                "risk_factors": "Weather dependency and market price fluctuations"
-            }
-        ],
+        "recommended_crops": local_crop_recommendations(field_data, weather_data, vegetation_data),
         "action_plan": {
             "immediate_steps": "Configure AI service for detailed recommendations, consult local agricultural experts",
             "soil_preparation": "Test soil pH and nutrients, prepare beds as per crop requirements",
@@ -1,133 +1,143 @@
 import ee
 import json
-import time
 import os
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+from band_store import CHIP_SCALE_METERS, BandStore
+from cache import TTLCache
+from ee_ops import ROUND_TRIP_HEADER, debug_geometry, get_info, get_map_id, round_trips
+from ee_init import PENDING as EE_PENDING, EarthEngineInitializer
+from geometry import polygon_hash
+from jobs import JobManager, QueueFullError
+from reduction import AOI_BUFFER_METERS, reduction_plan
+import metrics
+from metrics import cache_observer, observe_cache
+import tracing
+from tracing import REQUEST_ID_HEADER, SERVER_TIMING_HEADER, log, span
+from serving import serving_stats
+from singleflight import SingleFlight
+from timeseries_cache import TimeSeriesCache
+from index_registry import EXPRESSION_BANDS, index_registry
 
 # Import AI service
 try:
-    from ai_crop_service import generate_ai_crop_recommendations, get_fallback_recommendations
+    from ai_crop_service import (
+        batch_ai_crop_recommendations, generate_ai_crop_recommendations, get_fallback_recommendations,
+        recommendation_cache_stats, resolve_prompt_mode, stream_ai_crop_recommendations
+    )
     AI_SERVICE_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️ AI service not available: {e}")
     AI_SERVICE_AVAILABLE = False
 
-# ✅ Retry logic for Earth Engine initialization
-MAX_RETRIES = 5
-WAIT_SECONDS = 5
-EE_INITIALIZED = False
+# ✅ Earth Engine initialization
+# Runs in the background (see ee_init.py) so the worker starts serving at once;
+# EE endpoints wait up to EE_READY_WAIT_SECONDS for it, then answer 503
+EE_READY_WAIT_SECONDS = float(os.getenv('EE_READY_WAIT_SECONDS', '2'))
 
-def initialize_ee():
-    global EE_INITIALIZED
-    
-    # Check for service account key first
-    service_account_key = os.getenv('GOOGLE_SERVICE_ACCOUNT_KEY')
-    
-    if service_account_key:
-        print("🔑 Service account key found in environment variables")
-        try:
-            # Parse the service account key from environment variable
-            service_account_info = json.loads(service_account_key)
-            print(f"📧 Service account email: {service_account_info.get('client_email', 'N/A')}")
-            print(f"📋 Project ID from key: {service_account_info.get('project_id', 'N/A')}")
-            
-            # Use the project from service account if available, otherwise fallback
-            project_id = service_account_info.get('project_id', 'agriscope21')
-            
-            credentials = ee.ServiceAccountCredentials(
-                service_account_info['client_email'],
-                key_data=service_account_key
-            )
-            ee.Initialize(credentials, project=project_id)
-            print(f"✅ Earth Engine initialized with service account for project: {project_id}")
-            EE_INITIALIZED = True
-            return
-            
-        except json.JSONDecodeError as json_error:
-            print(f"❌ Invalid JSON in service account key: {json_error}")
-        except KeyError as key_error:
-            print(f"❌ Missing required field in service account key: {key_error}")
-        except Exception as sa_error:
-            print(f"❌ Service account authentication failed: {sa_error}")
-    else:
-        print("⚠️ No service account key found in GOOGLE_SERVICE_ACCOUNT_KEY environment variable")
-    
-    # Try default authentication methods
-    for attempt in range(MAX_RETRIES):
-        try:
-            print(f"🔄 Attempt {attempt + 1}: Trying default Earth Engine authentication...")
-            ee.Initialize(project='agriscope21')
-            print("✅ Earth Engine initialized with default authentication!")
-            EE_INITIALIZED = True
-            return
-        except Exception as e:
-            print(f"⚠️ Attempt {attempt + 1} failed: {e}")
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(WAIT_SECONDS)
-    
-    print("❌ All Earth Engine authentication methods failed")
-    EE_INITIALIZED = False
-    return
+ee_initializer = EarthEngineInitializer()
+ee_initializer.start()
 
-initialize_ee()
+def ee_ready():
+    """True once Earth Engine is usable, waiting briefly while it is still initializing."""
+    return ee_initializer.wait(EE_READY_WAIT_SECONDS)
+
+def ee_unavailable_error():
+    """Error body for EE endpoints called before (or without) a successful initialization."""
+    if ee_initializer.state == EE_PENDING:
+        return {
+            "error": "Google Earth Engine is still initializing. Please retry shortly.",
+            "earth_engine_status": EE_PENDING
+        }
+    return {
+        "error": "Google Earth Engine is not initialized. Please check service account configuration.",
+        "earth_engine_status": ee_initializer.state
+    }
 
 # ✅ Flask app setup
 app = Flask(__name__)
 # CORS(app, resources={r"/process_ndvi": {"origins": "*"}})
-CORS(app)
+CORS(app, expose_headers=[ROUND_TRIP_HEADER, REQUEST_ID_HEADER, SERVER_TIMING_HEADER])
+metrics.init_app(app)
+tracing.init_app(app)
+
+@app.after_request
+def add_round_trip_header(response):
+    """Report how many blocking Earth Engine calls served this request."""
+    response.headers[ROUND_TRIP_HEADER] = str(round_trips())
+    return response
 
 # Health check endpoint for Render
 @app.route('/', methods=['GET'])
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint for deployment platforms"""
+    """
+    Liveness check for deployment platforms.
+
+    Answers as soon as the worker is up, whatever the state of Earth Engine;
+    use /ready to know whether EE endpoints can be served.
+    """
     return jsonify({
         'status': 'healthy',
         'service': 'AgriScope Flask Backend',
-        'earth_engine_status': 'initialized' if EE_INITIALIZED else 'failed',
+        'earth_engine_status': ee_initializer.state,
+        'serving': serving_stats(),
+        'tracing': tracing.tracing_stats(),
         'timestamp': datetime.now().isoformat()
     }), 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness check: 200 once Earth Engine is initialized, 503 while initializing or after it failed."""
+    return jsonify({
+        'status': 'ready' if ee_initializer.ready else 'not_ready',
+        'earth_engine': ee_initializer.status(),
+        'timestamp': datetime.now().isoformat()
+    }), 200 if ee_initializer.ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics: request and per-stage latency, upstream calls and cache lookups."""
+    return metrics.metrics_response()
+
 # ✅ Generalized Vegetation Index Calculation Function
 def calculate_vegetation_index(image, index_name):
     """
     Calculate a specified vegetation index using GEE server-side expressions.
     
     Args:
-        image: ee.Image with bands B2 (Blue), B4 (Red), B8 (NIR), B11 (SWIR)
-        index_name: String name of the index to calculate
+        image: ee.Image with the bands the index references (see index_registry.bands_for)
+        index_name: String name of a registered index
         
     Returns:
         ee.Image with the calculated index
     """
-    # Define the expressions for each vegetation index
-    expressions = {
-        'SR': 'NIR / R',
-        'NDVI': '(NIR - R) / (NIR + R)',
-        'EVI': '2.5 * ((NIR - R) / (NIR + 6 * R - 7.5 * B + 1))',
-        'SAVI': '((NIR - R) / (NIR + R + 0.5)) * 1.5',  # Using L=0.5
-        'ARVI': '(NIR - (2 * R - B)) / (NIR + (2 * R - B))',
-        'MAVI': '(NIR - R) / (NIR + R + SWIR)'
-    }
-    
-    if index_name not in expressions:
-        raise ValueError(f"Unknown index name: {index_name}. Available indices: {list(expressions.keys())}")
+    index = index_registry.get(index_name)
     
-    # Create band dictionary for expression
-    band_dict = {
-        'B': image.select('B2'),     # Blue
-        'R': image.select('B4'),     # Red  
-        'NIR': image.select('B8'),   # Near Infrared
-        'SWIR': image.select('B11')  # Short Wave Infrared
-    }
+    # Create band dictionary for expression from the variables the formula uses
+    band_dict = {variable: image.select(EXPRESSION_BANDS[variable]) for variable in index.variables}
     
-    # Calculate the index using the expression
-    index_image = image.expression(expressions[index_name], band_dict).rename(index_name)
+    # Calculate the index using the compiled expression
+    index_image = image.expression(index.ee_expression, band_dict).rename(index_name)
     
     return index_image
 
+def add_index_bands(image, index_names):
+    """
+    Add one band per requested vegetation index to an image.
+    
+    Args:
+        image: ee.Image with the bands the indices reference
+        index_names: List of index names registered in index_registry
+        
+    Returns:
+        ee.Image with the original bands plus one band named after each index
+    """
+    index_bands = [calculate_vegetation_index(image, name) for name in index_names]
+    return image.addBands(ee.Image.cat(*index_bands)).copyProperties(image, ['system:time_start', 'system:index'])
+
 def get_visualization_params(index_name):
     """
     Get appropriate visualization parameters for each vegetation index.
@@ -138,34 +148,9 @@ def get_visualization_params(index_name):
     Returns:
         Dictionary with visualization parameters
     """
-    vis_params = {
-        'SR': {
-            'min': 0, 'max': 8,
-            'palette': ['red', 'orange', 'yellow', 'green', 'darkgreen']
-        },
-        'NDVI': {
-            'min': -0.2, 'max': 1.0,
-            'palette': ['blue', 'white', 'yellow', 'green', 'darkgreen']
-        },
-        'EVI': {
-            'min': -0.2, 'max': 1.0,
-            'palette': ['brown', 'yellow', 'lightgreen', 'green', 'darkgreen']
-        },
-        'SAVI': {
-            'min': -0.2, 'max': 1.0,
-            'palette': ['purple', 'blue', 'cyan', 'yellow', 'red']
-        },
-        'ARVI': {
-            'min': -0.2, 'max': 1.0,
-            'palette': ['red', 'orange', 'yellow', 'lightgreen', 'darkgreen']
-        },
-        'MAVI': {
-            'min': -0.2, 'max': 1.0,
-            'palette': ['red', 'yellow', 'lightblue', 'blue', 'darkblue']
-        }
-    }
-    
-    return vis_params.get(index_name, vis_params['NDVI'])  # Default to NDVI params
+    if index_name in index_registry:
+        return index_registry.get(index_name).visualization
+    return index_registry.get('NDVI').visualization  # Default to NDVI params
 
 # ✅ Function to mask clouds using Sentinel-2 L2A SCL band
 def mask_clouds(image):
@@ -188,6 +173,375 @@ def calculate_ndvi(image):
     ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
     return image.addBands(ndvi).copyProperties(image, ['system:time_start'])
 
+def validate_date_range(start_date, end_date):
+    """
+    Check a requested date range against Sentinel-2 availability.
+
+    Returns:
+        An error response body, or None if the range is usable
+    """
+    try:
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return {"error": "Invalid date format. Use YYYY-MM-DD"}
+
+    today = datetime.now()
+    suggested_end_date = (today - timedelta(days=5)).strftime('%Y-%m-%d')
+
+    # Check if end date is too recent (less than 5 days ago)
+    if (today - end_dt).days < 5:
+        return {
+            "error": f"End date is too recent. Satellite data is typically delayed by 4-5 days. Please select a date before {suggested_end_date}",
+            "suggested_end_date": suggested_end_date
+        }
+
+    # Check if date range is valid
+    if start_dt >= end_dt:
+        return {"error": "Start date must be before end date"}
+
+    return None
+
+def resolve_index_names(data):
+    """
+    Read the requested indices from a payload.
+
+    "index_names" (a list) selects multi-index mode; otherwise the single
+    "index_name" is used, defaulting to NDVI.
+
+    Returns:
+        Tuple of (index_names, multi_index, error body or None)
+    """
+    requested_indices = data.get('index_names')
+    multi_index = requested_indices is not None
+
+    if multi_index:
+        if not isinstance(requested_indices, list) or not requested_indices:
+            return None, multi_index, {"error": "index_names must be a non-empty list"}
+        # Keep request order but drop duplicates
+        index_names = list(dict.fromkeys(requested_indices))
+    else:
+        index_names = [data.get('index_name', 'NDVI')]
+
+    unknown_indices = [name for name in index_names if name not in index_registry]
+    if unknown_indices:
+        return None, multi_index, {
+            "error": f"Unknown index name(s): {unknown_indices}. Available indices: {index_registry.names()}"
+        }
+    return index_names, multi_index, None
+
+# ✅ Shared time series pipeline
+# Anything that changes the reduced values must be reflected here so cached
+# series from an older pipeline are never mixed with new ones; the reduction
+# scale, which depends on the field (see reduction.py), is added per field
+TIME_SERIES_PIPELINE = f"S2_SR:cloud20:buffer{AOI_BUFFER_METERS}"
+
+time_series_cache = TimeSeriesCache()
+
+# Identical Earth Engine computations already in flight are joined rather
+# than started again
+ee_flights = SingleFlight()
+
+# Fields exported to the local band store are served without Earth Engine
+band_store = BandStore()
+
+def fetch_index_time_series(coordinates, date_ranges, index_names, plan):
+    """
+    Reduce every requested index over the AOI for each Sentinel-2 scene.
+
+    All date ranges and indices are evaluated in a single collection, a single
+    reduceRegion per scene and a single getInfo, which is the only round trip.
+
+    Args:
+        coordinates: List of [lng, lat] pairs describing the AOI
+        date_ranges: List of (start_date, end_date) tuples, end exclusive
+        index_names: List of validated index names
+        plan: reduction_plan() for the buffered AOI and these indices
+
+    Returns:
+        List of dicts with 'id', 'date', 'time_start' and 'values' (index -> mean)
+    """
+    index_label = ', '.join(index_names)
+
+    # Create AOI and apply a small positive buffer
+    aoi = ee.Geometry.Polygon([coordinates])
+    buffered_geom = aoi.buffer(AOI_BUFFER_METERS)  # Small positive buffer
+    debug_geometry(f"✅ Buffered AOI for {index_label}:", buffered_geom)
+
+    date_filter = ee.Filter.Or(*[ee.Filter.date(start, end) for start, end in date_ranges])
+
+    # Load Sentinel-2 SR collection with all required bands
+    collection = (ee.ImageCollection('COPERNICUS/S2_SR')
+                  .filterBounds(buffered_geom)
+                  .filter(date_filter)
+                  .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
+                  .filter(ee.Filter.notNull(['system:time_start']))
+                  .map(mask_clouds)
+                  .select(index_registry.bands_for(index_names))  # Only the bands the formulas use
+                 )
+
+    # Scale images and preserve properties
+    def scale_image(image):
+        return image.multiply(0.0001).copyProperties(image, ['system:time_start', 'system:index'])
+    collection = collection.map(scale_image)
+
+    # Compute every requested vegetation index as a band of each image
+    index_collection = collection.map(lambda image: add_index_bands(image, index_names))
+
+    # Extract time series data
+    def extract_index_feature(image):
+        time_prop = image.get('system:time_start')
+        image_id = image.get('system:index')
+        formatted_date = ee.Algorithms.If(
+            ee.Algorithms.IsEqual(time_prop, None),
+            "null",
+            ee.Date(time_prop).format('YYYY-MM-dd')
+        )
+
+        # Reduce all index bands together so each scene costs one reduction
+        index_dict = image.select(index_names).reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=buffered_geom,
+            scale=plan['scale_m'],
+            tileScale=plan['tile_scale'],
+            maxPixels=1e9
+        )
+
+        return ee.Feature(None, {
+            'id': image_id,
+            'time_start': time_prop,
+            'date': formatted_date,
+            'values': index_dict
+        })
+
+    # Map over the collection
+    features = index_collection.map(extract_index_feature, dropNulls=True)
+    features = ee.FeatureCollection(features)
+
+    # Scene count and features come back together; an empty collection simply
+    # yields no features, so no separate size() call is needed
+    result = ee.Dictionary({
+        'scene_count': collection.size(),
+        'features': features
+    })
+    try:
+        result_info = get_info(result)
+        log('time_series_fetched', level='debug', indices=index_names, scenes=result_info.get('scene_count'))
+    except Exception as inner_error:
+        log('time_series_fetch_failed', level='error', indices=index_names, error=str(inner_error))
+        raise
+
+    scenes = []
+    for f in (result_info.get('features') or {}).get('features', []):
+        props = f.get('properties', {})
+        if not props.get('date') or props.get('date') == 'null':
+            continue
+        scenes.append({
+            'id': props.get('id'),
+            'date': props.get('date'),
+            'time_start': props.get('time_start'),
+            'values': props.get('values') or {}
+        })
+    return scenes
+
+def cached_index_time_series(coordinates, start_date, end_date, index_names, use_cache=True):
+    """
+    Return per-index scenes for a field, fetching only what the cache lacks.
+
+    When the band store holds chips covering the range, the indices are
+    computed locally and Earth Engine is not contacted at all.
+
+    Args:
+        coordinates: List of [lng, lat] pairs describing the AOI
+        start_date: Inclusive start, 'YYYY-MM-DD'
+        end_date: Exclusive end, 'YYYY-MM-DD'
+        index_names: List of validated index names
+        use_cache: When False the full range is re-fetched and the cache refreshed
+
+    Returns:
+        Tuple of (dict of index name -> list of scenes, cache info dict)
+    """
+    with span('local.band_store'):
+        local_scenes = band_store.time_series(coordinates, start_date, end_date, index_names)
+    if local_scenes is not None:
+        observe_cache('timeseries', 'local')
+        return local_scenes, {
+            "status": "local", "source": "band_store", "fetched_ranges": [],
+            "reduction": {"scale_m": CHIP_SCALE_METERS, "buffer_m": AOI_BUFFER_METERS}
+        }
+
+    plan = reduction_plan(coordinates, index_names, buffer_meters=AOI_BUFFER_METERS)
+    field_key = f"{polygon_hash(coordinates)}:{TIME_SERIES_PIPELINE}:scale{plan['scale_m']}"
+
+    if use_cache:
+        missing = time_series_cache.missing_ranges(field_key, index_names, start_date, end_date)
+    else:
+        missing = [(start_date, end_date)]
+
+    if missing:
+        def fetch_missing():
+            scenes = fetch_index_time_series(coordinates, missing, index_names, plan)
+            time_series_cache.merge(field_key, index_names, scenes, missing)
+
+        # Concurrent requests for the same field, ranges and indices share one fetch
+        ee_flights.do(('timeseries', field_key, tuple(missing), tuple(sorted(index_names))), fetch_missing)
+
+    cache_info = {
+        "status": "hit" if not missing else ("miss" if missing == [(start_date, end_date)] else "partial"),
+        "source": "earth_engine",
+        "fetched_ranges": [list(date_range) for date_range in missing],
+        "reduction": plan
+    }
+    observe_cache('timeseries', cache_info['status'])
+    per_index = {
+        name: time_series_cache.scenes(field_key, name, start_date, end_date)
+        for name in index_names
+    }
+    return per_index, cache_info
+
+def build_index_series(index_scenes):
+    """
+    Turn per-index scenes into response points, dropping scenes without a value.
+
+    Scenes computed from the band store also carry zonal 'stats' (valid pixel
+    count, covered area, percentiles), which are passed through.
+    """
+    series = {}
+    for name, scenes in index_scenes.items():
+        points = []
+        for scene in scenes:
+            if scene['value'] is None:
+                continue
+            point = {'date': scene['date'], 'value': scene['value'], 'index_name': name}
+            if 'stats' in scene:
+                point['stats'] = scene['stats']
+            points.append(point)
+        series[name] = points
+    return series
+
+# Batches reduce at the native resolution of the requested bands (see
+# reduction.py); fields are small, so only the shared tile scale is fixed
+BATCH_TILE_SCALE = 4
+BATCH_MAX_FIELDS = int(os.getenv('BATCH_MAX_FIELDS', '500'))
+
+def fetch_batch_time_series(fields, start_date, end_date, index_names):
+    """
+    Reduce every requested index over many fields in one Earth Engine computation.
+
+    All fields go into one ee.FeatureCollection and each scene is reduced with a
+    single reduceRegions call, so the cost grows with the number of scenes
+    rather than fields x scenes round trips.
+
+    Args:
+        fields: List of dicts with 'id' and 'coordinates'
+        start_date: Inclusive start, 'YYYY-MM-DD'
+        end_date: Exclusive end, 'YYYY-MM-DD'
+        index_names: List of validated index names
+
+    Returns:
+        Tuple of (scene count, list of row dicts with 'field_id', 'scene_id', 'date'
+        and one key per index)
+    """
+    field_collection = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Polygon([field['coordinates']]).buffer(AOI_BUFFER_METERS), {'field_id': field['id']})
+        for field in fields
+    ])
+
+    collection = (ee.ImageCollection('COPERNICUS/S2_SR')
+                  .filterBounds(field_collection.geometry())
+                  .filterDate(start_date, end_date)
+                  .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
+                  .filter(ee.Filter.notNull(['system:time_start']))
+                  .map(mask_clouds)
+                  .select(index_registry.bands_for(index_names))  # Only the bands the formulas use
+                 )
+
+    def scale_image(image):
+        return image.multiply(0.0001).copyProperties(image, ['system:time_start', 'system:index'])
+    index_collection = collection.map(scale_image).map(lambda image: add_index_bands(image, index_names))
+
+    # A single-band mean is reported as 'mean'; name it after the index instead
+    reducer = ee.Reducer.mean()
+    if len(index_names) == 1:
+        reducer = reducer.setOutputs(index_names)
+
+    def reduce_fields(image):
+        date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd')
+        scene_id = image.get('system:index')
+        reduced = image.select(index_names).reduceRegions(
+            collection=field_collection,
+            reducer=reducer,
+            scale=index_registry.native_scale(index_names),
+            tileScale=BATCH_TILE_SCALE
+        )
+        return reduced.map(lambda feature: ee.Feature(None, feature.toDictionary()).set({
+            'date': date,
+            'scene_id': scene_id
+        }))
+
+    rows = index_collection.map(reduce_fields).flatten()
+
+    plan_info = get_info(ee.Dictionary({
+        'scene_count': collection.size(),
+        'rows': rows
+    }))
+
+    table = [f.get('properties', {}) for f in (plan_info.get('rows') or {}).get('features', [])]
+    return plan_info.get('scene_count', 0), table
+
+def build_tile_url(image, collection, vis_params):
+    """
+    Create a tile URL for an image built from a collection in one round trip.
+
+    The collection is only counted when map creation fails, which is how an
+    empty collection shows up, so the success path costs a single getMapId.
+
+    Returns:
+        The tile URL format string, or None if the collection has no images
+    """
+    try:
+        map_dict = get_map_id(image, vis_params)
+    except ee.EEException:
+        if get_info(collection.size()) == 0:
+            return None
+        raise
+    return map_dict['tile_fetcher'].url_format
+
+# ✅ Tile URL cache for index overlays
+# Earth Engine map IDs stop serving tiles a few hours after they are created,
+# so entries expire before that and are refreshed in the background shortly
+# before expiry while still being served
+MAP_ID_TTL_SECONDS = int(os.getenv('EE_MAP_ID_TTL_SECONDS', str(3 * 60 * 60)))
+MAP_ID_REFRESH_AHEAD_SECONDS = int(os.getenv('EE_MAP_ID_REFRESH_AHEAD_SECONDS', str(15 * 60)))
+
+map_id_cache = TTLCache(
+    maxsize=int(os.getenv('MAP_ID_CACHE_MAX_ENTRIES', '512')),
+    ttl=MAP_ID_TTL_SECONDS,
+    on_lookup=cache_observer('map_ids')
+)
+
+def load_tile_url(cache_key, build_tile_url):
+    """
+    Tile URL from the map ID cache. Concurrent misses for the same key
+    (double clicks, several tabs) share a single Earth Engine computation.
+    """
+    return map_id_cache.get_or_load(
+        cache_key,
+        lambda: ee_flights.do(('map_id', cache_key), build_tile_url)[0],
+        refresh_ahead=MAP_ID_REFRESH_AHEAD_SECONDS
+    )
+
+def map_id_cache_key(composite, coordinates, start_date, end_date, index_name, vis_params):
+    """Build the tile URL cache key for a canonical AOI, date range, index and styling."""
+    return (
+        composite,
+        polygon_hash(coordinates),
+        start_date,
+        end_date,
+        index_name,
+        json.dumps(vis_params, sort_keys=True)
+    )
+
 @app.route('/process_ndvi', methods=['POST'])
 def process_ndvi():
     try:
@@ -207,33 +561,8 @@ def process_ndvi():
             return jsonify({"error": "AOI must have at least three coordinates"}), 400
 
         # ✅ Check if Earth Engine is available
-        if not EE_INITIALIZED:
-            return jsonify({"error": "Google Earth Engine is not initialized. Please check service account configuration."}), 503
-
-        # ✅ Create AOI Polygon
-        aoi = ee.Geometry.Polygon([coordinates])
-        print("✅ AOI Polygon:", aoi.getInfo())
-
-        # ✅ Load Sentinel-2 Surface Reflectance collection
-        collection = (
-            ee.ImageCollection('COPERNICUS/S2_SR')
-            .filterBounds(aoi)
-            .filterDate(start_date, end_date)
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-            .map(mask_clouds)
-            .map(lambda img: img.multiply(0.0001))  # Scale reflectance
-        )
-
-        # ✅ If no images, return 404
-        if collection.size().getInfo() == 0:
-            return jsonify({"error": "No Sentinel-2 data available for the specified AOI and dates"}), 404
-
-        # ✅ Compute NDVI
-        ndvi_collection = collection.map(calculate_ndvi)
-        mean_ndvi = ndvi_collection.mean().select('NDVI')
-
-        # ✅ Clip NDVI to AOI to avoid entire bounding box
-        mean_ndvi_clipped = mean_ndvi.clip(aoi)
+        if not ee_ready():
+            return jsonify(ee_unavailable_error()), 503
 
         # ✅ Generate NDVI tile URL
         # Typical NDVI can range from about -0.2 (bare soil) to 1.0 (dense vegetation).
@@ -250,24 +579,55 @@ def process_ndvi():
             ]
         }
 
-        map_dict = mean_ndvi_clipped.getMapId(vis_params)
-        tile_url = map_dict['tile_fetcher'].url_format
-        print("✅ NDVI Tile URL:", tile_url)
+        def build_ndvi_tile_url():
+            # ✅ Create AOI Polygon
+            aoi = ee.Geometry.Polygon([coordinates])
+            debug_geometry("✅ AOI Polygon:", aoi)
+
+            # ✅ Load Sentinel-2 Surface Reflectance collection
+            collection = (
+                ee.ImageCollection('COPERNICUS/S2_SR')
+                .filterBounds(aoi)
+                .filterDate(start_date, end_date)
+                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
+                .map(mask_clouds)
+                .map(lambda img: img.multiply(0.0001))  # Scale reflectance
+            )
+
+            # ✅ Compute NDVI
+            ndvi_collection = collection.map(calculate_ndvi)
+            mean_ndvi = ndvi_collection.mean().select('NDVI')
+
+            # ✅ Clip NDVI to AOI to avoid entire bounding box
+            mean_ndvi_clipped = mean_ndvi.clip(aoi)
+
+            # ✅ None here means the collection was empty
+            tile_url = build_tile_url(mean_ndvi_clipped, collection, vis_params)
+            log('tile_url_created', level='debug', index='NDVI')
+            return tile_url
+
+        cache_key = map_id_cache_key('ndvi_mean', coordinates, start_date, end_date, 'NDVI', vis_params)
+        tile_url, cached = load_tile_url(cache_key, build_ndvi_tile_url)
+
+        # ✅ If no images, return 404
+        if tile_url is None:
+            return jsonify({"error": "No Sentinel-2 data available for the specified AOI and dates"}), 404
 
         response = {
             "status": "success",
             "start_date": start_date,
             "end_date": end_date,
             "coordinates": coordinates,
-            "tile_url": tile_url
+            "tile_url": tile_url,
+            "cached": cached
         }
         return jsonify(response), 200
 
     except ee.EEException as e:
-        print("❌ Earth Engine Error:", str(e))
+        log('earth_engine_error', level='error', error=str(e))
         return jsonify({"error": f"Earth Engine Error: {str(e)}"}), 500
     except Exception as e:
-        print("❌ Internal server error:", str(e))
+        log('internal_error', level='error', error=str(e))
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 @app.route('/ndvi_time_series', methods=['POST'])
@@ -285,95 +645,36 @@ def ndvi_time_series():
         if len(coordinates) < 3:
             return jsonify({"error": "AOI must have at least three coordinates"}), 400
 
-        # ✅ Check if Earth Engine is available
-        if not EE_INITIALIZED:
-            return jsonify({"error": "Google Earth Engine is not initialized. Please check service account configuration."}), 503
-
-        # Create AOI and apply a small positive buffer or no buffer
-        aoi = ee.Geometry.Polygon([coordinates])
-        # Use positive buffer or no buffer to avoid geometry issues
-        buffered_geom = aoi.buffer(10)  # Small positive buffer instead of negative
-        print("✅ Buffered AOI:", buffered_geom.getInfo())
-
-        # Load Sentinel-2 SR collection filtered by the buffered geometry.
-        collection = (ee.ImageCollection('COPERNICUS/S2_SR')
-                      .filterBounds(buffered_geom)
-                      .filterDate(start_date, end_date)
-                      .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-                      .filter(ee.Filter.notNull(['system:time_start']))
-                      .map(mask_clouds)
-                     )
-        # Scale images and preserve properties.
-        def scale_image(image):
-            return image.multiply(0.0001).copyProperties(image, ['system:time_start', 'system:index'])
-        collection = collection.map(scale_image)
-
-        coll_size = collection.size().getInfo()
-        print("Collection size:", coll_size)
-        if coll_size == 0:
-            return jsonify({"error": "No Sentinel-2 data available for the specified AOI and dates"}), 404
+        # ✅ Check if Earth Engine is available (not needed for fields in the band store)
+        if not band_store.covers(coordinates, start_date, end_date) and not ee_ready():
+            return jsonify(ee_unavailable_error()), 503
 
-        # Compute NDVI and preserve time property.
-        def add_ndvi(image):
-            ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-            return image.addBands(ndvi).copyProperties(image, ['system:time_start', 'system:index'])
-        ndvi_collection = collection.map(add_ndvi)
-
-        # Mapping function: For each image, compute mean NDVI over the buffered geometry and return a feature with image ID, raw time, formatted date, and NDVI.
-        def debug_feature(image):
-            time_prop = image.get('system:time_start')
-            image_id = image.get('system:index')
-            formatted_date = ee.Algorithms.If(
-                ee.Algorithms.IsEqual(time_prop, None),
-                "null",
-                ee.Date(time_prop).format('YYYY-MM-dd')
-            )
-            ndvi_dict = image.select('NDVI').reduceRegion(
-                reducer=ee.Reducer.mean(),
-                geometry=buffered_geom,
-                scale=5,         # Use higher resolution for better accuracy
-                bestEffort=True,
-                maxPixels=1e9
-            )
-            ndvi_value = ndvi_dict.get('NDVI')
-            return ee.Feature(None, {
-                'id': image_id,
-                'time_start': time_prop,
-                'date': formatted_date,
-                'ndvi': ndvi_value
-            })
+        index_scenes, cache_info = cached_index_time_series(
+            coordinates, start_date, end_date, ['NDVI'], use_cache=data.get('use_cache', True)
+        )
+        scenes = index_scenes['NDVI']
+        if not scenes:
+            return jsonify({"error": "No Sentinel-2 data available for the specified AOI and dates"}), 404
 
-        # Map over the NDVI collection.
-        features = ndvi_collection.map(debug_feature, dropNulls=True)
-        features = ee.FeatureCollection(features)
-        try:
-            features_info = features.getInfo()
-            print("Mapped features info retrieved successfully.")
-        except Exception as inner_error:
-            print("❌ Error calling getInfo on features:", inner_error)
-            raise
-
-        # Build the time series list from features with valid 'date' and 'ndvi'
-        time_series = []
-        for f in features_info.get('features', []):
-            props = f.get('properties', {})
-            if props.get('date') and props.get('ndvi') is not None:
-                time_series.append({
-                    'date': props.get('date'),
-                    'ndvi': props.get('ndvi')
-                })
+        # Build the time series list from scenes with a valid NDVI
+        time_series = [
+            {'date': scene['date'], 'ndvi': scene['value']}
+            for scene in scenes
+            if scene['value'] is not None
+        ]
 
         response = {
             "status": "success",
-            "time_series": time_series
+            "time_series": time_series,
+            "cache": cache_info
         }
         return jsonify(response), 200
 
     except ee.EEException as e:
-        print("❌ Earth Engine Error:", str(e))
+        log('earth_engine_error', level='error', error=str(e))
         return jsonify({"error": f"Earth Engine Error: {str(e)}"}), 500
     except Exception as e:
-        print("❌ Internal server error:", str(e))
+        log('internal_error', level='error', error=str(e))
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 @app.route('/api/indices/calculate', methods=['POST'])
@@ -407,65 +708,56 @@ def process_index():
             return jsonify({"error": "AOI must have at least three coordinates"}), 400
 
         # ✅ Date validation - Sentinel-2 data has ~5 day delay
-        try:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-            today = datetime.now()
-            
-            # Check if end date is too recent (less than 5 days ago)
-            days_ago = (today - end_dt).days
-            if days_ago < 5:
-                return jsonify({
-                    "error": f"End date is too recent. Satellite data is typically delayed by 4-5 days. Please select a date before {(today - timedelta(days=5)).strftime('%Y-%m-%d')}",
-                    "suggested_end_date": (today - timedelta(days=5)).strftime('%Y-%m-%d')
-                }), 400
-                
-            # Check if date range is valid
-            if start_dt >= end_dt:
-                return jsonify({"error": "Start date must be before end date"}), 400
-                
-        except ValueError:
-            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+        date_error = validate_date_range(start_date, end_date)
+        if date_error:
+            return jsonify(date_error), 400
 
         # ✅ Check if Earth Engine is available
-        if not EE_INITIALIZED:
-            return jsonify({"error": "Google Earth Engine is not initialized. Please check service account configuration."}), 503
-
-        # ✅ Create AOI Polygon
-        aoi = ee.Geometry.Polygon([coordinates])
-        print(f"✅ AOI Polygon for {index_name}:", aoi.getInfo())
-
-        # ✅ Load Sentinel-2 Surface Reflectance collection with all required bands
-        collection = (
-            ee.ImageCollection('COPERNICUS/S2_SR')
-            .filterBounds(aoi)
-            .filterDate(start_date, end_date)
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-            .map(mask_clouds)
-            .map(lambda img: img.multiply(0.0001))  # Scale reflectance
-            .select(['B2', 'B4', 'B8', 'B11'])  # Blue, Red, NIR, SWIR
-        )
+        if not ee_ready():
+            return jsonify(ee_unavailable_error()), 503
 
-        # ✅ If no images, return 404
-        if collection.size().getInfo() == 0:
-            return jsonify({"error": "No Sentinel-2 data available for the specified AOI and dates"}), 404
+        if index_name not in index_registry:
+            return jsonify({
+                "error": f"Unknown index name: {index_name}. Available indices: {index_registry.names()}"
+            }), 400
 
-        # ✅ Get median composite and calculate the selected vegetation index
-        median_image = collection.median()
-        
-        try:
+        vis_params = get_visualization_params(index_name)
+
+        def build_index_tile_url():
+            # ✅ Create AOI Polygon
+            aoi = ee.Geometry.Polygon([coordinates])
+            debug_geometry(f"✅ AOI Polygon for {index_name}:", aoi)
+
+            # ✅ Load Sentinel-2 Surface Reflectance collection with all required bands
+            collection = (
+                ee.ImageCollection('COPERNICUS/S2_SR')
+                .filterBounds(aoi)
+                .filterDate(start_date, end_date)
+                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
+                .map(mask_clouds)
+                .map(lambda img: img.multiply(0.0001))  # Scale reflectance
+                .select(index_registry.bands_for([index_name]))  # Only the bands the formula uses
+            )
+
+            # ✅ Get median composite and calculate the selected vegetation index
+            median_image = collection.median()
             index_image = calculate_vegetation_index(median_image, index_name)
-        except ValueError as ve:
-            return jsonify({"error": str(ve)}), 400
 
-        # ✅ Clip index to AOI to avoid entire bounding box
-        index_clipped = index_image.clip(aoi)
+            # ✅ Clip index to AOI to avoid entire bounding box
+            index_clipped = index_image.clip(aoi)
 
-        # ✅ Generate index tile URL with appropriate visualization parameters
-        vis_params = get_visualization_params(index_name)
-        map_dict = index_clipped.getMapId(vis_params)
-        tile_url = map_dict['tile_fetcher'].url_format
-        print(f"✅ {index_name} Tile URL:", tile_url)
+            # ✅ Generate index tile URL with appropriate visualization parameters
+            # ✅ None here means the collection was empty
+            tile_url = build_tile_url(index_clipped, collection, vis_params)
+            log('tile_url_created', level='debug', index=index_name)
+            return tile_url
+
+        cache_key = map_id_cache_key('median', coordinates, start_date, end_date, index_name, vis_params)
+        tile_url, cached = load_tile_url(cache_key, build_index_tile_url)
+
+        # ✅ If no images, return 404
+        if tile_url is None:
+            return jsonify({"error": "No Sentinel-2 data available for the specified AOI and dates"}), 404
 
         response = {
             "status": "success",
@@ -474,15 +766,16 @@ def process_index():
             "end_date": end_date,
             "coordinates": coordinates,
             "tile_url": tile_url,
-            "visualization_params": vis_params
+            "visualization_params": vis_params,
+            "cached": cached
         }
         return jsonify(response), 200
 
     except ee.EEException as e:
-        print("❌ Earth Engine Error:", str(e))
+        log('earth_engine_error', level='error', error=str(e))
         return jsonify({"error": f"Earth Engine Error: {str(e)}"}), 500
     except Exception as e:
-        print("❌ Internal server error:", str(e))
+        log('internal_error', level='error', error=str(e))
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 @app.route('/api/indices/timeseries', methods=['POST'])
@@ -497,196 +790,409 @@ def index_time_series():
         "end_date": "YYYY-MM-DD",
         "index_name": "NDVI" | "EVI" | "SAVI" | "ARVI" | "MAVI" | "SR"
     }
+    
+    Pass "index_names": ["NDVI", "EVI", ...] instead of "index_name" to get
+    several indices from a single reduceRegion/getInfo round trip. The
+    response then carries a "series" dict keyed by index name.
+    
+    Scenes are cached per field and index, so a repeat request only fetches
+    dates outside the cached span. Send "use_cache": false to force a refetch.
+    Fields exported with /api/band-store/fields are computed locally from
+    their stored chips instead.
+    
+    Send "async": true to run the analysis as a background job instead; the
+    response is 202 with a job ID to poll at /api/jobs/<job_id>.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No input data provided"}), 400
+
+    params, error, status = parse_time_series_request(data)
+    if error:
+        return jsonify(error), status
+
+    if data.get('async'):
+        try:
+            job = job_manager.submit(
+                'indices.timeseries',
+                lambda job: run_time_series_job(params, job),
+                payload={key: params[key] for key in ('start_date', 'end_date', 'index_names')}
+            )
+        except QueueFullError as e:
+            return jsonify({"error": f"Too many analyses queued, try again later ({e})"}), 429
+        return jsonify({
+            "status": "accepted",
+            "job_id": job.id,
+            "status_url": f"/api/jobs/{job.id}"
+        }), 202
+
+    body, status = compute_index_time_series(params)
+    return jsonify(body), status
+
+def parse_time_series_request(data):
+    """
+    Validate a time series payload.
+
+    Returns:
+        Tuple of (params dict, error body, HTTP status); params is None on error
+    """
+    coordinates = data.get('coordinates')
+    start_date = data.get('start_date')
+    end_date = data.get('end_date')
+
+    if not coordinates or not start_date or not end_date:
+        return None, {"error": "Missing required fields: coordinates, start_date, end_date"}, 400
+    if len(coordinates) < 3:
+        return None, {"error": "AOI must have at least three coordinates"}, 400
+
+    index_names, multi_index, index_error = resolve_index_names(data)
+    if index_error:
+        return None, index_error, 400
+
+    # ✅ Date validation - Sentinel-2 data has ~5 day delay
+    date_error = validate_date_range(start_date, end_date)
+    if date_error:
+        return None, date_error, 400
+
+    # ✅ Check if Earth Engine is available (not needed for fields in the band store)
+    if not band_store.covers(coordinates, start_date, end_date) and not ee_ready():
+        return None, ee_unavailable_error(), 503
+
+    params = {
+        'coordinates': coordinates,
+        'start_date': start_date,
+        'end_date': end_date,
+        'index_names': index_names,
+        'multi_index': multi_index,
+        'use_cache': data.get('use_cache', True)
+    }
+    return params, None, 200
+
+def compute_index_time_series(params):
+    """
+    Build the time series response for validated params.
+
+    Returns:
+        Tuple of (response body, HTTP status)
+    """
+    index_names = params['index_names']
+
+    try:
+        index_scenes, cache_info = cached_index_time_series(
+            params['coordinates'], params['start_date'], params['end_date'], index_names,
+            use_cache=params['use_cache']
+        )
+        log('time_series_scenes', level='debug', indices=index_names, scenes=len(index_scenes[index_names[0]]))
+        if not any(index_scenes.values()):
+            return {"error": "No Sentinel-2 data available for the specified AOI and dates"}, 404
+
+        # Build one time series list per index
+        series = build_index_series(index_scenes)
+
+        if params['multi_index']:
+            response = {
+                "status": "success",
+                "index_names": index_names,
+                "series": series,
+                "measurement_counts": {name: len(points) for name, points in series.items()},
+                "cache": cache_info
+            }
+        else:
+            index_name = index_names[0]
+            time_series = series[index_name]
+            response = {
+                "status": "success",
+                "index_name": index_name,
+                "time_series": time_series,
+                "total_measurements": len(time_series),
+                "cache": cache_info
+            }
+        return response, 200
+
+    except ee.EEException as e:
+        log('earth_engine_error', level='error', error=str(e))
+        return {"error": f"Earth Engine Error: {str(e)}"}, 500
+    except Exception as e:
+        log('internal_error', level='error', error=str(e))
+        return {"error": f"Internal server error: {str(e)}"}, 500
+
+# ✅ Background jobs for long-range analyses
+# Long ranges are fetched one window at a time so the job can report progress
+# and be cancelled between windows; every window lands in the time series cache
+# and the final response is assembled from it
+JOB_WINDOW_DAYS = int(os.getenv('JOB_WINDOW_DAYS', '180'))
+# Long-poll waits stay well below the gunicorn worker timeout
+JOB_MAX_WAIT_SECONDS = 30
+
+job_manager = JobManager()
+
+def split_date_range(start_date, end_date, window_days):
+    """Split [start_date, end_date) into consecutive windows of at most window_days."""
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    windows = []
+    while start < end:
+        window_end = min(start + timedelta(days=window_days), end)
+        windows.append((start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d')))
+        start = window_end
+    return windows
+
+def run_time_series_job(params, job):
+    windows = split_date_range(params['start_date'], params['end_date'], JOB_WINDOW_DAYS)
+    for position, (window_start, window_end) in enumerate(windows):
+        job.report_progress(position / (len(windows) + 1), f"Fetching {window_start} to {window_end}")
+        cached_index_time_series(
+            params['coordinates'], window_start, window_end, params['index_names'],
+            use_cache=params['use_cache']
+        )
+    job.report_progress(len(windows) / (len(windows) + 1), "Assembling time series")
+    return compute_index_time_series(dict(params, use_cache=True))
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Poll a background job. Pass ?wait=<seconds> to long-poll until the job
+    finishes or the wait runs out.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    try:
+        wait_seconds = min(float(request.args.get('wait', 0)), JOB_MAX_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    if wait_seconds > 0:
+        job.wait(wait_seconds)
+
+    return jsonify(job.to_dict()), 200
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running background job."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+# ✅ Streaming, window-chunked time series
+# One shared pool bounds the number of window queries in flight across all
+# streaming requests in this worker
+STREAM_WINDOW_CONCURRENCY = int(os.getenv('STREAM_WINDOW_CONCURRENCY', '4'))
+
+stream_executor = ThreadPoolExecutor(max_workers=STREAM_WINDOW_CONCURRENCY, thread_name_prefix='agriscope-stream')
+
+def split_date_range_by_month(start_date, end_date):
+    """Split [start_date, end_date) at calendar month boundaries."""
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    windows = []
+    while start < end:
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        window_end = min(next_month, end)
+        windows.append((start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d')))
+        start = window_end
+    return windows
+
+def format_stream_record(record, stream_format):
+    """Encode one record as an NDJSON line or a Server-Sent Event."""
+    payload = json.dumps(record)
+    if stream_format == 'sse':
+        return f"event: {record['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+@app.route('/api/indices/timeseries/stream', methods=['POST'])
+def stream_index_time_series():
+    """
+    Time series streamed window by window as each window completes.
+    
+    Accepts the same payload as /api/indices/timeseries plus:
+        "window_days": optional window length; calendar months by default
+        "format": "ndjson" (default) or "sse"
+    
+    Emits one {"type": "window", ...} record per window, in completion order,
+    followed by a final {"type": "done", ...} record. A window that fails
+    produces a {"type": "error", ...} record and the stream continues.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No input data provided"}), 400
+
+    params, error, status = parse_time_series_request(data)
+    if error:
+        return jsonify(error), status
+
+    stream_format = data.get('format', 'ndjson')
+    if stream_format not in ('ndjson', 'sse'):
+        return jsonify({"error": "format must be 'ndjson' or 'sse'"}), 400
+
+    window_days = data.get('window_days')
+    if window_days is not None:
+        if not isinstance(window_days, int) or window_days < 1:
+            return jsonify({"error": "window_days must be a positive integer"}), 400
+        windows = split_date_range(params['start_date'], params['end_date'], window_days)
+    else:
+        windows = split_date_range_by_month(params['start_date'], params['end_date'])
+
+    index_names = params['index_names']
+
+    def fetch_window(window):
+        index_scenes, cache_info = cached_index_time_series(
+            params['coordinates'], window[0], window[1], index_names, use_cache=params['use_cache']
+        )
+        series = build_index_series(index_scenes)
+        return series, cache_info
+
+    def generate():
+        futures = {stream_executor.submit(fetch_window, window): window for window in windows}
+        totals = {name: 0 for name in index_names}
+        failed_windows = 0
+        try:
+            for future in as_completed(futures):
+                window_start, window_end = futures[future]
+                try:
+                    series, cache_info = future.result()
+                except Exception as e:
+                    failed_windows += 1
+                    log('time_series_window_failed', level='error', start=window_start, end=window_end, error=str(e))
+                    yield format_stream_record({
+                        "type": "error",
+                        "start_date": window_start,
+                        "end_date": window_end,
+                        "error": str(e)
+                    }, stream_format)
+                    continue
+
+                for name, points in series.items():
+                    totals[name] += len(points)
+                yield format_stream_record({
+                    "type": "window",
+                    "start_date": window_start,
+                    "end_date": window_end,
+                    "index_names": index_names,
+                    "series": series,
+                    "cache": cache_info["status"]
+                }, stream_format)
+
+            yield format_stream_record({
+                "type": "done",
+                "windows": len(windows),
+                "failed_windows": failed_windows,
+                "measurement_counts": totals
+            }, stream_format)
+        finally:
+            # Client went away or we finished: drop windows that have not started
+            for future in futures:
+                future.cancel()
+
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/indices/timeseries/batch', methods=['POST'])
+def batch_index_time_series():
+    """
+    Time series for many fields in a single Earth Engine computation.
+    
+    Expected JSON payload:
+    {
+        "fields": [{"id": "field-1", "coordinates": [[lng, lat], ...]}, ...],
+        "start_date": "YYYY-MM-DD",
+        "end_date": "YYYY-MM-DD",
+        "index_name": "NDVI"  (or "index_names": ["NDVI", "EVI", ...])
+    }
+    
+    Saved fields live in the Node.js service, so clients send each saved
+    field's ID together with its stored polygon.
     """
     try:
         data = request.get_json()
         if not data:
             return jsonify({"error": "No input data provided"}), 400
 
-        coordinates = data.get('coordinates')
+        fields = data.get('fields')
         start_date = data.get('start_date')
         end_date = data.get('end_date')
-        index_name = data.get('index_name', 'NDVI')  # Default to NDVI
 
-        if not coordinates or not start_date or not end_date:
-            return jsonify({"error": "Missing required fields: coordinates, start_date, end_date"}), 400
-        if len(coordinates) < 3:
-            return jsonify({"error": "AOI must have at least three coordinates"}), 400
+        if not fields or not start_date or not end_date:
+            return jsonify({"error": "Missing required fields: fields, start_date, end_date"}), 400
+        if not isinstance(fields, list):
+            return jsonify({"error": "fields must be a list"}), 400
+        if len(fields) > BATCH_MAX_FIELDS:
+            return jsonify({"error": f"Too many fields: {len(fields)}. Maximum per batch is {BATCH_MAX_FIELDS}"}), 400
+
+        normalized_fields = []
+        for position, field in enumerate(fields):
+            coordinates = field.get('coordinates') if isinstance(field, dict) else None
+            if not coordinates or len(coordinates) < 3:
+                return jsonify({"error": f"Field at position {position} must have at least three coordinates"}), 400
+            normalized_fields.append({'id': str(field.get('id', position)), 'coordinates': coordinates})
+
+        field_ids = [field['id'] for field in normalized_fields]
+        if len(set(field_ids)) != len(field_ids):
+            return jsonify({"error": "Field IDs must be unique within a batch"}), 400
+
+        index_names, _, index_error = resolve_index_names(data)
+        if index_error:
+            return jsonify(index_error), 400
 
         # ✅ Date validation - Sentinel-2 data has ~5 day delay
-        try:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-            today = datetime.now()
-            
-            # Check if end date is too recent (less than 5 days ago)
-            days_ago = (today - end_dt).days
-            if days_ago < 5:
-                return jsonify({
-                    "error": f"End date is too recent. Satellite data is typically delayed by 4-5 days. Please select a date before {(today - timedelta(days=5)).strftime('%Y-%m-%d')}",
-                    "suggested_end_date": (today - timedelta(days=5)).strftime('%Y-%m-%d')
-                }), 400
-                
-            # Check if date range is valid
-            if start_dt >= end_dt:
-                return jsonify({"error": "Start date must be before end date"}), 400
-                
-        except ValueError:
-            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+        date_error = validate_date_range(start_date, end_date)
+        if date_error:
+            return jsonify(date_error), 400
 
         # ✅ Check if Earth Engine is available
-        if not EE_INITIALIZED:
-            return jsonify({"error": "Google Earth Engine is not initialized. Please check service account configuration."}), 503
-
-        # Create AOI and apply a small positive buffer
-        aoi = ee.Geometry.Polygon([coordinates])
-        buffered_geom = aoi.buffer(10)  # Small positive buffer
-        print(f"✅ Buffered AOI for {index_name}:", buffered_geom.getInfo())
-
-        # Load Sentinel-2 SR collection with all required bands
-        collection = (ee.ImageCollection('COPERNICUS/S2_SR')
-                      .filterBounds(buffered_geom)
-                      .filterDate(start_date, end_date)
-                      .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-                      .filter(ee.Filter.notNull(['system:time_start']))
-                      .map(mask_clouds)
-                      .select(['B2', 'B4', 'B8', 'B11'])  # Blue, Red, NIR, SWIR
-                     )
-        
-        # Scale images and preserve properties
-        def scale_image(image):
-            return image.multiply(0.0001).copyProperties(image, ['system:time_start', 'system:index'])
-        collection = collection.map(scale_image)
-
-        coll_size = collection.size().getInfo()
-        print(f"Collection size for {index_name}:", coll_size)
-        if coll_size == 0:
-            return jsonify({"error": "No Sentinel-2 data available for the specified AOI and dates"}), 404
+        if not ee_ready():
+            return jsonify(ee_unavailable_error()), 503
 
-        # Compute the selected vegetation index for each image
-        def add_index(image):
-            try:
-                index_img = calculate_vegetation_index(image, index_name)
-                return image.addBands(index_img).copyProperties(image, ['system:time_start', 'system:index'])
-            except:
-                return image  # Skip if calculation fails
-        
-        index_collection = collection.map(add_index)
-
-        # Extract time series data
-        def extract_index_feature(image):
-            time_prop = image.get('system:time_start')
-            image_id = image.get('system:index')
-            formatted_date = ee.Algorithms.If(
-                ee.Algorithms.IsEqual(time_prop, None),
-                "null",
-                ee.Date(time_prop).format('YYYY-MM-dd')
-            )
-            
-            # Get the mean value for the selected index
-            index_dict = image.select(index_name).reduceRegion(
-                reducer=ee.Reducer.mean(),
-                geometry=buffered_geom,
-                scale=5,
-                bestEffort=True,
-                maxPixels=1e9
-            )
-            index_value = index_dict.get(index_name)
-            
-            return ee.Feature(None, {
-                'id': image_id,
-                'time_start': time_prop,
-                'date': formatted_date,
-                'index_name': index_name,
-                'value': index_value
-            })
+        scene_count, rows = fetch_batch_time_series(normalized_fields, start_date, end_date, index_names)
+        log('batch_time_series', level='debug', fields=len(normalized_fields), scenes=scene_count, rows=len(rows))
+        if scene_count == 0:
+            return jsonify({"error": "No Sentinel-2 data available for the specified fields and dates"}), 404
 
-        # Map over the collection
-        features = index_collection.map(extract_index_feature, dropNulls=True)
-        features = ee.FeatureCollection(features)
-        
-        try:
-            features_info = features.getInfo()
-            print(f"Mapped features info for {index_name} retrieved successfully.")
-        except Exception as inner_error:
-            print(f"❌ Error calling getInfo on {index_name} features:", inner_error)
-            raise
-
-        # Build the time series list
-        time_series = []
-        for f in features_info.get('features', []):
-            props = f.get('properties', {})
-            if props.get('date') and props.get('value') is not None:
-                time_series.append({
-                    'date': props.get('date'),
-                    'value': props.get('value'),
-                    'index_name': index_name
-                })
+        results = {
+            field_id: {'series': {name: [] for name in index_names}}
+            for field_id in field_ids
+        }
+        for row in sorted(rows, key=lambda row: (row.get('date') or '', row.get('scene_id') or '')):
+            field_result = results.get(str(row.get('field_id')))
+            if field_result is None:
+                continue
+            for name in index_names:
+                if row.get(name) is not None:
+                    field_result['series'][name].append({'date': row['date'], 'value': row[name]})
+
+        for field_result in results.values():
+            field_result['measurement_counts'] = {
+                name: len(points) for name, points in field_result['series'].items()
+            }
 
-        response = {
+        return jsonify({
             "status": "success",
-            "index_name": index_name,
-            "time_series": time_series,
-            "total_measurements": len(time_series)
-        }
-        return jsonify(response), 200
+            "index_names": index_names,
+            "start_date": start_date,
+            "end_date": end_date,
+            "scene_count": scene_count,
+            "total_fields": len(results),
+            "fields": results
+        }), 200
 
     except ee.EEException as e:
-        print("❌ Earth Engine Error:", str(e))
+        log('earth_engine_error', level='error', error=str(e))
         return jsonify({"error": f"Earth Engine Error: {str(e)}"}), 500
     except Exception as e:
-        print("❌ Internal server error:", str(e))
+        log('internal_error', level='error', error=str(e))
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 @app.route('/api/indices/list', methods=['GET'])
 def list_indices():
     """
     Return a list of available vegetation indices with their descriptions.
+    Built-in and custom (INDEX_REGISTRY_CONFIG) indices are listed alike.
     """
-    indices = {
-        'NDVI': {
-            'name': 'Normalized Difference Vegetation Index',
-            'formula': '(NIR - Red) / (NIR + Red)',
-            'description': 'Most common vegetation index, good for general vegetation health assessment',
-            'range': [-1, 1],
-            'optimal_range': [0.4, 0.7]
-        },
-        'EVI': {
-            'name': 'Enhanced Vegetation Index', 
-            'formula': '2.5 * ((NIR - Red) / (NIR + 6*Red - 7.5*Blue + 1))',
-            'description': 'Improved version of NDVI with atmospheric correction and reduced soil noise',
-            'range': [-1, 1],
-            'optimal_range': [0.3, 0.8]
-        },
-        'SAVI': {
-            'name': 'Soil-Adjusted Vegetation Index',
-            'formula': '((NIR - Red) / (NIR + Red + 0.5)) * 1.5',
-            'description': 'Reduces soil brightness influence, good for sparse vegetation',
-            'range': [-1, 1],
-            'optimal_range': [0.2, 0.6]
-        },
-        'ARVI': {
-            'name': 'Atmospherically Resistant Vegetation Index',
-            'formula': '(NIR - (2*Red - Blue)) / (NIR + (2*Red - Blue))',
-            'description': 'Reduces atmospheric effects, especially aerosol scattering',
-            'range': [-1, 1],
-            'optimal_range': [0.3, 0.7]
-        },
-        'MAVI': {
-            'name': 'Moisture-Adjusted Vegetation Index',
-            'formula': '(NIR - Red) / (NIR + Red + SWIR)',
-            'description': 'Incorporates moisture information from SWIR band',
-            'range': [-1, 1],
-            'optimal_range': [0.2, 0.6]
-        },
-        'SR': {
-            'name': 'Simple Ratio',
-            'formula': 'NIR / Red', 
-            'description': 'Basic ratio of NIR to Red, simple but effective',
-            'range': [0, 10],
-            'optimal_range': [2, 8]
-        }
-    }
+    indices = index_registry.describe()
     
     return jsonify({
         "status": "success",
@@ -694,6 +1200,67 @@ def list_indices():
         "total_count": len(indices)
     })
 
+@app.route('/api/band-store/fields', methods=['POST'])
+def export_band_store_field():
+    """
+    Export a field's Sentinel-2 chips to the local band store as a background job.
+    
+    Expected JSON payload:
+    {
+        "coordinates": [[lng, lat], [lng, lat], ...],
+        "start_date": "YYYY-MM-DD",
+        "end_date": "YYYY-MM-DD"
+    }
+    
+    Once the job succeeds, time series requests for this field and any date
+    range inside the exported span are computed locally.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No input data provided"}), 400
+
+    coordinates = data.get('coordinates')
+    start_date = data.get('start_date')
+    end_date = data.get('end_date')
+    if not coordinates or not start_date or not end_date:
+        return jsonify({"error": "Missing required fields: coordinates, start_date, end_date"}), 400
+    if len(coordinates) < 3:
+        return jsonify({"error": "AOI must have at least three coordinates"}), 400
+
+    date_error = validate_date_range(start_date, end_date)
+    if date_error:
+        return jsonify(date_error), 400
+
+    if not ee_ready():
+        return jsonify(ee_unavailable_error()), 503
+
+    def run_export(job):
+        chips = band_store.export(coordinates, start_date, end_date, report_progress=job.report_progress)
+        return {"status": "success", "field": chips.describe()}, 200
+
+    try:
+        job = job_manager.submit(
+            'band_store.export', run_export,
+            payload={'field_key': polygon_hash(coordinates), 'start_date': start_date, 'end_date': end_date}
+        )
+    except QueueFullError as e:
+        return jsonify({"error": f"Too many analyses queued, try again later ({e})"}), 429
+    return jsonify({
+        "status": "accepted",
+        "job_id": job.id,
+        "status_url": f"/api/jobs/{job.id}"
+    }), 202
+
+@app.route('/api/band-store/fields', methods=['GET'])
+def list_band_store_fields():
+    """List the fields held in the local band store."""
+    fields = band_store.fields()
+    return jsonify({
+        "status": "success",
+        "fields": fields,
+        "total_count": len(fields)
+    })
+
 @app.route('/api/crop-recommendations', methods=['POST'])
 def get_ai_crop_recommendations():
     """
@@ -720,9 +1287,17 @@ def get_ai_crop_recommendations():
             "ndvi": 0.65,
             "soil_health": "Good",
             "prev_performance": "Above average"
-        }
+        },
+        "use_cache": true,
+        "prompt_mode": "compact"
     }
+    
+    Equivalent requests (same inputs after rounding and normalization, same
+    season and prompt mode) are answered from a cache and carry "cached": true.
+    prompt_mode is "verbose" or "compact" and defaults to AI_PROMPT_MODE;
+    both return the same response shape.
     """
+    field_data = weather_data = vegetation_data = None
     try:
         data = request.get_json()
         if not data:
@@ -737,30 +1312,188 @@ def get_ai_crop_recommendations():
             
         # Generate AI recommendations
         if AI_SERVICE_AVAILABLE:
+            try:
+                prompt_mode = resolve_prompt_mode(data.get('prompt_mode'))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
             recommendations = generate_ai_crop_recommendations(
                 field_data=field_data,
                 weather_data=weather_data,
-                vegetation_data=vegetation_data
+                vegetation_data=vegetation_data,
+                use_cache=data.get('use_cache', True),
+                prompt_mode=prompt_mode
             )
         else:
-            recommendations = get_fallback_recommendations()
+            recommendations = get_fallback_recommendations(field_data, weather_data, vegetation_data)
+        if recommendations.get('error') and recommendations.get('fallback') is True:
+            # Gemini failed: answer with the local ranking instead of a bare flag
+            recommendations = dict(
+                recommendations, fallback=get_fallback_recommendations(field_data, weather_data, vegetation_data)
+            )
             
         return jsonify(recommendations), 200
         
     except Exception as e:
-        print(f"❌ Error generating crop recommendations: {e}")
+        log('crop_recommendations_failed', level='error', error=str(e))
         return jsonify({
             "error": f"Failed to generate recommendations: {str(e)}",
-            "fallback": get_fallback_recommendations()
+            "fallback": get_fallback_recommendations(field_data, weather_data, vegetation_data)
         }), 500
 
+@app.route('/api/crop-recommendations/stream', methods=['POST'])
+def stream_ai_crop_recommendations_sse():
+    """
+    Crop recommendations streamed over Server-Sent Events while Gemini generates them.
+    
+    Accepts the same payload as /api/crop-recommendations. Events:
+        started  - {"cached": bool}
+        preliminary - {"recommended_crops": [...]} from the local scoring engine, sent
+                   immediately while Gemini is still generating
+        section  - {"key": "land_analysis", "value": {...}} per finished top-level section
+        crop     - {"index": 0, "value": {...}} per finished recommended_crops item
+        done     - {"result": {...}} with the same body /api/crop-recommendations returns
+        error    - {"error": "...", "fallback": {...}}
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No input data provided"}), 400
+
+    field_data = data.get('field_data', {})
+    if not field_data:
+        return jsonify({"error": "Field data is required"}), 400
+
+    prompt_mode = None
+    if AI_SERVICE_AVAILABLE:
+        try:
+            prompt_mode = resolve_prompt_mode(data.get('prompt_mode'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    weather_data, vegetation_data = data.get('weather_data'), data.get('vegetation_data')
+
+    def generate():
+        if not AI_SERVICE_AVAILABLE:
+            yield format_stream_record({
+                "type": "done", "result": get_fallback_recommendations(field_data, weather_data, vegetation_data)
+            }, 'sse')
+            return
+        try:
+            for event in stream_ai_crop_recommendations(
+                field_data, weather_data, vegetation_data,
+                use_cache=data.get('use_cache', True), prompt_mode=prompt_mode
+            ):
+                if event['type'] == 'error':
+                    event = dict(event, fallback=get_fallback_recommendations(field_data, weather_data, vegetation_data))
+                yield format_stream_record(event, 'sse')
+        except Exception as e:
+            log('crop_recommendation_stream_failed', level='error', error=str(e))
+            yield format_stream_record({
+                "type": "error",
+                "error": f"Failed to generate recommendations: {str(e)}",
+                "fallback": get_fallback_recommendations(field_data, weather_data, vegetation_data)
+            }, 'sse')
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/crop-recommendations/batch', methods=['POST'])
+def batch_crop_recommendations():
+    """
+    Crop recommendations for many fields, streamed back per field as they finish.
+    
+    Expected JSON payload:
+    {
+        "fields": [{"id": "field-1", "field_data": {...}, "weather_data": {...}, "vegetation_data": {...}}, ...],
+        "weather_data": {...},     (optional default for fields without their own)
+        "vegetation_data": {...},  (optional default)
+        "prompt_mode": "compact",  (default; several fields share one Gemini call)
+        "use_cache": true,
+        "format": "ndjson" (default) or "sse"
+    }
+    
+    Identical fields are answered once. Emits one {"type": "field", "id", "result",
+    "duplicate"} record per field in completion order (failed fields carry a
+    locally ranked "fallback"), then {"type": "done", ...} with batch totals.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No input data provided"}), 400
+
+    fields = data.get('fields')
+    if not fields or not isinstance(fields, list):
+        return jsonify({"error": "fields must be a non-empty list"}), 400
+    if len(fields) > BATCH_MAX_FIELDS:
+        return jsonify({"error": f"Too many fields: {len(fields)}. Maximum per batch is {BATCH_MAX_FIELDS}"}), 400
+
+    stream_format = data.get('format', 'ndjson')
+    if stream_format not in ('ndjson', 'sse'):
+        return jsonify({"error": "format must be 'ndjson' or 'sse'"}), 400
+
+    items = []
+    for position, field in enumerate(fields):
+        field_data = field.get('field_data') if isinstance(field, dict) else None
+        if not field_data or not isinstance(field_data, dict):
+            return jsonify({"error": f"Field at position {position} must have field_data"}), 400
+        items.append({
+            'id': str(field.get('id', position)),
+            'field_data': field_data,
+            'weather_data': field.get('weather_data', data.get('weather_data')),
+            'vegetation_data': field.get('vegetation_data', data.get('vegetation_data'))
+        })
+    field_ids = [item['id'] for item in items]
+    if len(set(field_ids)) != len(field_ids):
+        return jsonify({"error": "Field IDs must be unique within a batch"}), 400
+
+    if not AI_SERVICE_AVAILABLE:
+        return jsonify({"error": "AI service not available"}), 503
+    try:
+        prompt_mode = resolve_prompt_mode(data.get('prompt_mode', 'compact'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    items_by_id = {item['id']: item for item in items}
+
+    def generate():
+        try:
+            for event in batch_ai_crop_recommendations(
+                items, use_cache=data.get('use_cache', True), prompt_mode=prompt_mode
+            ):
+                if event['type'] == 'field' and event['result'].get('status') != 'success':
+                    item = items_by_id[event['id']]
+                    event = dict(event, result=dict(event['result'], fallback=get_fallback_recommendations(
+                        item['field_data'], item['weather_data'], item['vegetation_data']
+                    )))
+                yield format_stream_record(event, stream_format)
+        except Exception as e:
+            log('batch_crop_recommendations_failed', level='error', error=str(e))
+            yield format_stream_record({"type": "error", "error": f"Batch failed: {str(e)}"}, stream_format)
+
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/crop-recommendations/cache', methods=['GET'])
+def crop_recommendation_cache_stats():
+    """Hit/miss statistics of the crop recommendation cache."""
+    if not AI_SERVICE_AVAILABLE:
+        return jsonify({"error": "AI service not available"}), 503
+    return jsonify({
+        "status": "success",
+        "cache": recommendation_cache_stats()
+    }), 200
+
 @app.route('/debug/auth', methods=['GET'])
 def debug_auth():
     """Debug endpoint to check authentication status"""
     service_account_key = os.getenv('GOOGLE_SERVICE_ACCOUNT_KEY')
     
     debug_info = {
-        "earth_engine_initialized": EE_INITIALIZED,
+        "earth_engine_initialized": ee_initializer.ready,
+        "earth_engine": ee_initializer.status(),
         "service_account_key_present": bool(service_account_key),
         "service_account_key_length": len(service_account_key) if service_account_key else 0,
     }
@@ -783,22 +1516,24 @@ def debug_auth():
 def debug_ndvi_stats(lat, lng):
     """Debug endpoint to analyze NDVI statistics for a point"""
     try:
-        # Initialize Earth Engine if not already done
-        if not hasattr(app, 'ee_initialized'):
-            initialize_ee()
+        if not ee_ready():
+            return jsonify(ee_unavailable_error()), 503
         
         # Create point geometry with buffer
         point = ee.Geometry.Point([lng, lat])
         aoi = point.buffer(100)  # 100m buffer for analysis
         
-        # Get recent date range
-        end_date = ee.Date(datetime.now().strftime('%Y-%m-%d'))
-        start_date = end_date.advance(-30, 'day')
+        # Get recent date range (computed locally, no round trip needed)
+        end_day = datetime.now()
+        date_range = {
+            'start': (end_day - timedelta(days=30)).strftime('%Y-%m-%d'),
+            'end': end_day.strftime('%Y-%m-%d')
+        }
         
         # Get Sentinel-2 collection
         collection = ee.ImageCollection('COPERNICUS/S2_SR') \
                       .filterBounds(aoi) \
-                      .filterDate(start_date, end_date) \
+                      .filterDate(date_range['start'], date_range['end']) \
                       .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
         
         # Calculate NDVI for most recent image
@@ -819,36 +1554,33 @@ def debug_ndvi_stats(lat, lng):
                 maxPixels=1e9
             )
             
-            return {
-                'date': image.date().format('YYYY-MM-dd').getInfo(),
-                'stats': stats.getInfo()
-            }
+            return ee.Dictionary({
+                'date': image.date().format('YYYY-MM-dd'),
+                'stats': stats
+            })
         
-        # Get collection info
-        collection_size = collection.size().getInfo()
+        # Collection size and most recent image stats in a single round trip
+        collection_size = collection.size()
+        most_recent = collection.sort('system:time_start', False).first()
+        plan_info = get_info(ee.Dictionary({
+            'collection_size': collection_size,
+            'most_recent_image': ee.Algorithms.If(
+                collection_size.gt(0), calculate_ndvi_stats(most_recent), None
+            )
+        }))
         
-        if collection_size == 0:
+        if plan_info['collection_size'] == 0:
             return jsonify({
                 'error': 'No Sentinel-2 images found for this location and date range',
                 'location': {'lat': lat, 'lng': lng},
-                'date_range': {
-                    'start': start_date.format('YYYY-MM-dd').getInfo(),
-                    'end': end_date.format('YYYY-MM-dd').getInfo()
-                }
+                'date_range': date_range
             })
         
-        # Get stats for the most recent image
-        most_recent = collection.sort('system:time_start', False).first()
-        ndvi_stats = calculate_ndvi_stats(most_recent)
-        
         return jsonify({
             'location': {'lat': lat, 'lng': lng},
-            'date_range': {
-                'start': start_date.format('YYYY-MM-dd').getInfo(),
-                'end': end_date.format('YYYY-MM-dd').getInfo()
-            },
-            'collection_size': collection_size,
-            'most_recent_image': ndvi_stats,
+            'date_range': date_range,
+            'collection_size': plan_info['collection_size'],
+            'most_recent_image': plan_info['most_recent_image'],
             'analysis': {
                 'note': 'Healthy vegetation typically shows NDVI values between 0.4-0.7',
                 'interpretation': 'Values below 0.3 may indicate stressed vegetation, bare soil, or water'
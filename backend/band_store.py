@@ -0,0 +1,379 @@
+import os
+import json
+import math
+import uuid
+import bisect
+import shutil
+from datetime import datetime, timedelta, timezone
+
+import ee
+import numpy as np
+
+from cache import TTLCache
+from ee_ops import compute_pixels, get_info
+from metrics import cache_observer
+from geometry import canonicalize_polygon, polygon_hash
+from index_registry import EXPRESSION_BANDS
+from reduction import AOI_BUFFER_METERS
+from timeseries_cache import SETTLE_DAYS
+from tracing import log
+from vegetation_indices import compute_indices
+from zonal_stats import DEFAULT_PERCENTILES, ZonalStats, gather, reduce_values
+
+BAND_STORE_DIR = os.getenv(
+    'BAND_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'band_store')
+)
+
+# Every band an index formula can reference, plus the scene classification
+# used for cloud masking
+STORE_BANDS = list(EXPRESSION_BANDS.values()) + ['SCL']
+
+# Raw Sentinel-2 L2A value for missing pixels
+NODATA = 0
+
+# SCL classes masked out: no data, cloud shadow, cirrus, cloud, high-probability cloud
+MASKED_SCL_CLASSES = (0, 3, 8, 9, 10)
+
+# Same scene filter as the Earth Engine time series pipeline
+MAX_CLOUDY_PIXEL_PERCENTAGE = 20
+
+CHIP_SCALE_METERS = 10
+
+# computePixels responses are capped at 48 MB; stay well below it
+EXPORT_MAX_BYTES = 32 * 1024 * 1024
+
+def _float_or_none(value):
+    return None if np.isnan(value) else float(value)
+
+def _scene_order(scene):
+    """Sort key for stored scenes: by date, then acquisition time and ID."""
+    return scene['date'], scene['time_start'], scene['id']
+
+def chip_grid(coordinates, scale=CHIP_SCALE_METERS, buffer_meters=AOI_BUFFER_METERS):
+    """
+    Lng/lat pixel grid covering a polygon and its buffer at roughly `scale`
+    meters per pixel.
+
+    Returns:
+        Tuple of (bounds [west, south, east, north], (height, width))
+    """
+    ring = canonicalize_polygon(coordinates)
+    lngs = [point[0] for point in ring]
+    lats = [point[1] for point in ring]
+    center_lat = (min(lats) + max(lats)) / 2
+    pixel_lat = scale / 110574.0
+    pixel_lng = scale / (111320.0 * max(math.cos(math.radians(center_lat)), 1e-6))
+
+    # The buffer plus one pixel of padding so edge pixels are fully covered
+    pad_lng = pixel_lng * (1 + buffer_meters / scale)
+    pad_lat = pixel_lat * (1 + buffer_meters / scale)
+    west = min(lngs) - pad_lng
+    north = max(lats) + pad_lat
+    width = int(math.ceil((max(lngs) + pad_lng - west) / pixel_lng))
+    height = int(math.ceil((north - (min(lats) - pad_lat)) / pixel_lat))
+    bounds = [west, north - height * pixel_lat, west + width * pixel_lng, north]
+    return bounds, (height, width)
+
+class FieldChips:
+    """
+    Read-only view of one field's stored chips.
+
+    `bands` is a memory-mapped (scene, band, row, col) uint16 array and every
+    accessor returns views into it, so reading a scene or a date window
+    never copies pixel data.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            self.meta = json.load(meta_file)
+        self.path = path
+        self.bands = np.load(os.path.join(path, 'bands.npy'), mmap_mode='r')
+        self.band_names = self.meta['bands']
+        self.dates = [scene['date'] for scene in self.meta['scenes']]
+
+    @property
+    def scenes(self):
+        return self.meta['scenes']
+
+    def covers(self, start_date, end_date):
+        """True when every scene in [start_date, end_date) was exported."""
+        return self.meta['start'] <= start_date and end_date <= self.meta['end']
+
+    def date_range(self, start_date, end_date):
+        """Scene positions (first, stop) for [start_date, end_date)."""
+        return bisect.bisect_left(self.dates, start_date), bisect.bisect_left(self.dates, end_date)
+
+    def window(self, start_date, end_date):
+        """Zero-copy (scene, band, row, col) view of the scenes in [start_date, end_date)."""
+        first, stop = self.date_range(start_date, end_date)
+        return self.bands[first:stop]
+
+    def scene_bands(self, position):
+        """Dict of band name -> (row, col) view for one scene."""
+        scene = self.bands[position]
+        return {name: scene[i] for i, name in enumerate(self.band_names)}
+
+    def clear_mask(self, position):
+        """Pixels of one scene that are not cloud, shadow or missing."""
+        scl = self.bands[position, self.band_names.index('SCL')]
+        return ~np.isin(scl, MASKED_SCL_CLASSES)
+
+    def describe(self):
+        return {
+            'field_key': self.meta['field_key'],
+            'start_date': self.meta['start'],
+            'end_date': self.meta['end'],
+            'scene_count': len(self.dates),
+            'bands': self.band_names,
+            'shape': list(self.bands.shape[2:]),
+            'bounds': self.meta['bounds'],
+            'created_at': self.meta.get('created_at')
+        }
+
+class BandStore:
+    """
+    On-disk store of per-field Sentinel-2 chips for local index computation.
+
+    Each field lives in <root>/<polygon hash>/ as bands.npy (scenes sorted by
+    acquisition time) and meta.json (polygon, scene IDs, dates, grid bounds
+    and the exported date span). Fields are
+    rewritten as a whole and swapped in with a rename, so readers never see
+    a half-written field.
+
+    Args:
+        root: Directory holding the fields
+        max_open: Number of opened fields kept mapped
+    """
+
+    def __init__(self, root=BAND_STORE_DIR, max_open=64):
+        self.root = root
+        self._open = TTLCache(maxsize=max_open, on_lookup=cache_observer('band_store_fields'))
+        self.zonal = ZonalStats()
+
+    def _field_path(self, field_key):
+        return os.path.join(self.root, field_key)
+
+    def open(self, coordinates):
+        """Return the FieldChips for a polygon, or None if it has not been exported."""
+        field_key = polygon_hash(coordinates)
+        meta_path = os.path.join(self._field_path(field_key), 'meta.json')
+        try:
+            stat = os.stat(meta_path)
+            version = (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            return None
+        chips, _ = self._open.get_or_load((field_key, version), lambda: FieldChips(self._field_path(field_key)))
+        return chips
+
+    def covers(self, coordinates, start_date, end_date):
+        chips = self.open(coordinates)
+        return chips is not None and chips.covers(start_date, end_date)
+
+    def write(self, coordinates, scenes, bands, bounds, start_date, end_date):
+        """
+        Store chips for a field, replacing anything stored before.
+
+        Args:
+            coordinates: List of [lng, lat] pairs describing the field
+            scenes: List of dicts with 'id', 'date' and 'time_start', one per chip
+            bands: uint16 array of shape (scene, len(STORE_BANDS), row, col)
+            bounds: Grid extent as [west, south, east, north]
+            start_date: Inclusive start of the exported span, 'YYYY-MM-DD'
+            end_date: Exclusive end of the exported span, 'YYYY-MM-DD'
+
+        Returns:
+            FieldChips for the new data
+        """
+        if len(scenes) != len(bands):
+            raise ValueError(f"Got {len(scenes)} scenes for {len(bands)} chips")
+        order = sorted(range(len(scenes)), key=lambda i: _scene_order(scenes[i]))
+
+        def fill(stored):
+            for position, i in enumerate(order):
+                stored[position] = bands[i]
+
+        return self._store(coordinates, [scenes[i] for i in order], np.shape(bands)[1:],
+                           bounds, start_date, end_date, fill)
+
+    def _store(self, coordinates, scenes, chip_shape, bounds, start_date, end_date, fill):
+        """
+        Stage a field, let fill() write its chips, then swap it in.
+
+        Args:
+            scenes: Scenes in stored (date) order
+            chip_shape: Shape of one scene's chip, (len(STORE_BANDS), row, col)
+            fill: Callable given the staged (scene, band, row, col) memmap to write into
+
+        Returns:
+            FieldChips for the new data
+        """
+        field_key = polygon_hash(coordinates)
+        os.makedirs(self.root, exist_ok=True)
+        staging = os.path.join(self.root, f".{field_key}.{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        try:
+            stored = np.lib.format.open_memmap(
+                os.path.join(staging, 'bands.npy'), mode='w+', dtype=np.uint16,
+                shape=(len(scenes),) + tuple(chip_shape)
+            )
+            fill(stored)
+            stored.flush()
+            del stored
+
+            meta = {
+                'field_key': field_key,
+                'coordinates': canonicalize_polygon(coordinates),
+                'bands': STORE_BANDS,
+                'bounds': list(bounds),
+                'start': start_date,
+                'end': end_date,
+                'scenes': [{key: scene[key] for key in ('id', 'date', 'time_start')} for scene in scenes],
+                'created_at': datetime.now().isoformat()
+            }
+            with open(os.path.join(staging, 'meta.json'), 'w') as meta_file:
+                json.dump(meta, meta_file)
+
+            target = self._field_path(field_key)
+            if os.path.exists(target):
+                retired = f"{staging}.old"
+                os.rename(target, retired)
+                os.rename(staging, target)
+                shutil.rmtree(retired, ignore_errors=True)
+            else:
+                os.rename(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        return self.open(coordinates)
+
+    def fields(self):
+        """Summaries of every stored field."""
+        if not os.path.isdir(self.root):
+            return []
+        summaries = []
+        for name in sorted(os.listdir(self.root)):
+            if name.startswith('.'):
+                continue
+            try:
+                summaries.append(FieldChips(self._field_path(name)).describe())
+            except (OSError, ValueError, KeyError) as e:
+                log('band_store_field_unreadable', level='warning', field=name, error=str(e))
+        return summaries
+
+    def time_series(self, coordinates, start_date, end_date, index_names, percentiles=DEFAULT_PERCENTILES):
+        """
+        Zonal statistics of each index per stored scene, computed locally.
+
+        Mirrors the Earth Engine pipeline: the field is buffered by
+        AOI_BUFFER_METERS and cloud, shadow and missing pixels are masked.
+        Only the pixels under the buffered field's cached zonal mask are read
+        and evaluated, and edge pixels count by the fraction of them inside
+        it. Values are reduced at the chips' CHIP_SCALE_METERS.
+
+        Returns:
+            Dict of index name -> list of scenes ('id', 'date', 'time_start',
+            'value' and 'stats' with the valid pixel count, covered area and
+            percentiles), or None when the store does not cover the range
+        """
+        chips = self.open(coordinates)
+        if chips is None or not chips.covers(start_date, end_date):
+            return None
+
+        mask = self.zonal.mask(chips.meta['coordinates'], chips.meta['bounds'], chips.bands.shape[2:], AOI_BUFFER_METERS)
+        first, stop = chips.date_range(start_date, end_date)
+        pixels = gather(mask, chips.bands[first:stop])  # (scene, band, pixel)
+        clear = ~np.isin(pixels[:, chips.band_names.index('SCL')], MASKED_SCL_CLASSES)
+        bands = {name: pixels[:, i] for i, name in enumerate(chips.band_names) if name != 'SCL'}
+        results = compute_indices(index_names, bands, mask=clear, nodata=NODATA)
+
+        per_index = {}
+        for name in index_names:
+            stats = reduce_values(results[name], mask.weights, percentiles)
+            scenes = []
+            for offset, scene in enumerate(chips.scenes[first:stop]):
+                scene_stats = {
+                    'pixel_count': int(stats['count'][offset]),
+                    'covered_pixels': round(float(stats['coverage'][offset]), 4)
+                }
+                for percentile in percentiles:
+                    scene_stats[f"p{percentile}"] = _float_or_none(stats[f"p{percentile}"][offset])
+                scenes.append({
+                    'id': scene['id'],
+                    'date': scene['date'],
+                    'time_start': scene['time_start'],
+                    'value': _float_or_none(stats['mean'][offset]),
+                    'stats': scene_stats
+                })
+            per_index[name] = scenes
+        return per_index
+
+    def export(self, coordinates, start_date, end_date, report_progress=None):
+        """
+        Download chips for every Sentinel-2 scene in [start_date, end_date)
+        from Earth Engine and store them.
+
+        Scenes are fetched with computePixels, several scenes per request.
+        The stored span stops SETTLE_DAYS before today because later scenes
+        may still be ingested.
+
+        Args:
+            report_progress: Optional callable(fraction, message)
+
+        Returns:
+            FieldChips for the stored field
+        """
+        aoi = ee.Geometry.Polygon([coordinates])
+        collection = (ee.ImageCollection('COPERNICUS/S2_SR')
+                      .filterBounds(aoi)
+                      .filterDate(start_date, end_date)
+                      .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', MAX_CLOUDY_PIXEL_PERCENTAGE))
+                      .filter(ee.Filter.notNull(['system:time_start'])))
+        listing = get_info(ee.Dictionary({
+            'ids': collection.aggregate_array('system:index'),
+            'times': collection.aggregate_array('system:time_start')
+        }))
+        scenes = [
+            {
+                'id': scene_id,
+                'date': datetime.fromtimestamp(time_start / 1000, tz=timezone.utc).strftime('%Y-%m-%d'),
+                'time_start': time_start
+            }
+            for scene_id, time_start in zip(listing.get('ids') or [], listing.get('times') or [])
+        ]
+
+        bounds, (height, width) = chip_grid(coordinates)
+        grid = {
+            'dimensions': {'width': width, 'height': height},
+            'affineTransform': {
+                'scaleX': (bounds[2] - bounds[0]) / width, 'shearX': 0, 'translateX': bounds[0],
+                'shearY': 0, 'scaleY': -(bounds[3] - bounds[1]) / height, 'translateY': bounds[3]
+            },
+            'crsCode': 'EPSG:4326'
+        }
+        scenes.sort(key=_scene_order)
+        scenes_per_request = max(1, EXPORT_MAX_BYTES // (len(STORE_BANDS) * 2 * height * width))
+
+        # Each batch is written straight into the staged file, so memory stays
+        # at one request's worth of pixels however many scenes there are
+        def fill(stored):
+            for first in range(0, len(scenes), scenes_per_request):
+                if report_progress:
+                    report_progress(first / max(len(scenes), 1), f"Downloading scenes {first + 1}-{min(first + scenes_per_request, len(scenes))} of {len(scenes)}")
+                batch = scenes[first:first + scenes_per_request]
+                image = ee.Image.cat([
+                    ee.Image(f"COPERNICUS/S2_SR/{scene['id']}")
+                    .select(STORE_BANDS)
+                    .unmask(NODATA)
+                    .toUint16()
+                    .rename([f"s{offset}_{band}" for band in STORE_BANDS])
+                    for offset, scene in enumerate(batch)
+                ])
+                pixels = compute_pixels({'expression': image, 'fileFormat': 'NUMPY_NDARRAY', 'grid': grid})
+                for offset in range(len(batch)):
+                    for band_position, band in enumerate(STORE_BANDS):
+                        stored[first + offset, band_position] = pixels[f"s{offset}_{band}"]
+
+        settled = (datetime.now() - timedelta(days=SETTLE_DAYS)).strftime('%Y-%m-%d')
+        return self._store(coordinates, scenes, (len(STORE_BANDS), height, width),
+                           bounds, start_date, min(end_date, settled), fill)
@@ -0,0 +1,43 @@
+import time
+
+import ai_crop_service
+from ai_crop_service import PROMPT_MODES, build_prompt, parse_model_response
+
+# Compares the verbose and compact prompt modes: prompt tokens, output tokens
+# and wall time per request. Without GEMINI_API_KEY only prompt sizes are
+# reported (approximate tokens at ~4 characters per token).
+# Usage: python bench_prompt_modes.py
+
+FIELDS = [
+    ({'location': 'Nashik, Maharashtra', 'area': '2.5', 'soil_type': 'Black Cotton Soil', 'soil_ph': 7.2,
+      'irrigation': 'Drip irrigation', 'experience': '5 years', 'budget': 'Rs. 50,000'},
+     {'avg_temp': 28, 'rainfall': 650, 'humidity': 75, 'pattern': 'Normal monsoon expected'},
+     {'ndvi': 0.65, 'health_status': 'Good'}),
+    ({'location': 'Ludhiana, Punjab', 'area': '6', 'soil_type': 'loamy', 'irrigation': 'canal'}, None, None),
+    ({'location': 'Guntur, Andhra Pradesh', 'area': '1.2', 'soil_type': 'red soil', 'budget': 'low'},
+     {'avg_temp': 31, 'rainfall': 820}, {'ndvi': 0.42, 'soil_moisture': 'Low'}),
+]
+
+live = ai_crop_service.model is not None
+print(f"🧪 Prompt mode benchmark ({len(FIELDS)} fields, {'live Gemini calls' if live else 'prompt sizes only'})")
+
+for prompt_mode in PROMPT_MODES:
+    prompt_tokens, output_tokens, seconds, complete = [], [], [], 0
+    for field_data, weather_data, vegetation_data in FIELDS:
+        prompt, generation_options = build_prompt(field_data, weather_data, vegetation_data, prompt_mode)
+        if not live:
+            prompt_tokens.append(len(prompt) / 4)
+            continue
+        prompt_tokens.append(ai_crop_service.model.count_tokens(prompt).total_tokens)
+        start = time.perf_counter()
+        response = ai_crop_service.model.generate_content(prompt, **generation_options)
+        seconds.append(time.perf_counter() - start)
+        output_tokens.append(response.usage_metadata.candidates_token_count)
+        recommendations = parse_model_response(response.text, prompt_mode)
+        complete += len(recommendations.get('recommended_crops') or []) > 0
+
+    line = f"   {prompt_mode:<8} prompt {sum(prompt_tokens) / len(prompt_tokens):7.0f} tokens"
+    if live:
+        line += (f"  output {sum(output_tokens) / len(output_tokens):7.0f} tokens"
+                 f"  {sum(seconds) / len(seconds):6.2f} s/request  {complete}/{len(FIELDS)} with crops")
+    print(line)
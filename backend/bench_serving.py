@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+from flask import Flask, jsonify
+
+from serving import gevent_active, offload, serving_stats
+
+# Compares the sync and gevent serving modes on a request shaped like a field
+# analysis: one network wait standing in for an Earth Engine getInfo and one
+# thread-blocking wait standing in for a Gemini gRPC call. Each mode runs
+# gunicorn -c gunicorn.conf.py with one worker, like the Render deployment.
+# Usage: python bench_serving.py
+
+EE_LATENCY = 0.2        # seconds the fake Earth Engine endpoint takes to answer
+GEMINI_LATENCY = 0.2    # seconds the fake model call blocks its thread
+REQUESTS = 60
+CONCURRENCY = 30
+PORT = 5057
+
+# ✅ Bench app (imported by gunicorn as bench_serving:app)
+app = Flask(__name__)
+
+def blocking_model_call(seconds):
+    # The unpatched sleep blocks the OS thread, like a gRPC call does under gevent
+    if gevent_active():
+        from gevent import monkey
+        monkey.get_original('time', 'sleep')(seconds)
+    else:
+        time.sleep(seconds)
+
+@app.route('/analysis')
+def analysis():
+    offload(requests.get, os.environ['BENCH_UPSTREAM'], timeout=30)
+    offload(blocking_model_call, GEMINI_LATENCY)
+    return jsonify(serving_stats())
+
+class SlowUpstream(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(EE_LATENCY)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+def run_mode(mode, upstream_url):
+    env = dict(os.environ, SERVING_MODE=mode, PORT=str(PORT), WEB_CONCURRENCY='1', BENCH_UPSTREAM=upstream_url)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'bench_serving:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{PORT}/analysis"
+    try:
+        wait_until_up(url)
+
+        def timed_request(_):
+            start = time.perf_counter()
+            response = requests.get(url, timeout=120)
+            return time.perf_counter() - start, response.json()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            results = list(pool.map(timed_request, range(REQUESTS)))
+        seconds = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = np.array([latency for latency, _ in results])
+    peak = max(stats['offload']['peak_in_flight'] for _, stats in results)
+    print(f"   {mode:<7} {seconds:7.2f} s  {REQUESTS / seconds:7.1f} req/s  "
+          f"p50 {np.percentile(latencies, 50):6.2f} s  p95 {np.percentile(latencies, 95):6.2f} s  "
+          f"peak offloaded calls {peak}")
+
+if __name__ == '__main__':
+    upstream = ThreadingHTTPServer(('127.0.0.1', 0), SlowUpstream)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    upstream_url = f"http://127.0.0.1:{upstream.server_address[1]}/"
+
+    print(f"🧪 Serving benchmark ({REQUESTS} requests, {CONCURRENCY} concurrent, "
+          f"{EE_LATENCY}s EE wait + {GEMINI_LATENCY}s model call, 1 gunicorn worker)")
+    for mode in ('sync', 'gevent'):
+        run_mode(mode, upstream_url)
+    upstream.shutdown()
@@ -0,0 +1,35 @@
+import time
+import numpy as np
+
+from index_registry import EXPRESSION_BANDS, index_registry
+from vegetation_indices import compute_index, compute_indices
+
+# Throughput benchmark for the local vegetation index engine.
+# Usage: python bench_vegetation_indices.py
+
+SIZE = 2048  # 2048 x 2048 = ~4.2 megapixels, roughly a 20 km x 20 km Sentinel-2 chip
+REPEATS = 5
+
+def best_of(fn, repeats=REPEATS):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+rng = np.random.default_rng(0)
+bands = {band: rng.integers(0, 10000, size=(SIZE, SIZE), dtype=np.uint16) for band in EXPRESSION_BANDS.values()}
+mask = rng.random((SIZE, SIZE)) > 0.1
+megapixels = SIZE * SIZE / 1e6
+
+print(f"🧪 Vegetation index engine benchmark ({megapixels:.1f} MP, best of {REPEATS})")
+for dtype in (np.float64, np.float32):
+    print(f"\n📊 dtype={np.dtype(dtype).name}")
+    for index_name in index_registry.names():
+        seconds = best_of(lambda: compute_index(index_name, bands, mask=mask, nodata=0, dtype=dtype))
+        print(f"   {index_name:<5} {megapixels / seconds:8.1f} MP/s")
+
+    all_indices = index_registry.names()
+    seconds = best_of(lambda: compute_indices(all_indices, bands, mask=mask, nodata=0, dtype=dtype))
+    print(f"   all {len(all_indices)} {megapixels / seconds:8.1f} MP/s ({megapixels * len(all_indices) / seconds:.1f} index-MP/s)")
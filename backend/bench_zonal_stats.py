@@ -0,0 +1,55 @@
+import time
+import numpy as np
+
+from zonal_stats import ZonalStats, rasterize, reduce, reduce_many
+
+# Benchmark for local zonal statistics over thousands of fields.
+# Usage: python bench_zonal_stats.py
+
+SIZE = 2048          # 2048 x 2048 pixels at 10 m, roughly a 20 km x 20 km tile
+SCENES = 4
+FIELD_COUNT = 5000
+PIXEL_DEGREES = 10 / 111320.0
+
+rng = np.random.default_rng(0)
+bounds = [77.0, 12.0, 77.0 + SIZE * PIXEL_DEGREES, 12.0 + SIZE * PIXEL_DEGREES]
+stack = rng.random((SCENES, SIZE, SIZE), dtype=np.float32)
+stack[:, rng.random((SIZE, SIZE)) < 0.05] = np.nan  # ~5% masked pixels
+
+def random_field():
+    # Irregular quadrilateral of roughly 50-300 m across
+    center = rng.uniform([bounds[0], bounds[1]], [bounds[2], bounds[3]])
+    radius = rng.uniform(25, 150) * PIXEL_DEGREES / 10
+    angles = np.sort(rng.uniform(0, 2 * np.pi, 4))
+    return [[float(center[0] + radius * np.cos(a)), float(center[1] + radius * np.sin(a))] for a in angles]
+
+fields = [random_field() for _ in range(FIELD_COUNT)]
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    print(f"   {label:<38} {seconds * 1000:9.1f} ms  {FIELD_COUNT / seconds:10.0f} fields/s")
+    return result
+
+print(f"🧪 Zonal statistics benchmark ({FIELD_COUNT} fields, {SCENES} scenes of {SIZE}x{SIZE})")
+
+timed("rasterize every request + reduce", lambda: [
+    reduce(rasterize(field, bounds, (SIZE, SIZE)), stack, percentiles=None) for field in fields
+])
+
+zonal = ZonalStats(maxsize=FIELD_COUNT)
+timed("first pass (fills mask cache)", lambda: [
+    zonal.reduce(field, bounds, stack, percentiles=None) for field in fields
+])
+timed("cached masks, per-field reduce", lambda: [
+    zonal.reduce(field, bounds, stack, percentiles=None) for field in fields
+])
+timed("cached masks, per-field + percentiles", lambda: [
+    zonal.reduce(field, bounds, stack) for field in fields
+])
+masks = [zonal.mask(field, bounds, (SIZE, SIZE)) for field in fields]
+timed("cached masks, one reduce_many gather", lambda: reduce_many(masks, stack))
+
+pixel_counts = np.array([mask.pixel_count for mask in masks])
+print(f"\n📊 {pixel_counts.mean():.0f} pixels per field on average, mask cache: {zonal.stats()}")
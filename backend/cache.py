@@ -0,0 +1,140 @@
+import time
+import threading
+from collections import OrderedDict
+
+from tracing import log
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with optional per-entry expiry.
+
+    Args:
+        maxsize: Maximum number of entries before the least recently used is evicted
+        ttl: Entry lifetime in seconds, or None for entries that never expire
+        on_lookup: Optional callback called with True/False for every hit/miss
+            (e.g. metrics.cache_observer)
+    """
+
+    def __init__(self, maxsize=256, ttl=None, on_lookup=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_lookup = on_lookup
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self._refreshing = set()
+
+    def _count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.on_lookup is not None:
+            self.on_lookup(hit)
+
+    def _expired(self, expires_at):
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[1]):
+                if entry is not None:
+                    del self._entries[key]
+                self._count(False)
+                return default
+            self._entries.move_to_end(key)
+            self._count(True)
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, refresh_ahead=None):
+        """
+        Return a cached value, calling loader() to fill the entry on a miss.
+
+        When refresh_ahead is set and an entry has less than that many seconds
+        left, the current value is still returned but loader() is re-run in a
+        background thread so the entry is replaced before it expires. A loader
+        returning None is not cached.
+
+        Returns:
+            Tuple of (value, hit) where hit is True if the value came from the cache
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[1]):
+                self._entries.move_to_end(key)
+                self._count(True)
+                remaining = None if entry[1] is None else entry[1] - time.monotonic()
+                if refresh_ahead is not None and remaining is not None and remaining < refresh_ahead:
+                    self._start_refresh(key, loader)
+                return entry[0], True
+            if entry is not None:
+                del self._entries[key]
+            self._count(False)
+
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        return value, False
+
+    def _start_refresh(self, key, loader):
+        # Called with the lock held; at most one refresh per key at a time
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = loader()
+                if value is not None:
+                    self.set(key, value)
+                    with self._lock:
+                        self.refreshes += 1
+            except Exception as e:
+                log('cache_refresh_failed', level='error', error=str(e))
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'refreshes': self.refreshes,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,184 @@
+import json
+from datetime import datetime
+
+# ✅ Compact prompt schema
+# Each entry is (short key, response key, max characters). The model answers
+# with the short keys and the server expands them back into the response
+# shape of the verbose prompt, so clients see no difference.
+SECTION_FIELDS = [
+    ('la', 'land_analysis', [
+        ('sa', 'soil_assessment', 160), ('wr', 'water_requirements', 120), ('fc', 'field_condition', 100),
+        ('ch', 'challenges', 120), ('op', 'opportunities', 120)
+    ]),
+    ('sn', 'season_analysis', [
+        ('cs', 'current_season_suitability', 100), ('pw', 'optimal_planting_window', 60),
+        ('wc', 'weather_considerations', 100)
+    ]),
+    ('mk', 'market_insights', [
+        ('tr', 'current_trends', 120), ('pc', 'profitable_categories', 80), ('po', 'price_outlook', 100),
+        ('mt', 'market_timing', 80)
+    ]),
+    ('ap', 'action_plan', [
+        ('is', 'immediate_steps', 120), ('sp', 'soil_preparation', 100), ('ip', 'input_procurement', 100),
+        ('tl', 'timeline', 120), ('si', 'success_indicators', 100)
+    ]),
+    ('su', 'sustainability_advice', [
+        ('oo', 'organic_options', 80), ('wc', 'water_conservation', 80), ('sh', 'soil_health', 80),
+        ('cr', 'crop_rotation', 80)
+    ])
+]
+
+CROPS_KEY = 'c'
+CROP_COUNT = 3
+CROP_FIELDS = [
+    ('n', 'name', 40), ('v', 'variety', 40), ('w', 'why_suitable', 160), ('m', 'market_potential', 100),
+    ('i', 'investment_needed', 60), ('r', 'expected_returns', 60), ('g', 'growing_tips', 140),
+    ('h', 'harvest_timeline', 60), ('k', 'risk_factors', 100)
+]
+
+# Enumerated crop ratings; the expanded text is prefixed to a response field
+LEVELS = {'H': 'High', 'M': 'Moderate', 'L': 'Low'}
+CROP_ENUMS = [
+    ('d', 'market_potential', 'demand'),
+    ('x', 'risk_factors', 'risk'),
+    ('q', 'growing_tips', 'water need')
+]
+
+# Output cap for compact mode; the length caps above add up to well under this
+COMPACT_MAX_OUTPUT_TOKENS = 1500
+
+def _schema_text():
+    """Minimal JSON template, built once at import."""
+    template = {}
+    for short_key, _, fields in SECTION_FIELDS:
+        template[short_key] = {field: f"<={limit}c" for field, _, limit in fields}
+    crop = {field: f"<={limit}c" for field, _, limit in CROP_FIELDS}
+    crop.update({field: '|'.join(LEVELS) for field, _, _ in CROP_ENUMS})
+    template[CROPS_KEY] = [crop]
+    return json.dumps(template, separators=(',', ':'))
+
+def _legend_text():
+    sections = '; '.join(
+        f"{short_key}={name.replace('_', ' ')}: " + ','.join(f"{field}={key.replace('_', ' ')}" for field, key, _ in fields)
+        for short_key, name, fields in SECTION_FIELDS
+    )
+    crop_fields = ','.join(f"{field}={key.replace('_', ' ')}" for field, key, _ in CROP_FIELDS)
+    enums = ','.join(f"{field}={label}" for field, _, label in CROP_ENUMS)
+    return f"{sections}; {CROPS_KEY}=crops: {crop_fields},{enums} (H/M/L)"
+
+COMPACT_SCHEMA_TEXT = _schema_text()
+COMPACT_LEGEND_TEXT = _legend_text()
+
+SECTION_KEYS = {short_key: (name, fields) for short_key, name, fields in SECTION_FIELDS}
+
+# Expected type of each top-level value, for validating streamed answers
+COMPACT_SECTION_TYPES = dict({short_key: dict for short_key, _, _ in SECTION_FIELDS}, **{CROPS_KEY: list})
+
+def _context_lines(section, values, labels):
+    lines = []
+    for key, label in labels:
+        value = (values or {}).get(key)
+        if value not in (None, ''):
+            lines.append(f"{label}={value}")
+    return f"{section}: " + '; '.join(lines) if lines else None
+
+def _field_context(field_data, weather_data, vegetation_data):
+    lines = [
+        _context_lines('Field', field_data, [
+            ('location', 'location'), ('area', 'ha'), ('soil_type', 'soil'), ('soil_ph', 'pH'),
+            ('irrigation', 'irrigation'), ('experience', 'experience'), ('budget', 'budget')
+        ]),
+        _context_lines('Weather', weather_data, [
+            ('avg_temp', 'avg temp C'), ('rainfall', 'rain mm'), ('humidity', 'humidity %'), ('pattern', 'pattern')
+        ]),
+        _context_lines('Health', vegetation_data, [
+            ('ndvi', 'NDVI'), ('health_status', 'health'), ('soil_moisture', 'soil moisture')
+        ])
+    ]
+    return [line for line in lines if line]
+
+def build_compact_prompt(field_data, weather_data, vegetation_data, season, now=None):
+    """
+    Short prompt asking for the compact schema.
+
+    Inputs that were not provided are left out instead of being spelled
+    out as 'Not specified'.
+    """
+    now = now or datetime.now()
+    return "\n".join([
+        "Indian agronomy and market expert. Recommend crops for this field; concise, specific, practical.",
+        f"Date: {now.strftime('%B %Y')}; season: {season}",
+        *_field_context(field_data, weather_data, vegetation_data),
+        f"Reply with JSON only, this schema, {CROP_COUNT} crops, each string within its <=N character cap:",
+        COMPACT_SCHEMA_TEXT,
+        f"Keys: {COMPACT_LEGEND_TEXT}"
+    ])
+
+# ✅ Packed prompts
+# Several fields share one call: the answer is an object keyed by field
+# label, each value following the compact schema
+PACKED_LABEL_PREFIX = 'f'
+
+def packed_labels(count):
+    return [f"{PACKED_LABEL_PREFIX}{position + 1}" for position in range(count)]
+
+def build_packed_compact_prompt(requests, season, now=None):
+    """
+    One compact prompt covering several fields.
+
+    Args:
+        requests: List of (field_data, weather_data, vegetation_data) tuples
+        season: Current season label
+
+    Returns:
+        Prompt text; the answer is keyed by packed_labels(len(requests))
+    """
+    now = now or datetime.now()
+    labels = packed_labels(len(requests))
+    fields = [
+        f"{label}: " + ' | '.join(_field_context(*inputs) or ['no details given'])
+        for label, inputs in zip(labels, requests)
+    ]
+    return "\n".join([
+        "Indian agronomy and market expert. Recommend crops for each field below; concise, specific, practical.",
+        f"Date: {now.strftime('%B %Y')}; season: {season}",
+        *fields,
+        f"Reply with JSON only: one object with keys {','.join(labels)}, each value following this schema with "
+        f"{CROP_COUNT} crops, each string within its <=N character cap:",
+        COMPACT_SCHEMA_TEXT,
+        f"Keys: {COMPACT_LEGEND_TEXT}"
+    ])
+
+def expand_section(short_key, value):
+    """
+    Expand one compact top-level section.
+
+    Returns:
+        Tuple of (response key, expanded value), or (None, None) for unknown keys
+    """
+    if short_key == CROPS_KEY:
+        crops = value if isinstance(value, list) else []
+        return 'recommended_crops', [expand_crop(crop) for crop in crops if isinstance(crop, dict)]
+    if short_key not in SECTION_KEYS or not isinstance(value, dict):
+        return None, None
+    name, fields = SECTION_KEYS[short_key]
+    return name, {key: str(value[field]) for field, key, _ in fields if value.get(field) not in (None, '')}
+
+def expand_crop(crop):
+    """Expand one compact crop, folding the enumerated ratings into their text fields."""
+    expanded = {key: str(crop[field]) for field, key, _ in CROP_FIELDS if crop.get(field) not in (None, '')}
+    for field, key, label in CROP_ENUMS:
+        level = LEVELS.get(str(crop.get(field, '')).strip().upper()[:1])
+        if level:
+            text = expanded.get(key)
+            expanded[key] = f"{level} {label}. {text}" if text else f"{level} {label}."
+    return expanded
+
+def expand_compact_response(data):
+    """Expand a parsed compact response into the verbose response shape."""
+    expanded = {}
+    for short_key, value in data.items():
+        name, section = expand_section(short_key, value)
+        if name:
+            expanded[name] = section
+    return expanded
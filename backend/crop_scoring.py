@@ -0,0 +1,308 @@
+import numpy as np
+
+# ✅ Crop catalog
+# Suitability ranges for common Indian field crops. water_mm is the seasonal
+# water requirement, ndvi the field vigour (current NDVI) the crop does well
+# from; soils lists suitability per soil type, unlisted soils score
+# UNLISTED_SOIL_SCORE.
+CROP_CATALOG = [
+    {
+        'name': 'Rice', 'variety': 'Pusa Basmati 1121 / MTU 1010', 'seasons': ['kharif'],
+        'soils': {'clay': 1.0, 'alluvial': 1.0, 'silt': 0.8, 'loamy': 0.8, 'black': 0.7},
+        'ph': [5.0, 7.5], 'water_mm': [1000, 2000], 'temp_c': [20, 35], 'ndvi': [0.35, 1.0],
+        'harvest': '120-150 days', 'investment': 'Medium', 'returns': 'Medium, assured MSP procurement',
+        'market': 'Staple with government procurement at MSP', 'tips': 'Transplant 25-day seedlings, keep 5 cm standing water',
+        'risks': 'Blast and stem borer, high water use'
+    },
+    {
+        'name': 'Wheat', 'variety': 'HD 2967 / GW 496', 'seasons': ['rabi'],
+        'soils': {'loamy': 1.0, 'alluvial': 1.0, 'silt': 0.8, 'black': 0.8, 'clay': 0.7},
+        'ph': [6.0, 7.5], 'water_mm': [350, 550], 'temp_c': [10, 25], 'ndvi': [0.3, 1.0],
+        'harvest': '110-130 days', 'investment': 'Medium', 'returns': 'Medium, assured MSP procurement',
+        'market': 'Staple with government procurement at MSP', 'tips': 'Sow by mid-November, irrigate at crown root initiation',
+        'risks': 'Terminal heat stress, rust'
+    },
+    {
+        'name': 'Maize', 'variety': 'DHM 117 / HQPM 1', 'seasons': ['kharif', 'rabi'],
+        'soils': {'loamy': 1.0, 'alluvial': 0.9, 'black': 0.8, 'red': 0.8, 'sandy': 0.6},
+        'ph': [5.5, 7.5], 'water_mm': [500, 800], 'temp_c': [18, 32], 'ndvi': [0.3, 1.0],
+        'harvest': '90-110 days', 'investment': 'Medium', 'returns': 'Medium to high',
+        'market': 'Steady feed and starch industry demand', 'tips': 'Ensure drainage, split nitrogen in three doses',
+        'risks': 'Fall armyworm, waterlogging'
+    },
+    {
+        'name': 'Sorghum (Jowar)', 'variety': 'CSH 16 / M 35-1', 'seasons': ['kharif', 'rabi'],
+        'soils': {'black': 1.0, 'loamy': 0.8, 'red': 0.8, 'sandy': 0.6, 'clay': 0.6},
+        'ph': [6.0, 8.5], 'water_mm': [400, 650], 'temp_c': [25, 35], 'ndvi': [0.15, 1.0],
+        'harvest': '100-115 days', 'investment': 'Low', 'returns': 'Low to medium',
+        'market': 'Growing demand for millets and fodder', 'tips': 'Sow with the first monsoon rains, thin to 15 cm',
+        'risks': 'Shoot fly, grain mould in late rains'
+    },
+    {
+        'name': 'Pearl Millet (Bajra)', 'variety': 'HHB 67 / Dhanashakti', 'seasons': ['kharif', 'zaid'],
+        'soils': {'sandy': 1.0, 'loamy': 0.8, 'red': 0.8, 'black': 0.6},
+        'ph': [5.5, 8.5], 'water_mm': [250, 500], 'temp_c': [25, 38], 'ndvi': [0.1, 1.0],
+        'harvest': '75-90 days', 'investment': 'Low', 'returns': 'Low to medium',
+        'market': 'Millet mission procurement and health food demand', 'tips': 'Tolerates dry spells, avoid waterlogged plots',
+        'risks': 'Downy mildew, bird damage'
+    },
+    {
+        'name': 'Finger Millet (Ragi)', 'variety': 'GPU 28 / ML 365', 'seasons': ['kharif'],
+        'soils': {'red': 1.0, 'lateritic': 0.8, 'loamy': 0.8, 'sandy': 0.6},
+        'ph': [5.0, 8.2], 'water_mm': [350, 600], 'temp_c': [20, 30], 'ndvi': [0.1, 1.0],
+        'harvest': '100-120 days', 'investment': 'Low', 'returns': 'Medium',
+        'market': 'Premium health food demand', 'tips': 'Transplant 3-week seedlings for higher yields',
+        'risks': 'Blast disease'
+    },
+    {
+        'name': 'Chickpea (Gram)', 'variety': 'JG 11 / Pusa 372', 'seasons': ['rabi'],
+        'soils': {'black': 1.0, 'loamy': 0.9, 'clay': 0.6, 'sandy': 0.6},
+        'ph': [6.0, 8.0], 'water_mm': [250, 400], 'temp_c': [15, 28], 'ndvi': [0.15, 1.0],
+        'harvest': '95-110 days', 'investment': 'Low', 'returns': 'Medium to high',
+        'market': 'Strong pulse demand with MSP support', 'tips': 'Grows on residual moisture, one irrigation at podding',
+        'risks': 'Wilt, pod borer'
+    },
+    {
+        'name': 'Mustard', 'variety': 'Pusa Bold / RH 749', 'seasons': ['rabi'],
+        'soils': {'loamy': 1.0, 'alluvial': 1.0, 'sandy': 0.7, 'silt': 0.7},
+        'ph': [6.0, 7.5], 'water_mm': [250, 400], 'temp_c': [10, 25], 'ndvi': [0.2, 1.0],
+        'harvest': '110-140 days', 'investment': 'Low', 'returns': 'Medium to high',
+        'market': 'Edible oil import substitution keeps prices firm', 'tips': 'Sow in October, thin to 15 cm spacing',
+        'risks': 'Aphids, frost'
+    },
+    {
+        'name': 'Cotton', 'variety': 'Bt hybrids (RCH 659)', 'seasons': ['kharif'],
+        'soils': {'black': 1.0, 'alluvial': 0.8, 'loamy': 0.8, 'red': 0.7},
+        'ph': [5.8, 8.0], 'water_mm': [700, 1300], 'temp_c': [21, 35], 'ndvi': [0.35, 1.0],
+        'harvest': '150-180 days', 'investment': 'High', 'returns': 'High',
+        'market': 'Textile industry demand, price varies with global markets', 'tips': 'Use refuge rows, monitor for pink bollworm weekly',
+        'risks': 'Pink bollworm, price volatility'
+    },
+    {
+        'name': 'Sugarcane', 'variety': 'Co 86032 / Co 0238', 'seasons': ['kharif', 'rabi', 'zaid'],
+        'soils': {'loamy': 1.0, 'alluvial': 1.0, 'black': 0.9, 'clay': 0.7},
+        'ph': [6.5, 7.5], 'water_mm': [1500, 2500], 'temp_c': [20, 35], 'ndvi': [0.4, 1.0],
+        'harvest': '10-12 months', 'investment': 'High', 'returns': 'High, assured FRP from mills',
+        'market': 'Sugar mills buy at fair and remunerative price', 'tips': 'Plant in trenches, use drip to save water',
+        'risks': 'Very high water demand, delayed mill payments'
+    },
+    {
+        'name': 'Soybean', 'variety': 'JS 9560 / NRC 37', 'seasons': ['kharif'],
+        'soils': {'black': 1.0, 'loamy': 0.9, 'clay': 0.6},
+        'ph': [6.0, 7.5], 'water_mm': [450, 700], 'temp_c': [20, 30], 'ndvi': [0.3, 1.0],
+        'harvest': '90-105 days', 'investment': 'Medium', 'returns': 'Medium to high',
+        'market': 'Oil and feed demand', 'tips': 'Treat seed with Rhizobium, sow on broad beds',
+        'risks': 'Waterlogging, yellow mosaic virus'
+    },
+    {
+        'name': 'Groundnut', 'variety': 'TAG 24 / Kadiri 6', 'seasons': ['kharif', 'zaid'],
+        'soils': {'sandy': 1.0, 'red': 1.0, 'loamy': 0.9, 'black': 0.6},
+        'ph': [6.0, 7.0], 'water_mm': [500, 700], 'temp_c': [22, 32], 'ndvi': [0.2, 1.0],
+        'harvest': '100-120 days', 'investment': 'Medium', 'returns': 'Medium to high',
+        'market': 'Oil and confectionery demand', 'tips': 'Apply gypsum at flowering for pod filling',
+        'risks': 'Leaf spot, aflatoxin in wet harvests'
+    },
+    {
+        'name': 'Pigeon Pea (Tur)', 'variety': 'ICPL 87119 / BSMR 736', 'seasons': ['kharif'],
+        'soils': {'loamy': 0.9, 'black': 0.9, 'red': 0.8, 'sandy': 0.6},
+        'ph': [6.5, 7.5], 'water_mm': [600, 1000], 'temp_c': [20, 30], 'ndvi': [0.2, 1.0],
+        'harvest': '150-180 days', 'investment': 'Low', 'returns': 'Medium to high',
+        'market': 'Persistent pulse shortage keeps prices high', 'tips': 'Intercrop with soybean or sorghum',
+        'risks': 'Pod borer, wilt'
+    },
+    {
+        'name': 'Green Gram (Moong)', 'variety': 'IPM 02-3 / SML 668', 'seasons': ['kharif', 'zaid'],
+        'soils': {'loamy': 1.0, 'red': 0.8, 'sandy': 0.7, 'alluvial': 0.8},
+        'ph': [6.2, 7.5], 'water_mm': [300, 500], 'temp_c': [25, 35], 'ndvi': [0.15, 1.0],
+        'harvest': '60-70 days', 'investment': 'Low', 'returns': 'Medium',
+        'market': 'Pulse demand with MSP support', 'tips': 'Short duration, fits between rabi and kharif',
+        'risks': 'Yellow mosaic virus'
+    },
+    {
+        'name': 'Onion', 'variety': 'Bhima Super / N-53', 'seasons': ['rabi', 'kharif'],
+        'soils': {'loamy': 1.0, 'alluvial': 0.9, 'silt': 0.8, 'red': 0.7, 'sandy': 0.6},
+        'ph': [6.0, 7.5], 'water_mm': [350, 550], 'temp_c': [13, 28], 'ndvi': [0.3, 1.0],
+        'harvest': '120-150 days', 'investment': 'Medium', 'returns': 'High but volatile',
+        'market': 'Large domestic and export market, sharp price swings', 'tips': 'Cure bulbs before storage to cut losses',
+        'risks': 'Price crashes, thrips'
+    },
+    {
+        'name': 'Tomato', 'variety': 'Arka Rakshak / Pusa Ruby', 'seasons': ['rabi', 'zaid'],
+        'soils': {'loamy': 1.0, 'red': 0.8, 'sandy': 0.8, 'alluvial': 0.8},
+        'ph': [6.0, 7.0], 'water_mm': [400, 600], 'temp_c': [18, 28], 'ndvi': [0.35, 1.0],
+        'harvest': '90-120 days', 'investment': 'High', 'returns': 'High but volatile',
+        'market': 'Daily urban demand, prices swing with arrivals', 'tips': 'Stake plants, use drip with mulch',
+        'risks': 'Leaf curl virus, price crashes'
+    },
+    {
+        'name': 'Potato', 'variety': 'Kufri Jyoti / Kufri Pukhraj', 'seasons': ['rabi'],
+        'soils': {'loamy': 1.0, 'alluvial': 0.9, 'sandy': 0.8, 'silt': 0.8},
+        'ph': [5.0, 6.5], 'water_mm': [500, 700], 'temp_c': [15, 24], 'ndvi': [0.35, 1.0],
+        'harvest': '90-110 days', 'investment': 'High', 'returns': 'Medium to high',
+        'market': 'Year-round demand with cold storage', 'tips': 'Earth up at 30 days, stop irrigation before harvest',
+        'risks': 'Late blight, storage costs'
+    },
+    {
+        'name': 'Watermelon', 'variety': 'Sugar Baby / Arka Manik', 'seasons': ['zaid'],
+        'soils': {'sandy': 1.0, 'loamy': 0.9, 'alluvial': 0.8},
+        'ph': [6.0, 7.0], 'water_mm': [400, 600], 'temp_c': [24, 35], 'ndvi': [0.2, 1.0],
+        'harvest': '80-90 days', 'investment': 'Medium', 'returns': 'High in peak summer',
+        'market': 'Strong summer demand in nearby towns', 'tips': 'Sow on raised beds, use mulch and drip',
+        'risks': 'Fruit fly, glut at peak season'
+    }
+]
+
+SEASONS = ['kharif', 'rabi', 'zaid']
+SOIL_TYPES = ['clay', 'sandy', 'loamy', 'silt', 'black', 'red', 'alluvial', 'lateritic']
+UNLISTED_SOIL_SCORE = 0.4
+
+# Substrings that identify a soil type in a (normalized) soil description
+SOIL_KEYWORDS = {
+    'clay': ('clay',), 'sandy': ('sand',), 'loamy': ('loam',), 'silt': ('silt',),
+    'black': ('black', 'regur', 'cotton'), 'red': ('red',), 'alluvial': ('alluvial',), 'lateritic': ('laterit',)
+}
+
+# Water an irrigation source adds over a season on top of rainfall, in mm
+IRRIGATION_SUPPLY_MM = {
+    'rainfed': 0, 'drip': 600, 'sprinkler': 600, 'borewell': 700, 'available': 700, 'canal': 900, 'flood': 900
+}
+
+# How far outside a range a value can be before that factor scores zero
+RANGE_MARGINS = {'ph': 1.0, 'temperature': 6.0, 'ndvi': 0.2}
+WATER_DEFICIT_MARGIN = 0.5   # fraction of the minimum requirement
+WATER_EXCESS_FLOOR = 0.5     # surplus water lowers the score to at most this
+
+FACTOR_WEIGHTS = {'soil': 0.25, 'ph': 0.15, 'water': 0.25, 'temperature': 0.2, 'ndvi': 0.15}
+OFF_SEASON_FACTOR = 0.3
+
+def _catalog_arrays(catalog):
+    """Column arrays of the catalog, built once at import."""
+    return {
+        'ph': np.array([crop['ph'] for crop in catalog], dtype=float).T,
+        'water': np.array([crop['water_mm'] for crop in catalog], dtype=float).T,
+        'temperature': np.array([crop['temp_c'] for crop in catalog], dtype=float).T,
+        'ndvi': np.array([crop['ndvi'] for crop in catalog], dtype=float).T,
+        'soil': np.array([[crop['soils'].get(soil, UNLISTED_SOIL_SCORE) for soil in SOIL_TYPES] for crop in catalog]),
+        'season': np.array([[season in crop['seasons'] for season in SEASONS] for crop in catalog])
+    }
+
+CATALOG_ARRAYS = _catalog_arrays(CROP_CATALOG)
+FACTORS = list(FACTOR_WEIGHTS)
+WEIGHTS = np.array([FACTOR_WEIGHTS[factor] for factor in FACTORS])
+
+def season_key(season):
+    """'kharif', 'rabi' or 'zaid' for a season label such as 'Winter (Rabi season)'."""
+    text = str(season or '').casefold()
+    return next((key for key in SEASONS if key in text), None)
+
+def soil_columns(soil):
+    """Indices of the SOIL_TYPES mentioned in a soil description."""
+    text = str(soil or '').casefold()
+    return [i for i, soil_type in enumerate(SOIL_TYPES) if any(word in text for word in SOIL_KEYWORDS[soil_type])]
+
+def _range_score(value, bounds, margin):
+    low, high = bounds
+    below = np.clip((low - value) / margin, 0.0, 1.0)
+    above = np.clip((value - high) / margin, 0.0, 1.0)
+    return 1.0 - np.maximum(below, above)
+
+def _water_score(rainfall, supply, bounds):
+    """Deficit is judged on rainfall plus irrigation; only surplus rain (which can't be withheld) is penalised."""
+    low, high = bounds
+    deficit = np.clip((low - (rainfall + supply)) / (low * WATER_DEFICIT_MARGIN), 0.0, 1.0)
+    excess = np.clip((rainfall - high) / high, 0.0, 1.0) * (1.0 - WATER_EXCESS_FLOOR)
+    return 1.0 - np.maximum(deficit, excess)
+
+def score_crops(soil=None, ph=None, rainfall=None, irrigation=None, avg_temp=None, ndvi=None, season=None,
+                arrays=CATALOG_ARRAYS):
+    """
+    Score every catalog crop against one field in a single vectorized pass.
+
+    Each factor scores 1 inside the crop's range and falls off linearly
+    outside it. Factors whose input is unknown are left out of the weighted
+    mean; crops out of season are scaled by OFF_SEASON_FACTOR.
+
+    Args:
+        soil: Normalized soil description (e.g. 'black', 'sandy loam')
+        ph, rainfall, avg_temp, ndvi: Numbers or None
+        irrigation: Normalized irrigation source (see IRRIGATION_SUPPLY_MM)
+        season: 'kharif', 'rabi', 'zaid' or None
+
+    Returns:
+        Tuple of (scores in [0, 1] per catalog crop, (factor, crop) score matrix
+        with NaN rows for unknown inputs)
+    """
+    crop_count = arrays['soil'].shape[0]
+    factors = np.full((len(FACTORS), crop_count), np.nan)
+    columns = soil_columns(soil)
+    if columns:
+        factors[FACTORS.index('soil')] = arrays['soil'][:, columns].max(axis=1)
+    if ph is not None:
+        factors[FACTORS.index('ph')] = _range_score(ph, arrays['ph'], RANGE_MARGINS['ph'])
+    supply = IRRIGATION_SUPPLY_MM.get(irrigation)
+    if rainfall is not None:
+        factors[FACTORS.index('water')] = _water_score(rainfall, supply or 0, arrays['water'])
+    elif supply:
+        # Rainfall unknown but irrigated: water is not the limiting factor
+        factors[FACTORS.index('water')] = 1.0
+    if avg_temp is not None:
+        factors[FACTORS.index('temperature')] = _range_score(avg_temp, arrays['temperature'], RANGE_MARGINS['temperature'])
+    if ndvi is not None:
+        factors[FACTORS.index('ndvi')] = _range_score(ndvi, arrays['ndvi'], RANGE_MARGINS['ndvi'])
+
+    known = ~np.isnan(factors[:, 0])
+    if known.any():
+        scores = WEIGHTS[known] @ factors[known] / WEIGHTS[known].sum()
+    else:
+        scores = np.full(crop_count, 0.5)
+    if season in SEASONS:
+        scores = np.where(arrays['season'][:, SEASONS.index(season)], scores, scores * OFF_SEASON_FACTOR)
+    return scores, factors
+
+FACTOR_LABELS = {
+    'soil': lambda inputs, crop: f"{inputs['soil']} soil",
+    'ph': lambda inputs, crop: f"pH {inputs['ph']:g} (ideal {crop['ph'][0]:g}-{crop['ph'][1]:g})",
+    'water': lambda inputs, crop: f"water supply (needs {crop['water_mm'][0]}-{crop['water_mm'][1]} mm)",
+    'temperature': lambda inputs, crop: f"{inputs['avg_temp']:g}°C average (ideal {crop['temp_c'][0]}-{crop['temp_c'][1]}°C)",
+    'ndvi': lambda inputs, crop: f"field NDVI {inputs['ndvi']:.2f}"
+}
+
+def recommend_crops(soil=None, ph=None, rainfall=None, irrigation=None, avg_temp=None, ndvi=None, season=None,
+                    top=3):
+    """
+    Best catalog crops for a field, in the recommended_crops response format.
+
+    Returns:
+        List of up to `top` crop dicts, best first, each with a 0-100
+        suitability_score
+    """
+    inputs = {'soil': soil, 'ph': ph, 'avg_temp': avg_temp, 'ndvi': ndvi}
+    scores, factors = score_crops(soil, ph, rainfall, irrigation, avg_temp, ndvi, season)
+    # Stable sort keeps catalog order between equal scores
+    ranked = np.argsort(-scores, kind='stable')[:top]
+
+    recommendations = []
+    for index in ranked:
+        crop = CROP_CATALOG[index]
+        column = factors[:, index]
+        strengths = [FACTOR_LABELS[factor](inputs, crop) for factor, value in zip(FACTORS, column) if value >= 0.8]
+        weaknesses = [FACTOR_LABELS[factor](inputs, crop) for factor, value in zip(FACTORS, column) if value < 0.6]
+        in_season = season not in SEASONS or season in crop['seasons']
+
+        why = f"Suits {', '.join(strengths)}" if strengths else "Broadly adaptable to the reported conditions"
+        if season in SEASONS:
+            why += f"; {'in' if in_season else 'outside its'} {season.title()} season"
+        risks = crop['risks'] + (f"; weaker match on {', '.join(weaknesses)}" if weaknesses else "")
+        recommendations.append({
+            "name": crop['name'],
+            "variety": crop['variety'],
+            "why_suitable": why,
+            "market_potential": crop['market'],
+            "investment_needed": crop['investment'],
+            "expected_returns": crop['returns'],
+            "growing_tips": crop['tips'],
+            "harvest_timeline": crop['harvest'],
+            "risk_factors": risks,
+            "suitability_score": int(round(float(scores[index]) * 100))
+        })
+    return recommendations
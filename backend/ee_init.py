@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import ee
+
+from tracing import log
+
+# ✅ Background Earth Engine initialization
+# Authentication runs on a daemon thread so a worker serves /health as soon
+# as Python has imported; EE endpoints wait briefly for it (see wait()).
+EE_DEFAULT_PROJECT = 'agriscope21'
+EE_INIT_MAX_ATTEMPTS = int(os.getenv('EE_INIT_MAX_ATTEMPTS', '8'))
+EE_INIT_BACKOFF_SECONDS = float(os.getenv('EE_INIT_BACKOFF_SECONDS', '1'))
+EE_INIT_MAX_BACKOFF_SECONDS = float(os.getenv('EE_INIT_MAX_BACKOFF_SECONDS', '60'))
+
+PENDING = 'initializing'
+READY = 'initialized'
+FAILED = 'failed'
+
+def authenticate():
+    """
+    One Earth Engine authentication attempt.
+
+    Uses the service account in GOOGLE_SERVICE_ACCOUNT_KEY when present and
+    falls back to the default credentials.
+
+    Returns:
+        Description of the method that succeeded
+
+    Raises:
+        Exception from ee.Initialize when no method works
+    """
+    service_account_key = os.getenv('GOOGLE_SERVICE_ACCOUNT_KEY')
+    if service_account_key:
+        try:
+            # Parse the service account key from environment variable
+            service_account_info = json.loads(service_account_key)
+            # Use the project from service account if available, otherwise fallback
+            project_id = service_account_info.get('project_id', EE_DEFAULT_PROJECT)
+            credentials = ee.ServiceAccountCredentials(
+                service_account_info['client_email'],
+                key_data=service_account_key
+            )
+            ee.Initialize(credentials, project=project_id)
+            return f"service account {service_account_info['client_email']} (project {project_id})"
+        except json.JSONDecodeError as json_error:
+            log('ee_service_account_failed', level='error', reason='invalid_json', error=str(json_error))
+        except KeyError as key_error:
+            log('ee_service_account_failed', level='error', reason='missing_field', error=str(key_error))
+        except Exception as sa_error:
+            log('ee_service_account_failed', level='error', reason='authentication', error=str(sa_error))
+
+    ee.Initialize(project=EE_DEFAULT_PROJECT)
+    return "default authentication"
+
+class EarthEngineInitializer:
+    """
+    Runs Earth Engine authentication in the background with exponential backoff.
+
+    start() is cheap and idempotent, and restarts the attempt after a fork
+    (e.g. gunicorn --preload) because threads do not survive into workers.
+
+    Args:
+        authenticate: Callable making one attempt; raises on failure
+        max_attempts: Attempts before giving up (status 'failed')
+        backoff_seconds / max_backoff_seconds: Delay before the second attempt,
+            doubled after each failure up to the maximum
+    """
+
+    def __init__(self, authenticate=authenticate, max_attempts=EE_INIT_MAX_ATTEMPTS,
+                 backoff_seconds=EE_INIT_BACKOFF_SECONDS, max_backoff_seconds=EE_INIT_MAX_BACKOFF_SECONDS,
+                 sleep=time.sleep):
+        self.authenticate = authenticate
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self.state = PENDING
+        self.attempts = 0
+        self.method = None
+        self.last_error = None
+        self.started_at = None
+        self.ready_at = None
+        self._done = threading.Event()
+
+    def start(self):
+        """Start initializing in the background unless this process already has."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._reset()
+            self.started_at = datetime.now()
+            threading.Thread(target=self._run, name='agriscope-ee-init', daemon=True).start()
+
+    def _run(self):
+        delay = self.backoff_seconds
+        for attempt in range(1, self.max_attempts + 1):
+            self.attempts = attempt
+            try:
+                self.method = self.authenticate()
+                self.state = READY
+                self.ready_at = datetime.now()
+                log('ee_initialized', method=self.method, attempt=attempt)
+                break
+            except Exception as e:
+                self.last_error = str(e)
+                log('ee_init_attempt_failed', level='warning', attempt=attempt, error=str(e))
+                if attempt < self.max_attempts:
+                    self._sleep(delay)
+                    delay = min(delay * 2, self.max_backoff_seconds)
+        else:
+            self.state = FAILED
+            log('ee_init_failed', level='error', attempts=self.max_attempts, error=self.last_error)
+        self._done.set()
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def wait(self, timeout):
+        """
+        Wait up to timeout seconds for initialization to finish.
+
+        Returns:
+            True if Earth Engine is ready; returns at once when it already
+            is or when initialization has given up
+        """
+        self.start()
+        if self.state == PENDING:
+            self._done.wait(timeout)
+        return self.ready
+
+    def status(self):
+        return {
+            'status': self.state,
+            'attempts': self.attempts,
+            'method': self.method,
+            'last_error': self.last_error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ready_at': self.ready_at.isoformat() if self.ready_at else None
+        }
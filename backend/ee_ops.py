@@ -0,0 +1,50 @@
+import os
+import ee
+from flask import g, has_request_context
+
+from metrics import EE_ROUND_TRIPS, current_route, upstream_call
+from tracing import log, span
+from serving import offload
+
+# Set EE_DEBUG_GEOMETRY=1 to print request geometries; each dump costs an extra round trip
+DEBUG_GEOMETRY = os.getenv('EE_DEBUG_GEOMETRY', '').lower() in ('1', 'true', 'yes')
+
+ROUND_TRIP_HEADER = 'X-EE-Round-Trips'
+
+def _count_round_trip(operation):
+    """Count one blocking Earth Engine call against the current request, if any."""
+    EE_ROUND_TRIPS.labels(current_route(), operation).inc()
+    if has_request_context():
+        g.ee_round_trips = getattr(g, 'ee_round_trips', 0) + 1
+
+def _call(operation, fn, *args):
+    _count_round_trip(operation)
+    with span(f"ee.{operation}"), upstream_call('earth_engine'):
+        return offload(fn, *args)
+
+def round_trips():
+    """Number of Earth Engine round trips made so far by the current request."""
+    return getattr(g, 'ee_round_trips', 0) if has_request_context() else 0
+
+def get_info(ee_object):
+    """
+    Evaluate an Earth Engine object on the server.
+
+    All request paths go through here (or get_map_id) so the per-request
+    round-trip count stays accurate, and the blocking call is offloaded in
+    the gevent serving mode.
+    """
+    return _call('getInfo', ee_object.getInfo)
+
+def get_map_id(image, vis_params):
+    """Create a map ID for an ee.Image with the given visualization params."""
+    return _call('getMapId', image.getMapId, vis_params)
+
+def debug_geometry(label, geometry):
+    """Print a geometry only when EE_DEBUG_GEOMETRY is enabled."""
+    if DEBUG_GEOMETRY:
+        log('geometry', level='debug', label=label, geometry=get_info(geometry))
+
+def compute_pixels(request):
+    """Fetch pixels for an ee.data.computePixels request as a NumPy structured array."""
+    return _call('computePixels', ee.data.computePixels, request)
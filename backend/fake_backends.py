@@ -0,0 +1,382 @@
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import ee as real_ee
+import numpy as np
+
+from band_store import STORE_BANDS
+from crop_scoring import recommend_crops
+from index_registry import index_registry
+from vegetation_indices import compute_indices
+
+# ✅ Local stand-ins for Earth Engine and Gemini
+# Used by the offline benchmarks and the load test so every route in app.py
+# can run without credentials or network. FakeEarthEngine replaces the `ee`
+# module: expressions are recorded as a graph of FakeNodes (map() callbacks
+# run, as they do client-side in the real library), and getInfo, getMapId
+# and computePixels sleep for the configured latency and answer from
+# synthetic Sentinel-2 rasters that are deterministic per scene.
+REVISIT_DAYS = 5                      # Sentinel-2 revisit over one tile
+CLEAR_SCENE_SHARE = 0.7               # share of scenes passing the cloud filter
+RASTER_SHAPE = (32, 32)               # pixels reduced per scene and field
+FIRST_SCENE = datetime(2017, 1, 3, 5, 36, 51, tzinfo=timezone.utc)
+TILE_URL = 'https://earthengine.fake/v1/maps/{map_id}/tiles/{{z}}/{{x}}/{{y}}'
+
+def _seed(*parts):
+    return int.from_bytes(hashlib.sha1('|'.join(map(str, parts)).encode()).digest()[:8], 'little')
+
+def synthetic_bands(scene_id, shape=RASTER_SHAPE, salt=''):
+    """
+    Raw Sentinel-2 SR band values for one scene, like a vegetated field.
+
+    Returns:
+        Dict of band name (STORE_BANDS) -> uint16 array of the given shape;
+        SCL marks a few pixels as cloud
+    """
+    rng = np.random.default_rng(_seed(scene_id, salt))
+    vigour = rng.uniform(0.3, 1.0)
+    bands = {
+        'B2': rng.normal(450, 80, shape), 'B3': rng.normal(750, 100, shape),
+        'B4': rng.normal(900 - 500 * vigour, 120, shape), 'B5': rng.normal(1300, 150, shape),
+        'B8': rng.normal(2000 + 2500 * vigour, 300, shape), 'B11': rng.normal(2000, 250, shape),
+    }
+    bands = {name: np.clip(values, 1, 10000).astype(np.uint16) for name, values in bands.items()}
+    bands['SCL'] = np.where(rng.random(shape) < 0.05, 9, 4).astype(np.uint16)
+    missing = set(STORE_BANDS) - set(bands)
+    bands.update({name: np.full(shape, 1000, dtype=np.uint16) for name in missing})
+    return bands
+
+def synthetic_index_means(index_names, scene_id, salt=''):
+    """Mean of each index over the clear pixels of a synthetic scene."""
+    bands = synthetic_bands(scene_id, salt=salt)
+    values = compute_indices(index_names, bands, mask=bands['SCL'] != 9)
+    return {name: round(float(np.nanmean(values[name])), 6) for name in index_names}
+
+def scenes_between(start_date, end_date):
+    """Synthetic scenes (id, date, time_start) that pass the cloud filter in [start, end)."""
+    start = datetime.strptime(start_date, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    end = datetime.strptime(end_date, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    passes = max(0, -(-(start - FIRST_SCENE).days // REVISIT_DAYS))
+    scenes = []
+    acquired = FIRST_SCENE + timedelta(days=passes * REVISIT_DAYS)
+    while acquired < end:
+        scene_id = f"{acquired:%Y%m%dT%H%M%S}_{acquired:%Y%m%dT%H%M%S}_T15TVG"
+        if _seed(scene_id) % 100 < CLEAR_SCENE_SHARE * 100:
+            scenes.append({
+                'id': scene_id,
+                'date': acquired.strftime('%Y-%m-%d'),
+                'time_start': int(acquired.timestamp() * 1000)
+            })
+        acquired += timedelta(days=REVISIT_DAYS)
+    return scenes
+
+class FakeBackendError(Exception):
+    """A request built an Earth Engine expression the fake does not model."""
+
+class FakeNode:
+    """One recorded Earth Engine expression; any method call returns a new node."""
+
+    __slots__ = ('_fake', '_op', '_args', '_kwargs', '_parent')
+
+    def __init__(self, fake, op, args=(), kwargs=None, parent=None):
+        self._fake = fake
+        self._op = op
+        self._args = args
+        self._kwargs = kwargs or {}
+        self._parent = parent
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._fake.apply(self, name, args, kwargs)
+
+    def getInfo(self):
+        return self._fake.get_info(self)
+
+    def getMapId(self, vis_params=None):
+        return self._fake.get_map_id(self, vis_params)
+
+    def __repr__(self):
+        return f"FakeNode({self._op})"
+
+class FakeNamespace:
+    """ee.Geometry, ee.Filter, ... : attributes are sub-namespaces, calls create nodes."""
+
+    def __init__(self, fake, path):
+        self._fake = fake
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return FakeNamespace(self._fake, f"{self._path}.{name}")
+
+    def __call__(self, *args, **kwargs):
+        return FakeNode(self._fake, self._path, args, kwargs)
+
+def walk(value):
+    """Every FakeNode reachable from a value (arguments, parents, map callback results)."""
+    stack, seen = [value], set()
+    while stack:
+        item = stack.pop()
+        if isinstance(item, FakeNode):
+            if id(item) in seen:
+                continue
+            seen.add(id(item))
+            yield item
+            stack.extend(item._args)
+            stack.extend(item._kwargs.values())
+            if item._parent is not None:
+                stack.append(item._parent)
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+
+class FakeEarthEngine:
+    """
+    Drop-in replacement for the `ee` module in app.py, ee_ops and band_store.
+
+    Args:
+        latency: Seconds each getInfo / getMapId / computePixels call takes
+        sleep: Function used to wait out the latency
+    """
+
+    EEException = real_ee.EEException
+
+    def __init__(self, latency=0.0, sleep=time.sleep):
+        self.latency = latency
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.data = SimpleNamespace(computePixels=self.compute_pixels)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return FakeNamespace(self, name)
+
+    def install(self, setattr=setattr, modules=('ee_ops', 'band_store', 'app')):
+        """Replace `ee` in the given (already imported) modules; pass monkeypatch.setattr in tests."""
+        for name in modules:
+            if name in sys.modules:
+                setattr(sys.modules[name], 'ee', self)
+        return self
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+
+    def _round_trip(self, operation):
+        with self._lock:
+            self.calls[operation] += 1
+        if self.latency:
+            self._sleep(self.latency)
+
+    def apply(self, node, method, args, kwargs):
+        if method in ('map', 'iterate') and args and callable(args[0]):
+            # Run the callback on a placeholder element, like the client library does
+            args = (args[0](FakeNode(self, 'element', parent=node)),) + tuple(args[1:])
+        return FakeNode(self, method, args, kwargs, parent=node)
+
+    # ✅ Graph inspection
+    def _scenes(self, value):
+        ranges = [node._args[:2] for node in walk(value) if node._op in ('filterDate', 'Filter.date')]
+        scenes = {}
+        for start, end in ranges:
+            if isinstance(start, str) and isinstance(end, str):
+                scenes.update((scene['id'], scene) for scene in scenes_between(start, end))
+        return sorted(scenes.values(), key=lambda scene: scene['time_start'])
+
+    def _index_names(self, value):
+        for node in walk(value):
+            selected = node._args[0] if node._op == 'select' and node._args else None
+            if isinstance(selected, (list, tuple)) and selected and all(name in index_registry for name in selected):
+                return list(selected)
+        return ['NDVI']
+
+    def _field_ids(self, value):
+        return [
+            node._args[1]['field_id'] for node in walk(value)
+            if node._op == 'Feature' and len(node._args) > 1 and isinstance(node._args[1], dict)
+            and 'field_id' in node._args[1]
+        ]
+
+    # ✅ Evaluation
+    # Final ops of the expressions the routes evaluate with getInfo
+    EVALUATED_OPS = ('Dictionary', 'size', 'aggregate_array', 'FeatureCollection', 'flatten', 'Algorithms.If')
+
+    def get_info(self, node):
+        self._round_trip('getInfo')
+        return self._resolve(node)
+
+    def _resolve(self, value):
+        if not isinstance(value, FakeNode):
+            return value
+        op = value._op
+        if op == 'Dictionary':
+            return {key: self._resolve(item) for key, item in value._args[0].items()}
+        if op == 'size':
+            return len(self._scenes(value))
+        if op == 'aggregate_array':
+            keys = {'system:index': 'id', 'system:time_start': 'time_start'}
+            if value._args[0] not in keys:
+                raise FakeBackendError(f"FakeEarthEngine cannot aggregate {value._args[0]}; supported: {', '.join(keys)}")
+            key = keys[value._args[0]]
+            return [scene[key] for scene in self._scenes(value)]
+        if op == 'FeatureCollection':
+            return self._time_series_features(value)
+        if op == 'flatten':
+            return self._batch_rows(value)
+        if op == 'Algorithms.If':
+            return self._point_stats(value)
+        raise FakeBackendError(
+            f"FakeEarthEngine cannot evaluate {op}(); supported: {', '.join(self.EVALUATED_OPS)}"
+        )
+
+    def _time_series_features(self, value):
+        index_names = self._index_names(value)
+        return {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'geometry': None, 'properties': {
+                'id': scene['id'], 'time_start': scene['time_start'], 'date': scene['date'],
+                'values': synthetic_index_means(index_names, scene['id'])
+            }}
+            for scene in self._scenes(value)
+        ]}
+
+    def _batch_rows(self, value):
+        index_names = self._index_names(value)
+        field_ids = self._field_ids(value)
+        return {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'geometry': None, 'properties': dict(
+                synthetic_index_means(index_names, scene['id'], salt=field_id),
+                field_id=field_id, scene_id=scene['id'], date=scene['date']
+            )}
+            for scene in self._scenes(value) for field_id in field_ids
+        ]}
+
+    def _point_stats(self, value):
+        scenes = self._scenes(value)
+        if not scenes:
+            return None
+        bands = synthetic_bands(scenes[-1]['id'])
+        ndvi = compute_indices(['NDVI'], bands)['NDVI']
+        stats = {'NDVI_min': float(ndvi.min()), 'NDVI_max': float(ndvi.max()),
+                 'NDVI_mean': float(ndvi.mean()), 'NDVI_stdDev': float(ndvi.std())}
+        stats.update({f"NDVI_p{p}": float(np.percentile(ndvi, p)) for p in (10, 25, 50, 75, 90)})
+        return {'date': scenes[-1]['date'], 'stats': stats}
+
+    def get_map_id(self, node, vis_params=None):
+        self._round_trip('getMapId')
+        if not self._scenes(node):
+            raise real_ee.EEException("Image.visualize: No bands in image.")
+        map_id = hashlib.sha1(repr(sorted(op._op for op in walk(node))).encode()).hexdigest()[:16]
+        return {'mapid': map_id, 'token': '', 'tile_fetcher': SimpleNamespace(url_format=TILE_URL.format(map_id=map_id))}
+
+    def compute_pixels(self, request):
+        """computePixels with fileFormat NUMPY_NDARRAY for the band store's Image.cat of scenes."""
+        self._round_trip('computePixels')
+        width, height = request['grid']['dimensions']['width'], request['grid']['dimensions']['height']
+        layers = request['expression']._args[0]
+        names = [name for layer in layers for name in layer._args[0]]
+        pixels = np.zeros((height, width), dtype=[(name, '<u2') for name in names])
+        for layer in layers:
+            image = next(node for node in walk(layer) if node._op == 'Image')
+            scene_id = image._args[0].rsplit('/', 1)[-1]
+            bands = synthetic_bands(scene_id, (height, width))
+            for name, band in zip(layer._args[0], STORE_BANDS):
+                pixels[name] = bands[band]
+        return pixels
+
+class FakeGeminiModel:
+    """
+    Stand-in for genai.GenerativeModel answering in the verbose response schema.
+
+    Args:
+        latency: Seconds each generate_content call takes (spread over the
+            chunks when streaming)
+        respond: Optional callable(prompt) -> text replacing the canned answer
+    """
+
+    CHUNK_CHARS = 64
+
+    def __init__(self, latency=0.0, respond=None, sleep=time.sleep):
+        self.latency = latency
+        self.respond = respond
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.answer = json.dumps(canned_recommendations())
+
+    def generate_content(self, prompt, stream=False, **options):
+        with self._lock:
+            self.calls += 1
+        text = self.respond(prompt) if self.respond else self.answer
+        if not stream:
+            if self.latency:
+                self._sleep(self.latency)
+            return SimpleNamespace(text=text)
+        chunks = [text[i:i + self.CHUNK_CHARS] for i in range(0, len(text), self.CHUNK_CHARS)]
+        return self._stream(chunks)
+
+    def _stream(self, chunks):
+        for chunk in chunks:
+            if self.latency:
+                self._sleep(self.latency / len(chunks))
+            yield SimpleNamespace(text=chunk)
+
+def canned_recommendations():
+    """A complete, valid verbose-schema answer built from the local crop scorer."""
+    return {
+        'land_analysis': {
+            'soil_health': 'Good', 'water_availability': 'Adequate with drip irrigation',
+            'climate_suitability': 'Suitable for most kharif crops',
+            'key_challenges': ['Uneven monsoon rainfall', 'Rising input costs']
+        },
+        'season_analysis': {
+            'current_season': 'Kharif', 'optimal_planting_window': 'June to July',
+            'weather_considerations': 'Plan sowing after the first steady rains'
+        },
+        'recommended_crops': recommend_crops(soil='loamy', ph=6.8, rainfall=650, irrigation='drip', avg_temp=27),
+        'market_insights': {
+            'high_demand_crops': ['Soybean', 'Cotton'], 'price_trends': 'Stable to rising',
+            'export_opportunities': 'Moderate'
+        },
+        'action_plan': {'immediate_steps': ['Test soil nutrients'], 'next_30_days': ['Prepare seed beds']},
+        'sustainability_advice': {'soil_conservation': 'Rotate with legumes', 'water_management': 'Mulch to keep moisture'}
+    }
+
+def install_fakes(setattr=setattr, ee_latency=0.0, gemini_latency=0.0, band_store_root=None):
+    """
+    Point app.py at FakeEarthEngine and FakeGeminiModel and mark Earth Engine ready.
+
+    Args:
+        setattr: Function used to patch module attributes (monkeypatch.setattr in tests)
+        band_store_root: Directory for a fresh band store; the configured one is kept when None
+
+    Returns:
+        Tuple of (FakeEarthEngine, FakeGeminiModel)
+    """
+    import ai_crop_service
+    import app
+    from band_store import BandStore
+    from ee_init import EarthEngineInitializer
+    from rate_limit import RateLimiter
+
+    fake_ee = FakeEarthEngine(latency=ee_latency).install(setattr)
+    fake_model = FakeGeminiModel(latency=gemini_latency)
+    setattr(ai_crop_service, 'model', fake_model)
+    # The real quota is not what is being measured
+    setattr(ai_crop_service, 'model_rate_limiter', RateLimiter(10 ** 6))
+    if band_store_root is not None:
+        setattr(app, 'band_store', BandStore(root=band_store_root))
+    initializer = EarthEngineInitializer(authenticate=lambda: 'fake Earth Engine')
+    setattr(app, 'ee_initializer', initializer)
+    initializer.wait(5)
+    return fake_ee, fake_model
@@ -0,0 +1,161 @@
+import json
+import math
+import hashlib
+import numpy as np
+
+# Coordinates are rounded to ~1 cm before hashing so that the same field drawn
+# or saved by different clients maps to the same key
+COORDINATE_PRECISION = 7
+
+def canonicalize_polygon(coordinates):
+    """
+    Normalize a polygon ring so equivalent AOIs compare equal.
+
+    The ring is rounded, its closing vertex dropped, oriented counter-clockwise
+    and rotated to start at its smallest vertex.
+
+    Args:
+        coordinates: List of [lng, lat] pairs, optionally closed
+
+    Returns:
+        List of [lng, lat] pairs in canonical order (not closed)
+    """
+    ring = [[round(float(lng), COORDINATE_PRECISION), round(float(lat), COORDINATE_PRECISION)]
+            for lng, lat in (point[:2] for point in coordinates)]
+
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring = ring[:-1]
+
+    # Drop consecutive duplicate vertices
+    ring = [point for i, point in enumerate(ring) if i == 0 or point != ring[i - 1]]
+
+    # Shoelace sum: negative means clockwise
+    signed_area = sum(
+        ring[i][0] * ring[(i + 1) % len(ring)][1] - ring[(i + 1) % len(ring)][0] * ring[i][1]
+        for i in range(len(ring))
+    )
+    if signed_area < 0:
+        ring.reverse()
+
+    start = ring.index(min(ring))
+    return ring[start:] + ring[:start]
+
+def polygon_hash(coordinates):
+    """
+    Stable hash of a polygon ring, suitable as a cache key.
+
+    Args:
+        coordinates: List of [lng, lat] pairs
+
+    Returns:
+        Hex digest string
+    """
+    canonical = canonicalize_polygon(coordinates)
+    payload = json.dumps(canonical, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def polygon_mask(coordinates, bounds, shape, buffer_meters=0):
+    """
+    Rasterize a polygon ring onto a regular lng/lat grid.
+
+    A pixel is inside when its center is inside the ring (even-odd rule),
+    or within buffer_meters of one of its edges.
+
+    Args:
+        coordinates: List of [lng, lat] pairs
+        bounds: Grid extent as [west, south, east, north]
+        shape: Grid size as (height, width); row 0 is the northern edge
+        buffer_meters: Positive buffer, like ee.Geometry.buffer()
+
+    Returns:
+        Boolean array of the given shape
+    """
+    west, south, east, north = bounds
+    height, width = shape
+    ring = np.asarray(canonicalize_polygon(coordinates), dtype=np.float64)
+    lngs = west + (np.arange(width) + 0.5) * (east - west) / width
+    lats = north - (np.arange(height) + 0.5) * (north - south) / height
+
+    inside = np.zeros(shape, dtype=bool)
+    x = lngs[np.newaxis, :]
+    for (x1, y1), (x2, y2) in zip(ring, np.roll(ring, -1, axis=0)):
+        if y1 == y2:
+            continue
+        # Rows whose center latitude crosses this edge, and where the crossing is
+        crosses = ((y1 > lats) != (y2 > lats))[:, np.newaxis]
+        x_cross = (x1 + (lats - y1) * (x2 - x1) / (y2 - y1))[:, np.newaxis]
+        inside ^= crosses & (x < x_cross)
+    if buffer_meters > 0:
+        inside |= _near_ring(ring, lngs, lats, buffer_meters)
+    return inside
+
+def _near_ring(ring, lngs, lats, distance):
+    """Grid points (lats x lngs) within `distance` meters of a ring's edges."""
+    # Local equirectangular frame in meters, accurate at field scale
+    meters_lng = 111320.0 * max(math.cos(math.radians(float(np.mean(ring[:, 1])))), 1e-6)
+    meters_lat = 110574.0
+    x = ((lngs - ring[0, 0]) * meters_lng)[np.newaxis, :]
+    y = ((lats - ring[0, 1]) * meters_lat)[:, np.newaxis]
+    points = (ring - ring[0]) * [meters_lng, meters_lat]
+
+    near = np.zeros((len(lats), len(lngs)), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(points, np.roll(points, -1, axis=0)):
+        dx, dy = x2 - x1, y2 - y1
+        length2 = dx * dx + dy * dy
+        t = 0.0 if length2 == 0 else np.clip(((x - x1) * dx + (y - y1) * dy) / length2, 0, 1)
+        near |= (x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2 <= distance * distance
+    return near
+
+def polygon_coverage(coordinates, bounds, shape, supersample=4, buffer_meters=0):
+    """
+    Fraction of each grid pixel covered by a polygon (buffered by buffer_meters).
+
+    Each pixel is split into supersample x supersample sub-pixels whose
+    centers are tested with polygon_mask, so edge pixels get a coverage in
+    steps of 1 / supersample**2.
+
+    Returns:
+        float64 array of the given shape with values in [0, 1]
+    """
+    height, width = shape
+    fine = polygon_mask(coordinates, bounds, (height * supersample, width * supersample), buffer_meters)
+    return fine.reshape(height, supersample, width, supersample).mean(axis=(1, 3))
+
+# Mean Earth radius used by Earth Engine's geodesic measurements
+EARTH_RADIUS_METERS = 6371008.8
+
+def polygon_area(coordinates):
+    """
+    Geodesic area of a polygon ring on a spherical Earth.
+
+    Args:
+        coordinates: List of [lng, lat] pairs, optionally closed
+
+    Returns:
+        Area in square meters
+    """
+    ring = np.radians(np.asarray(canonicalize_polygon(coordinates), dtype=np.float64))
+    if len(ring) < 3:
+        return 0.0
+    lngs, lats = ring[:, 0], ring[:, 1]
+    next_lngs, next_lats = np.roll(lngs, -1), np.roll(lats, -1)
+    # Spherical excess of the ring, summed edge by edge
+    excess = np.sum((next_lngs - lngs) * (2 + np.sin(lats) + np.sin(next_lats)))
+    return float(abs(excess) * EARTH_RADIUS_METERS ** 2 / 2)
+
+def polygon_perimeter(coordinates):
+    """
+    Great-circle length of a polygon ring's edges.
+
+    Args:
+        coordinates: List of [lng, lat] pairs, optionally closed
+
+    Returns:
+        Perimeter in meters
+    """
+    ring = np.radians(np.asarray(canonicalize_polygon(coordinates), dtype=np.float64))
+    lngs, lats = ring[:, 0], ring[:, 1]
+    next_lngs, next_lats = np.roll(lngs, -1), np.roll(lats, -1)
+    haversine = (np.sin((next_lats - lats) / 2) ** 2
+                 + np.cos(lats) * np.cos(next_lats) * np.sin((next_lngs - lngs) / 2) ** 2)
+    return float(np.sum(2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(haversine))))
@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+
+# Gunicorn settings shared by local runs and Render:
+#   gunicorn -c gunicorn.conf.py app:app
+# SERVING_MODE=gevent switches to the async worker: requests run on greenlets
+# and blocking Earth Engine / Gemini calls are offloaded (see serving.py).
+SERVING_MODE = os.getenv('SERVING_MODE', 'sync')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+if SERVING_MODE == 'gevent':
+    worker_class = 'gevent'
+    # In-flight requests per worker; each waits on EE/Gemini most of the time
+    worker_connections = int(os.getenv('WORKER_CONNECTIONS', '100'))
+else:
+    worker_class = 'sync'
+
+# ✅ Prometheus multiprocess mode
+# Each worker writes its metrics to files in this directory and /metrics
+# merges them (see metrics.py). It must be set before the workers import
+# prometheus_client, and is emptied when the master starts so counters from
+# a previous run are not reported again.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'agriscope-metrics')
+)
+
+def on_starting(server):
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,363 @@
+import os
+import ast
+import json
+import threading
+import numpy as np
+
+from tracing import log
+
+# Expression variable -> Sentinel-2 band
+EXPRESSION_BANDS = {
+    'B': 'B2',     # Blue
+    'G': 'B3',     # Green
+    'R': 'B4',     # Red
+    'RE': 'B5',    # Red Edge 1
+    'NIR': 'B8',   # Near Infrared
+    'SWIR': 'B11'  # Short Wave Infrared
+}
+
+# Native resolution of each Sentinel-2 band in meters
+BAND_NATIVE_SCALE = {'B2': 10, 'B3': 10, 'B4': 10, 'B5': 20, 'B8': 10, 'B11': 20}
+
+_BINARY_OPS = {
+    ast.Add: ('+', 'np.add'),
+    ast.Sub: ('-', 'np.subtract'),
+    ast.Mult: ('*', 'np.multiply'),
+    ast.Div: ('/', 'np.divide'),
+    ast.Pow: ('**', 'np.power')
+}
+
+# ✅ Built-in vegetation indices
+# 'formula' uses the variables in EXPRESSION_BANDS; everything else is the
+# metadata served by /api/indices/list and the overlay visualization params
+BUILTIN_INDICES = [
+    {
+        'id': 'NDVI',
+        'formula': '(NIR - R) / (NIR + R)',
+        'name': 'Normalized Difference Vegetation Index',
+        'display_formula': '(NIR - Red) / (NIR + Red)',
+        'description': 'Most common vegetation index, good for general vegetation health assessment',
+        'range': [-1, 1],
+        'optimal_range': [0.4, 0.7],
+        'visualization': {'min': -0.2, 'max': 1.0, 'palette': ['blue', 'white', 'yellow', 'green', 'darkgreen']}
+    },
+    {
+        'id': 'EVI',
+        'formula': '2.5 * ((NIR - R) / (NIR + 6 * R - 7.5 * B + 1))',
+        'name': 'Enhanced Vegetation Index',
+        'display_formula': '2.5 * ((NIR - Red) / (NIR + 6*Red - 7.5*Blue + 1))',
+        'description': 'Improved version of NDVI with atmospheric correction and reduced soil noise',
+        'range': [-1, 1],
+        'optimal_range': [0.3, 0.8],
+        'visualization': {'min': -0.2, 'max': 1.0, 'palette': ['brown', 'yellow', 'lightgreen', 'green', 'darkgreen']}
+    },
+    {
+        'id': 'SAVI',
+        'formula': '((NIR - R) / (NIR + R + 0.5)) * 1.5',  # Using L=0.5
+        'name': 'Soil-Adjusted Vegetation Index',
+        'display_formula': '((NIR - Red) / (NIR + Red + 0.5)) * 1.5',
+        'description': 'Reduces soil brightness influence, good for sparse vegetation',
+        'range': [-1, 1],
+        'optimal_range': [0.2, 0.6],
+        'visualization': {'min': -0.2, 'max': 1.0, 'palette': ['purple', 'blue', 'cyan', 'yellow', 'red']}
+    },
+    {
+        'id': 'ARVI',
+        'formula': '(NIR - (2 * R - B)) / (NIR + (2 * R - B))',
+        'name': 'Atmospherically Resistant Vegetation Index',
+        'display_formula': '(NIR - (2*Red - Blue)) / (NIR + (2*Red - Blue))',
+        'description': 'Reduces atmospheric effects, especially aerosol scattering',
+        'range': [-1, 1],
+        'optimal_range': [0.3, 0.7],
+        'visualization': {'min': -0.2, 'max': 1.0, 'palette': ['red', 'orange', 'yellow', 'lightgreen', 'darkgreen']}
+    },
+    {
+        'id': 'MAVI',
+        'formula': '(NIR - R) / (NIR + R + SWIR)',
+        'name': 'Moisture-Adjusted Vegetation Index',
+        'display_formula': '(NIR - Red) / (NIR + Red + SWIR)',
+        'description': 'Incorporates moisture information from SWIR band',
+        'range': [-1, 1],
+        'optimal_range': [0.2, 0.6],
+        'visualization': {'min': -0.2, 'max': 1.0, 'palette': ['red', 'yellow', 'lightblue', 'blue', 'darkblue']}
+    },
+    {
+        'id': 'SR',
+        'formula': 'NIR / R',
+        'name': 'Simple Ratio',
+        'display_formula': 'NIR / Red',
+        'description': 'Basic ratio of NIR to Red, simple but effective',
+        'range': [0, 10],
+        'optimal_range': [2, 8],
+        'visualization': {'min': 0, 'max': 8, 'palette': ['red', 'orange', 'yellow', 'green', 'darkgreen']}
+    },
+    {
+        'id': 'NDRE',
+        'formula': '(NIR - RE) / (NIR + RE)',
+        'name': 'Normalized Difference Red Edge',
+        'display_formula': '(NIR - RedEdge) / (NIR + RedEdge)',
+        'description': 'Sensitive to chlorophyll in dense, mid-to-late season canopies where NDVI saturates',
+        'range': [-1, 1],
+        'optimal_range': [0.2, 0.5],
+        'visualization': {'min': -0.2, 'max': 0.8, 'palette': ['red', 'orange', 'yellow', 'lightgreen', 'darkgreen']}
+    },
+    {
+        'id': 'GNDVI',
+        'formula': '(NIR - G) / (NIR + G)',
+        'name': 'Green Normalized Difference Vegetation Index',
+        'display_formula': '(NIR - Green) / (NIR + Green)',
+        'description': 'Uses the green band, making it more sensitive to chlorophyll concentration than NDVI',
+        'range': [-1, 1],
+        'optimal_range': [0.4, 0.7],
+        'visualization': {'min': -0.2, 'max': 1.0, 'palette': ['brown', 'yellow', 'lightgreen', 'green', 'darkgreen']}
+    },
+    {
+        'id': 'NDWI',
+        'formula': '(G - NIR) / (G + NIR)',
+        'name': 'Normalized Difference Water Index',
+        'display_formula': '(Green - NIR) / (Green + NIR)',
+        'description': 'Highlights surface water and moisture; vegetated land is usually negative',
+        'range': [-1, 1],
+        'optimal_range': [-0.5, -0.1],
+        'visualization': {'min': -0.8, 'max': 0.6, 'palette': ['brown', 'beige', 'white', 'lightblue', 'blue']}
+    }
+]
+
+DEFAULT_VISUALIZATION = {'min': -0.2, 'max': 1.0, 'palette': ['blue', 'white', 'yellow', 'green', 'darkgreen']}
+
+class CompiledIndex:
+    """
+    A vegetation index formula parsed once and compiled to both targets.
+
+    Attributes:
+        id: Index name used in requests, e.g. 'NDVI'
+        formula: Formula as registered
+        ee_expression: Normalized expression string for ee.Image.expression
+        variables: Expression variables referenced, in EXPRESSION_BANDS order
+        bands: Sentinel-2 bands referenced, in the same order
+        kernel: kernel(variables, out, scratch) evaluating one chunk into out
+        scratch_buffers: Number of scratch arrays the kernel needs
+        metadata: Everything else from the definition (name, description, ...)
+    """
+
+    def __init__(self, definition):
+        self.id = definition['id']
+        self.formula = definition['formula']
+        self.metadata = {key: value for key, value in definition.items() if key not in ('id', 'formula')}
+
+        tree = _parse_formula(self.id, self.formula)
+        self.ee_expression = ast.unparse(tree.body)
+        referenced = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        self.variables = [variable for variable in EXPRESSION_BANDS if variable in referenced]
+        self.bands = [EXPRESSION_BANDS[variable] for variable in self.variables]
+        self.kernel, self.scratch_buffers, self.kernel_source = _compile_kernel(self.id, tree.body)
+
+    @property
+    def visualization(self):
+        return self.metadata.get('visualization') or DEFAULT_VISUALIZATION
+
+    def describe(self):
+        """Entry for /api/indices/list."""
+        return {
+            'name': self.metadata.get('name', self.id),
+            'formula': self.metadata.get('display_formula', self.formula),
+            'description': self.metadata.get('description', ''),
+            'range': self.metadata.get('range', [-1, 1]),
+            'optimal_range': self.metadata.get('optimal_range'),
+            'bands': self.bands
+        }
+
+def _parse_formula(index_id, formula):
+    """Parse a formula and reject anything but arithmetic on known band variables."""
+    try:
+        tree = ast.parse(formula, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Index {index_id}: invalid formula {formula!r}: {e.msg}")
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.Load, ast.operator, ast.unaryop)):
+            continue
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            continue
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            continue
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            continue
+        if isinstance(node, ast.Name):
+            if node.id not in EXPRESSION_BANDS:
+                raise ValueError(
+                    f"Index {index_id}: unknown band variable {node.id!r}. Available: {list(EXPRESSION_BANDS.keys())}"
+                )
+            continue
+        raise ValueError(f"Index {index_id}: unsupported syntax {type(node).__name__} in {formula!r}")
+
+    if not any(isinstance(node, ast.Name) for node in ast.walk(tree)):
+        raise ValueError(f"Index {index_id}: formula {formula!r} does not reference any band")
+    return tree
+
+def _compile_kernel(index_id, expression):
+    """
+    Generate a NumPy kernel that evaluates the expression with out= ufuncs.
+
+    Intermediate results live in a small pool of scratch buffers that are
+    reused as soon as an operand is consumed, and the root operation writes
+    straight into the output, so evaluation allocates nothing per call.
+
+    Returns:
+        Tuple of (kernel function, number of scratch buffers, generated source)
+    """
+    lines = []
+    free = []
+    allocated = [0]
+
+    def take_buffer():
+        if free:
+            return free.pop()
+        allocated[0] += 1
+        return f"scratch[{allocated[0] - 1}]"
+
+    def release(operand):
+        if operand.startswith('scratch['):
+            free.append(operand)
+
+    def emit(node, dest=None):
+        # Returns an operand string: a scalar literal, an input array or a scratch buffer
+        if isinstance(node, ast.Constant):
+            return repr(float(node.value))
+        if isinstance(node, ast.Name):
+            return f"v[{node.id!r}]"
+        if isinstance(node, ast.UnaryOp):
+            operand = emit(node.operand)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            if not (operand.startswith('v[') or operand.startswith('scratch[')):
+                return repr(-float(operand))
+            target = dest or (operand if operand.startswith('scratch[') else take_buffer())
+            lines.append(f"np.negative({operand}, out={target})")
+            if operand != target:
+                release(operand)
+            return target
+
+        left = emit(node.left)
+        right = emit(node.right)
+        symbol, ufunc = _BINARY_OPS[type(node.op)]
+        scalars = [operand for operand in (left, right) if not (operand.startswith('v[') or operand.startswith('scratch['))]
+        if len(scalars) == 2:
+            # Fold constant sub-expressions at compile time
+            try:
+                return repr(float(eval(f"({left}) {symbol} ({right})")))
+            except (ArithmeticError, ValueError) as e:
+                raise ValueError(f"Index {index_id}: constant sub-expression {left} {symbol} {right} failed: {e}")
+
+        if dest is not None:
+            target = dest
+        elif left.startswith('scratch['):
+            target = left
+        elif right.startswith('scratch['):
+            target = right
+        else:
+            target = take_buffer()
+        lines.append(f"{ufunc}({left}, {right}, out={target})")
+        for operand in (left, right):
+            if operand != target:
+                release(operand)
+        return target
+
+    result = emit(expression, dest='out')
+    if result != 'out':
+        # Bare variable or constant formula
+        lines.append(f"np.copyto(out, {result})")
+
+    source = "def kernel(v, out, scratch):\n" + "".join(f"    {line}\n" for line in lines) + "    return out\n"
+    namespace = {'np': np}
+    exec(compile(source, f"<index {index_id}>", 'exec'), namespace)
+    return namespace['kernel'], allocated[0], source
+
+class IndexRegistry:
+    """Thread-safe registry of compiled vegetation indices, keyed by index ID."""
+
+    def __init__(self, definitions=()):
+        self._indices = {}
+        self._lock = threading.Lock()
+        for definition in definitions:
+            self.register(definition)
+
+    def register(self, definition, replace=False):
+        """
+        Compile and add an index definition.
+
+        Raises:
+            ValueError: If the definition is incomplete, the formula is invalid
+                or the ID is taken and replace is False
+        """
+        if not definition.get('id') or not definition.get('formula'):
+            raise ValueError(f"Index definitions need an 'id' and a 'formula': {definition}")
+        compiled = CompiledIndex(definition)
+        with self._lock:
+            if compiled.id in self._indices and not replace:
+                raise ValueError(f"Index {compiled.id} is already registered")
+            self._indices[compiled.id] = compiled
+        return compiled
+
+    def load_config(self, path):
+        """
+        Register indices from a JSON file holding a list of definitions.
+
+        Invalid entries are reported and skipped so one bad index cannot take
+        the service down.
+
+        Returns:
+            List of IDs that were registered
+        """
+        with open(path) as config_file:
+            definitions = json.load(config_file)
+        registered = []
+        for definition in definitions:
+            try:
+                registered.append(self.register(definition, replace=definition.get('replace', False)).id)
+            except ValueError as e:
+                log('index_config_entry_skipped', level='warning', path=path, error=str(e))
+        return registered
+
+    def get(self, index_id):
+        """Return the CompiledIndex for an ID, or raise ValueError listing the known IDs."""
+        with self._lock:
+            compiled = self._indices.get(index_id)
+        if compiled is None:
+            raise ValueError(f"Unknown index name: {index_id}. Available indices: {self.names()}")
+        return compiled
+
+    def __contains__(self, index_id):
+        with self._lock:
+            return index_id in self._indices
+
+    def names(self):
+        with self._lock:
+            return list(self._indices.keys())
+
+    def bands_for(self, index_ids):
+        """Sentinel-2 bands needed to compute all the given indices, in band order."""
+        needed = {band for index_id in index_ids for band in self.get(index_id).bands}
+        return [band for band in EXPRESSION_BANDS.values() if band in needed]
+
+    def native_scale(self, index_ids):
+        """Coarsest native resolution (meters) among the bands the given indices use."""
+        return max(BAND_NATIVE_SCALE[band] for band in self.bands_for(index_ids))
+
+    def describe(self):
+        with self._lock:
+            return {index_id: compiled.describe() for index_id, compiled in self._indices.items()}
+
+def build_default_registry():
+    """Built-in indices plus any from the JSON file named by INDEX_REGISTRY_CONFIG."""
+    registry = IndexRegistry(BUILTIN_INDICES)
+    config_path = os.getenv('INDEX_REGISTRY_CONFIG')
+    if config_path:
+        try:
+            added = registry.load_config(config_path)
+            log('index_config_loaded', path=config_path, indices=added)
+        except (OSError, json.JSONDecodeError) as e:
+            log('index_config_failed', level='error', path=config_path, error=str(e))
+    return registry
+
+index_registry = build_default_registry()
@@ -0,0 +1,181 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import log
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_QUEUE_LIMIT = int(os.getenv('JOB_QUEUE_LIMIT', '20'))
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', str(60 * 60)))
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested."""
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting to run."""
+
+class Job:
+    """
+    State of one background analysis.
+
+    The job function receives the Job and should call report_progress() at
+    natural checkpoints; report_progress() raises JobCancelled when the job
+    has been cancelled, so cancellation takes effect at the next checkpoint.
+    """
+
+    def __init__(self, kind, payload=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = None
+        self.result = None
+        self.status_code = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_requested = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_requested.is_set()
+
+    def report_progress(self, fraction, message=None):
+        """Record progress between 0 and 1 and stop here if cancelled."""
+        if self.cancel_requested:
+            raise JobCancelled()
+        self.progress = max(0.0, min(1.0, fraction))
+        if message:
+            self.message = message
+
+    def wait(self, timeout):
+        """Block until the job finishes or timeout seconds pass."""
+        return self._done.wait(timeout)
+
+    def _finish(self, status):
+        self.status = status
+        self.finished_at = time.time()
+        self._done.set()
+
+    def to_dict(self):
+        info = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'message': self.message,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.status == 'succeeded':
+            info['result'] = self.result
+            info['result_status_code'] = self.status_code
+        if self.error:
+            info['error'] = self.error
+        return info
+
+class JobManager:
+    """
+    Runs jobs on a bounded thread pool and keeps their state for polling.
+
+    Job state lives in this process only, so clients must poll the same
+    worker that accepted the job.
+
+    Args:
+        max_workers: Number of jobs that may run at once
+        queue_limit: Number of jobs that may wait for a worker before submit() fails
+        retention_seconds: How long finished jobs are kept for polling
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, queue_limit=JOB_QUEUE_LIMIT,
+                 retention_seconds=JOB_RETENTION_SECONDS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='agriscope-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.queue_limit = queue_limit
+        self.retention_seconds = retention_seconds
+
+    def submit(self, kind, fn, payload=None):
+        """
+        Queue fn(job) to run in the background.
+
+        fn must return a (response body, HTTP status) tuple.
+
+        Returns:
+            The new Job
+
+        Raises:
+            QueueFullError: If queue_limit jobs are already waiting
+        """
+        with self._lock:
+            self._prune()
+            queued = sum(1 for job in self._jobs.values() if job.status == 'queued')
+            if queued >= self.queue_limit:
+                raise QueueFullError(f"{queued} jobs are already queued")
+            job = Job(kind, payload)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        with self._lock:
+            if job.cancel_requested:
+                return
+            job.status = 'running'
+            job.started_at = time.time()
+        try:
+            job.result, job.status_code = fn(job)
+            job.progress = 1.0
+            job._finish('succeeded')
+        except JobCancelled:
+            job._finish('cancelled')
+        except Exception as e:
+            log('job_failed', level='error', job_id=job.id, kind=job.kind, error=str(e))
+            job.error = str(e)
+            job._finish('failed')
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Request cancellation. Queued jobs never start; running jobs stop at
+        their next progress checkpoint.
+
+        Returns:
+            The Job, or None if it does not exist
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and not job.finished:
+                job._cancel_requested.set()
+                if job.status == 'queued':
+                    job._finish('cancelled')
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def _prune(self):
+        # Called with the lock held
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,296 @@
+import argparse
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import requests
+
+# Load test: replays a weighted mix of realistic requests at increasing
+# concurrency and reports throughput, p50/p95/p99 latency, errors and how busy
+# the workers were, to find where adding concurrency stops adding throughput.
+# By default it starts `gunicorn -c gunicorn.conf.py "loadtest:create_app()"`,
+# i.e. app.py with the Earth Engine and Gemini stand-ins from fake_backends.py
+# answering after realistic latencies.
+# Usage:
+#   python loadtest.py --mode gevent --workers 2 --concurrency 1,4,16,64 --duration 20
+#   python loadtest.py --url http://127.0.0.1:5000 ...    (an already running server)
+
+DEFAULT_MIX = 'calculate=25,timeseries=35,list=10,recommendation=20,debug_stats=10'
+DEFAULT_CONCURRENCY = '1,2,4,8,16,32,64'
+INDICES = ['NDVI', 'EVI', 'SAVI', 'NDRE', 'GNDVI', 'NDWI']
+SOILS = ['loamy', 'clay', 'sandy', 'black', 'red', 'alluvial', 'silt']
+IRRIGATION = ['drip', 'sprinkler', 'canal', 'rainfed', 'borewell']
+PORT = 5058
+
+# Farming regions fields are drawn from: (name, lat, lng, spread in degrees)
+REGIONS = [
+    ('Story County, Iowa', 42.03, -93.47, 0.3),
+    ('Ludhiana, Punjab', 30.90, 75.85, 0.3),
+    ('Nashik, Maharashtra', 20.00, 73.79, 0.4),
+    ('Mandya, Karnataka', 12.52, 76.90, 0.3),
+    ('Bahia, Brazil', -12.15, -45.00, 0.5),
+]
+
+# ✅ Server entry point for gunicorn ("loadtest:create_app()")
+def create_app():
+    from fake_backends import install_fakes
+    from app import app
+
+    install_fakes(
+        ee_latency=float(os.getenv('LOADTEST_EE_LATENCY', '0.4')),
+        gemini_latency=float(os.getenv('LOADTEST_GEMINI_LATENCY', '2.0')),
+        band_store_root=tempfile.mkdtemp(prefix='agriscope-loadtest-')
+    )
+    return app
+
+# ✅ Realistic traffic
+def field_polygon(rng, lat, lng):
+    """Irregular field polygon around a point; areas are log-normal around ~3 ha, up to ~100 ha."""
+    area_m2 = min(rng.lognormvariate(math.log(30000), 0.9), 1e6)
+    radius = math.sqrt(area_m2 / math.pi)
+    vertices = rng.randint(5, 9)
+    ring = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices + rng.uniform(-0.2, 0.2)
+        r = radius * rng.uniform(0.75, 1.25)
+        ring.append([
+            round(lng + r * math.cos(angle) / (111320 * math.cos(math.radians(lat))), 6),
+            round(lat + r * math.sin(angle) / 110540, 6)
+        ])
+    return ring + [ring[0]]
+
+def field_pool(size, seed):
+    """Fields users keep coming back to, so caches see realistic repeats."""
+    rng = random.Random(seed)
+    fields = []
+    for i in range(size):
+        name, lat, lng, spread = rng.choice(REGIONS)
+        center_lat, center_lng = lat + rng.uniform(-spread, spread), lng + rng.uniform(-spread, spread)
+        fields.append({
+            'id': f"field-{i}", 'location': name, 'lat': center_lat, 'lng': center_lng,
+            'coordinates': field_polygon(rng, center_lat, center_lng),
+            'soil_type': rng.choice(SOILS), 'soil_ph': round(rng.uniform(5.5, 8.2), 1),
+            'irrigation': rng.choice(IRRIGATION), 'area': round(rng.uniform(0.5, 40), 1)
+        })
+    return fields
+
+def date_range(rng, today):
+    """A season-sized window ending in the last ~18 months."""
+    days = rng.choices([30, 90, 180, 365], weights=[2, 4, 3, 1])[0]
+    end = today - timedelta(days=rng.randint(5, 540))
+    return (end - timedelta(days=days)).strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+def build_request(kind, rng, fields, today):
+    """
+    One request of a traffic kind.
+
+    Returns:
+        Tuple of (method, path, JSON body or None)
+    """
+    field = rng.choice(fields)
+    start_date, end_date = date_range(rng, today)
+    area = {'coordinates': field['coordinates'], 'start_date': start_date, 'end_date': end_date}
+    if kind == 'calculate':
+        return 'POST', '/api/indices/calculate', dict(area, index_name=rng.choice(INDICES))
+    if kind == 'timeseries':
+        return 'POST', '/api/indices/timeseries', dict(area, index_names=rng.sample(INDICES, rng.randint(1, 3)))
+    if kind == 'list':
+        return 'GET', '/api/indices/list', None
+    if kind == 'recommendation':
+        return 'POST', '/api/crop-recommendations', {
+            'field_data': {key: field[key] for key in ('location', 'area', 'soil_type', 'soil_ph', 'irrigation')},
+            'weather_data': {'avg_temp': rng.randint(18, 32), 'rainfall': rng.randrange(300, 1400, 50),
+                             'humidity': rng.randint(40, 85)},
+            'vegetation_data': {'ndvi': round(rng.uniform(0.2, 0.8), 2)}
+        }
+    if kind == 'debug_stats':
+        # The route's float converter only takes unsigned values
+        return 'GET', f"/api/debug/ndvi-stats/{abs(field['lat']):.4f}/{abs(field['lng']):.4f}", None
+    raise ValueError(f"Unknown request kind: {kind}")
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+# ✅ Worker saturation from /metrics
+# Busy time is read from the server's latency histograms before and after a
+# level (two scrapes, so polling does not take sync workers away): the
+# growth of the summed request durations over the wall time is the mean
+# number of requests being served (Little's law), and likewise for the
+# Earth Engine / Gemini stages.
+SAMPLE_PATTERN = re.compile(r'^(\w+)\{([^}]*)\} (\S+)$', re.M)
+LABEL_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+UPSTREAM_STAGES = ('ee.', 'ai.gemini')
+
+def busy_seconds(base_url):
+    """Seconds spent serving requests and waiting on upstream calls so far, summed over workers."""
+    text = requests.get(f"{base_url}/metrics", timeout=30).text
+    serving = upstream = 0.0
+    for name, labels, value in SAMPLE_PATTERN.findall(text):
+        labels = dict(LABEL_PATTERN.findall(labels))
+        if name == 'agriscope_request_duration_seconds_sum' and labels.get('route') != '/metrics':
+            serving += float(value)
+        elif name == 'agriscope_stage_duration_seconds_sum' and labels.get('stage', '').startswith(UPSTREAM_STAGES):
+            upstream += float(value)
+    return serving, upstream
+
+# ✅ Load generation
+def run_level(base_url, concurrency, duration, mix, fields, seed):
+    """Closed loop: `concurrency` clients send requests back to back for `duration` seconds."""
+    kinds, weights = list(mix), list(mix.values())
+    today = datetime.now()
+    deadline = time.perf_counter() + duration
+
+    def client(client_id):
+        rng = random.Random(seed * 1000 + client_id)
+        session = requests.Session()
+        results = []
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            method, path, body = build_request(kind, rng, fields, today)
+            start = time.perf_counter()
+            try:
+                status = session.request(method, base_url + path, json=body, timeout=180).status_code
+            except requests.RequestException:
+                status = None
+            results.append((kind, time.perf_counter() - start, status))
+        return results
+
+    serving_before, upstream_before = busy_seconds(base_url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = [result for client_results in pool.map(client, range(concurrency)) for result in client_results]
+    elapsed = time.perf_counter() - start
+    serving_after, upstream_after = busy_seconds(base_url)
+    busy = {
+        'in_flight': (serving_after - serving_before) / elapsed,
+        'upstream': (upstream_after - upstream_before) / elapsed
+    }
+    return results, elapsed, busy
+
+def summarize(results, elapsed):
+    latencies = np.array([latency for _, latency, _ in results]) if results else np.zeros(1)
+    errors = sum(1 for _, _, status in results if status is None or status >= 400)
+    return {
+        'requests': len(results),
+        'throughput': len(results) / elapsed,
+        'p50': np.percentile(latencies, 50),
+        'p95': np.percentile(latencies, 95),
+        'p99': np.percentile(latencies, 99),
+        'error_rate': errors / max(len(results), 1)
+    }
+
+def find_knee(levels):
+    """
+    Last concurrency level that still raised throughput by at least 10% over
+    the previous one while keeping p95 within twice the first level's.
+    """
+    knee = levels[0]
+    for previous, level in zip(levels, levels[1:]):
+        if level['throughput'] < previous['throughput'] * 1.1 or level['p95'] > levels[0]['p95'] * 2:
+            break
+        knee = level
+    return knee
+
+def wait_until_up(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+def start_server(args):
+    env = dict(
+        os.environ, SERVING_MODE=args.mode, WEB_CONCURRENCY=str(args.workers), PORT=str(PORT),
+        LOADTEST_EE_LATENCY=str(args.ee_latency), LOADTEST_GEMINI_LATENCY=str(args.gemini_latency),
+        TRACE_SAMPLE_RATE='0'
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'loadtest:create_app()'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{PORT}"
+    try:
+        wait_until_up(f"{base_url}/health")
+    except BaseException:
+        server.terminate()
+        raise
+    return server, base_url
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a realistic request mix at increasing concurrency.')
+    parser.add_argument('--url', help='Target a running server instead of starting gunicorn with the stand-ins')
+    parser.add_argument('--mode', default='gevent', choices=['sync', 'gevent'], help='SERVING_MODE for the started server')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (WEB_CONCURRENCY)')
+    parser.add_argument('--concurrency', default=DEFAULT_CONCURRENCY, help='Comma-separated client counts')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds per concurrency level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='kind=weight pairs: calculate, timeseries, list, recommendation, debug_stats')
+    parser.add_argument('--fields', type=int, default=200, help='Distinct fields in the traffic')
+    parser.add_argument('--ee-latency', type=float, default=0.4, help='Seconds per Earth Engine call (stand-in)')
+    parser.add_argument('--gemini-latency', type=float, default=2.0, help='Seconds per Gemini call (stand-in)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    fields = field_pool(args.fields, args.seed)
+    levels_to_run = [int(level) for level in args.concurrency.split(',')]
+    # Requests one worker can serve at once: one in sync mode, up to the
+    # offload thread pool's blocking calls under gevent. Above 100% calls
+    # are queueing for a thread.
+    per_worker = 1 if args.mode == 'sync' else int(os.getenv('OFFLOAD_THREADS', '32'))
+    capacity = args.workers * per_worker
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        server, base_url = start_server(args)
+
+    print(f"🧪 Load test against {base_url} ({args.mode}, {args.workers} workers, capacity {capacity}; "
+          f"EE {args.ee_latency}s, Gemini {args.gemini_latency}s; {args.duration:g}s per level)")
+    print(f"   mix: {', '.join(f'{kind} {weight:g}' for kind, weight in mix.items())}")
+    print(f"   {'clients':>7} {'requests':>8} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+          f"{'errors':>7} {'in flight':>9} {'upstream':>8} {'saturation':>10}")
+    levels = []
+    try:
+        for concurrency in levels_to_run:
+            results, elapsed, busy = run_level(base_url, concurrency, args.duration, mix, fields, args.seed)
+            level = dict(summarize(results, elapsed), **busy, concurrency=concurrency, results=results)
+            busy = level['in_flight'] if args.mode == 'sync' else level['upstream']
+            level['saturation'] = busy / capacity
+            levels.append(level)
+            print(f"   {concurrency:>7} {level['requests']:>8} {level['throughput']:>7.1f} {level['p50']:>7.2f} "
+                  f"{level['p95']:>7.2f} {level['p99']:>7.2f} {level['error_rate']:>6.1%} {level['in_flight']:>9.1f} "
+                  f"{level['upstream']:>8.1f} {level['saturation']:>9.0%}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    knee = find_knee(levels)
+    print(f"📈 Knee: ~{knee['concurrency']} concurrent clients "
+          f"({knee['throughput']:.1f} req/s, p95 {knee['p95']:.2f} s, saturation {knee['saturation']:.0%})")
+    print("   p95 by request kind at the knee:")
+    for kind in mix:
+        latencies = [latency for result_kind, latency, _ in knee['results'] if result_kind == kind]
+        if latencies:
+            print(f"     {kind:<15} {np.percentile(latencies, 95):6.2f} s  ({len(latencies)} requests)")
+    return levels
+
+if __name__ == '__main__':
+    main()
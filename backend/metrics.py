@@ -0,0 +1,117 @@
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+# ✅ Prometheus metrics
+# With several gunicorn workers every process writes its samples to files in
+# PROMETHEUS_MULTIPROC_DIR (set up by gunicorn.conf.py) and /metrics merges
+# them, so any worker answering the scrape reports the whole instance.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUEST_LATENCY = Histogram(
+    'agriscope_request_duration_seconds', 'Time to build the response (first byte for streams)',
+    ['route', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'agriscope_response_size_bytes', 'Response payload size (non-streamed responses)', ['route'], buckets=SIZE_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'agriscope_requests_in_flight', 'Requests currently being served', ['route'], multiprocess_mode='livesum'
+)
+STAGE_LATENCY = Histogram(
+    'agriscope_stage_duration_seconds', 'Time spent in one stage of serving a request',
+    ['route', 'stage'], buckets=LATENCY_BUCKETS
+)
+EE_ROUND_TRIPS = Counter('agriscope_ee_round_trips_total', 'Blocking Earth Engine calls', ['route', 'operation'])
+GEMINI_CALLS = Counter('agriscope_gemini_calls_total', 'Gemini generate_content calls', ['kind', 'outcome'])
+UPSTREAM_IN_FLIGHT = Gauge(
+    'agriscope_upstream_calls_in_flight', 'Earth Engine and Gemini calls waiting for an answer', ['service'],
+    multiprocess_mode='livesum'
+)
+CACHE_LOOKUPS = Counter('agriscope_cache_lookups_total', 'Cache lookups by result', ['cache', 'result'])
+
+def current_route():
+    """Route template of the current request, 'background' outside of one."""
+    if not has_request_context():
+        return 'background'
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@contextmanager
+def stage(name):
+    """Time a block as one stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(current_route(), name).observe(time.perf_counter() - start)
+
+@contextmanager
+def upstream_call(service):
+    """Track a call to Earth Engine or Gemini in the in-flight gauge."""
+    gauge = UPSTREAM_IN_FLIGHT.labels(service)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+def observe_cache(cache, result):
+    """Count one lookup of a named cache ('hit', 'miss' or e.g. 'partial')."""
+    CACHE_LOOKUPS.labels(cache, result).inc()
+
+def cache_observer(cache):
+    """on_lookup callback for TTLCache that counts hits and misses of `cache`."""
+    hit_counter = CACHE_LOOKUPS.labels(cache, 'hit')
+    miss_counter = CACHE_LOOKUPS.labels(cache, 'miss')
+    return lambda hit: (hit_counter if hit else miss_counter).inc()
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that records serialization as its own stage."""
+
+    def dumps(self, obj, **kwargs):
+        with stage('serialize'):
+            return super().dumps(obj, **kwargs)
+
+def init_app(app):
+    """Install request hooks and the timed JSON provider on a Flask app."""
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_route = current_route()
+        g.metrics_start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.labels(g.metrics_route).inc()
+
+    @app.after_request
+    def record_request_metrics(response):
+        route = g.get('metrics_route')
+        if route is None:
+            return response
+        REQUEST_LATENCY.labels(route, request.method, str(response.status_code)).observe(
+            time.perf_counter() - g.metrics_start
+        )
+        if not response.is_streamed:
+            RESPONSE_SIZE.labels(route).observe(response.calculate_content_length() or 0)
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(error=None):
+        route = g.pop('metrics_route', None)
+        if route is not None:
+            REQUESTS_IN_FLIGHT.labels(route).dec()
+
+def metrics_response():
+    """Prometheus text exposition of this process, or of all workers in multiprocess mode."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
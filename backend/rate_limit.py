@@ -0,0 +1,62 @@
+import threading
+import time
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread that calls a rate-limited API.
+
+    Tokens refill continuously at rate_per_minute up to burst; acquire()
+    blocks until a token is available, so callers are spread out to the
+    allowed rate instead of being rejected by the API.
+    """
+
+    def __init__(self, rate_per_minute, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst or max(1, rate_per_minute))
+        self._tokens = self.burst
+        self._updated = clock()
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=None):
+        """
+        Take one token, waiting for it if necessary.
+
+        Returns:
+            True once a token was taken, False if timeout seconds passed first
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.acquired += 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            self._sleep(wait)
+            with self._lock:
+                self.waited_seconds += wait
+
+    def stats(self):
+        with self._lock:
+            self._refill(self._clock())
+            return {
+                'rate_per_minute': round(self.rate * 60, 3),
+                'available': round(self._tokens, 3),
+                'acquired': self.acquired,
+                'waited_seconds': round(self.waited_seconds, 3)
+            }
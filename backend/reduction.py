@@ -0,0 +1,58 @@
+import math
+import os
+
+from geometry import polygon_area, polygon_perimeter
+from index_registry import index_registry
+
+# Positive buffer applied to a field before any reduction, in Earth Engine
+# and in the local band store, so both sources reduce the same area
+AOI_BUFFER_METERS = 10
+
+# ✅ Adaptive reduction scale
+# Zonal reductions run at the native resolution of the bands involved (10 m,
+# or 20 m when a red-edge / SWIR band is used) as long as the AOI fits in the
+# pixel budget; bigger AOIs are reduced at the smallest multiple of the native
+# scale that fits. Large AOIs also get a tileScale so Earth Engine splits the
+# aggregation into smaller tiles instead of running out of memory. Together
+# this replaces bestEffort, which coarsened big fields silently.
+REDUCTION_PIXEL_BUDGET = int(os.getenv('REDUCTION_PIXEL_BUDGET', '100000'))
+REDUCTION_LARGE_FIELD_HECTARES = float(os.getenv('REDUCTION_LARGE_FIELD_HECTARES', '200'))
+MAX_TILE_SCALE = 16
+
+def reduction_plan(coordinates, index_names, buffer_meters=0, pixel_budget=None):
+    """
+    Scale and tile scale for reducing indices over an AOI.
+
+    Args:
+        coordinates: List of [lng, lat] pairs describing the AOI
+        index_names: Indices being reduced; their bands set the native scale
+        buffer_meters: Positive buffer applied to the AOI before reducing
+        pixel_budget: Maximum pixels per reduction (default REDUCTION_PIXEL_BUDGET)
+
+    Returns:
+        Dict with 'scale_m', 'native_scale_m', 'tile_scale', 'buffer_m',
+        'pixels' (estimated pixels per scene at scale_m), 'area_ha' and
+        'pixel_budget'
+    """
+    pixel_budget = pixel_budget or REDUCTION_PIXEL_BUDGET
+    native_scale = index_registry.native_scale(index_names)
+    area = polygon_area(coordinates)
+    if buffer_meters:
+        area += polygon_perimeter(coordinates) * buffer_meters + math.pi * buffer_meters ** 2
+
+    # Smallest multiple of the native scale whose pixel count fits the budget
+    steps = max(1, math.ceil(math.sqrt(area / pixel_budget) / native_scale))
+    scale = native_scale * steps
+
+    large_fields = area / (REDUCTION_LARGE_FIELD_HECTARES * 10000)
+    tile_scale = 1 if large_fields <= 1 else min(MAX_TILE_SCALE, 2 ** math.ceil(math.log(large_fields, 4)))
+
+    return {
+        'scale_m': scale,
+        'native_scale_m': native_scale,
+        'tile_scale': tile_scale,
+        'buffer_m': buffer_meters,
+        'pixels': math.ceil(area / scale ** 2),
+        'area_ha': round(area / 10000, 2),
+        'pixel_budget': pixel_budget
+    }
@@ -0,0 +1,93 @@
+import os
+import threading
+
+# ✅ Serving mode
+# 'sync' runs one request per gunicorn worker thread (the original setup).
+# 'gevent' runs each request on a greenlet; blocking Earth Engine and Gemini
+# calls are handed to a bounded pool of real OS threads with offload(), so
+# one process keeps dozens of analyses in flight. gevent is only imported
+# when the process was actually monkey-patched by the gevent worker.
+SERVING_MODE = os.getenv('SERVING_MODE', 'sync')
+OFFLOAD_THREADS = int(os.getenv('OFFLOAD_THREADS', '32'))
+
+_SENTINEL = object()
+
+class OffloadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def exit(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'completed': self.completed
+            }
+
+offload_stats = OffloadStats()
+_threadpool = None
+_threadpool_lock = threading.Lock()
+
+def gevent_active():
+    """True when the gevent worker has monkey-patched this process."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+def _gevent_threadpool():
+    global _threadpool
+    with _threadpool_lock:
+        if _threadpool is None:
+            import gevent
+            _threadpool = gevent.get_hub().threadpool
+            _threadpool.maxsize = OFFLOAD_THREADS
+        return _threadpool
+
+def offload(fn, *args, **kwargs):
+    """
+    Run a blocking call without stalling other requests.
+
+    Under gevent the call runs on the hub's OS thread pool (at most
+    OFFLOAD_THREADS at once) while the calling greenlet yields; C-level
+    blocking such as Gemini's gRPC channel would otherwise freeze every
+    greenlet in the worker. In sync mode the call simply runs inline.
+    """
+    if not gevent_active():
+        return fn(*args, **kwargs)
+    offload_stats.enter()
+    try:
+        return _gevent_threadpool().apply(fn, args, kwargs)
+    finally:
+        offload_stats.exit()
+
+def offload_iter(iterable):
+    """Iterate a blocking iterator (e.g. a streamed Gemini response), offloading each step."""
+    iterator = iter(iterable)
+    while True:
+        item = offload(next, iterator, _SENTINEL)
+        if item is _SENTINEL:
+            return
+        yield item
+
+def serving_stats():
+    return {
+        'mode': 'gevent' if gevent_active() else 'sync',
+        'configured_mode': SERVING_MODE,
+        'offload_threads': OFFLOAD_THREADS,
+        'offload': offload_stats.snapshot()
+    }
@@ -8,6 +8,8 @@ setup(
     install_requires=[
         "Flask>=2.3.0,<3.0.0",
         "gunicorn>=20.1.0",
+        "gevent>=23.9.0",
+        "prometheus_client>=0.17.0",
         "flask-cors>=4.0.0",
         "numpy",
         "matplotlib",
@@ -15,5 +17,8 @@ setup(
         "requests",
         "python-dotenv"
     ],
-    python_requires=">=3.8,<3.14"
+    extras_require={
+        "dev": ["pytest", "pytest-benchmark"]
+    },
+    python_requires=">=3.9,<3.14"
 )
@@ -0,0 +1,105 @@
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait for it and receive the same result (or exception).
+    Nothing is remembered once the call finishes, so this complements a
+    cache rather than replacing it.
+
+    Args:
+        timeout: Seconds a waiting caller gives the leader before raising
+            TimeoutError; None waits for as long as the leader takes
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        Run fn() once for all concurrent callers with the same key.
+
+        Returns:
+            Tuple of (result, shared) where shared is True if this caller
+            waited on another caller's execution
+        """
+        call, leader = self.join(key)
+        if not leader:
+            return self.wait(call), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result)
+        return result, False
+
+    def join(self, key):
+        """
+        Join the call for a key, becoming its leader if none is running.
+
+        For callers that cannot wrap their work in a function (e.g. a
+        generator streaming the result as it is produced): the leader must
+        hand its outcome to finish(), the others get it from wait().
+
+        Returns:
+            Tuple of (call, leader)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.executions += 1
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        """Publish the leader's result (or exception) to the waiting callers."""
+        call.result = result
+        call.error = error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+    def wait(self, call):
+        """
+        Block until the leader finishes; returns its result or raises its exception.
+
+        Raises:
+            TimeoutError: The leader did not finish within self.timeout seconds
+        """
+        if not call.done.wait(self.timeout):
+            raise TimeoutError(f"Identical call still running after {self.timeout:g}s")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executions': self.executions,
+                'coalesced': self.coalesced
+            }
@@ -0,0 +1,161 @@
+import json
+
+_MALFORMED = object()
+
+class SectionStreamer:
+    """
+    Incrementally scan a streamed JSON object and report finished sections.
+
+    Text is fed chunk by chunk as it arrives from the model. Every top-level
+    key is reported once its value is complete, and items of the arrays named
+    in item_keys (e.g. recommended_crops) are reported one by one as each
+    item closes. Anything before the first '{' (such as a ```json fence)
+    is ignored.
+
+    Sections are validated as they close: a value that is not valid JSON or
+    does not have the type given in schema is rejected instead of reported,
+    and scanning carries on with the next key. Whatever was accepted before a
+    malformed or truncated tail stays available through salvage().
+
+    Args:
+        item_keys: Top-level keys whose array items are reported individually
+        schema: Optional mapping of top-level key to expected type (dict, list, str)
+    """
+
+    def __init__(self, item_keys=(), schema=None):
+        self.item_keys = set(item_keys)
+        self.schema = schema or {}
+        self.sections = {}
+        self.items = {}
+        self.rejected = []
+        self.text = ''
+        self._pos = 0
+        self._root_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._expect_key = False
+        self._key = None
+        self._value_start = None
+        self._item_start = None
+        self._item_index = 0
+        self.finished = False
+
+    def feed(self, chunk):
+        """
+        Add text and return the events it completes.
+
+        Returns:
+            List of ('section', key, value) and ('item', key, index, value) tuples
+        """
+        self.text += chunk
+        events = []
+        text = self.text
+        while self._pos < len(text) and not self.finished:
+            char = text[self._pos]
+            position = self._pos
+            self._pos += 1
+
+            if self._root_start is None:
+                if char == '{':
+                    self._root_start = position
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect_key:
+                        self._key = json.loads(text[self._string_start:position + 1])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+                if self._depth == 1 and not self._expect_key and self._value_start is None:
+                    self._value_start = position
+                continue
+
+            if char in ' \t\r\n':
+                continue
+
+            if self._depth == 1:
+                if char == ':':
+                    self._expect_key = False
+                    continue
+                if char in ',}':
+                    if self._value_start is not None:
+                        self._emit_section(events, text[self._value_start:position])
+                    self._expect_key = True
+                    if char == '}':
+                        self.finished = True
+                    continue
+                if self._value_start is None and not self._expect_key:
+                    self._value_start = position
+
+            if char in '{[':
+                self._depth += 1
+                if self._depth == 3 and self._key in self.item_keys and char == '{':
+                    self._item_start = position
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 2 and self._item_start is not None and char == '}':
+                    self._emit_item(events, text[self._item_start:position + 1])
+                    self._item_start = None
+        return events
+
+    @property
+    def complete(self):
+        """True once the object closed and every section passed validation."""
+        return self.finished and not self.rejected
+
+    def salvage(self):
+        """
+        Everything recovered so far.
+
+        Returns:
+            Dict of accepted sections; item arrays that never closed (or were
+            rejected as a whole) hold the items that did complete
+        """
+        recovered = dict(self.sections)
+        for key, items in self.items.items():
+            if key not in recovered and items:
+                recovered[key] = list(items)
+        return recovered
+
+    def _valid(self, key, value):
+        expected = self.schema.get(key)
+        if expected is not None and not isinstance(value, expected):
+            return False
+        if key in self.item_keys:
+            return isinstance(value, list) and all(isinstance(item, dict) for item in value)
+        return True
+
+    def _emit_section(self, events, raw):
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = _MALFORMED
+        if value is _MALFORMED or (value is not None and not self._valid(self._key, value)):
+            self.rejected.append(self._key)
+        elif value is not None:
+            self.sections[self._key] = value
+            events.append(('section', self._key, value))
+        self._key = None
+        self._value_start = None
+        self._item_index = 0
+
+    def _emit_item(self, events, raw):
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        self.items.setdefault(self._key, []).append(value)
+        events.append(('item', self._key, self._item_index, value))
+        self._item_index += 1
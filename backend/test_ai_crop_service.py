@@ -0,0 +1,388 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from prometheus_client import REGISTRY
+
+import json
+import re
+
+import ai_crop_service
+from ai_crop_service import (
+    build_crop_recommendation_prompt, get_current_season, parse_ai_response, recommendation_fingerprint
+)
+from cache import TTLCache
+from rate_limit import RateLimiter
+from singleflight import SingleFlight
+
+AI_JSON = '{"land_analysis": {}, "recommended_crops": [{"name": "Wheat"}], "market_insights": {}}'
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    def __init__(self, text=AI_JSON, error=None, respond=None):
+        self.text = text
+        self.respond = respond
+        self.error = error
+        self.calls = 0
+        self.prompts = []
+        self.options = []
+
+    def generate_content(self, prompt, stream=False, **options):
+        self.calls += 1
+        self.prompts.append(prompt)
+        self.options.append(options)
+        if self.error:
+            raise self.error
+        text = self.respond(prompt) if self.respond else self.text
+        if stream:
+            return [FakeResponse(text[i:i + 16]) for i in range(0, len(text), 16)]
+        return FakeResponse(text)
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(ai_crop_service, 'model', model)
+    monkeypatch.setattr(ai_crop_service, 'recommendation_cache', TTLCache(maxsize=8, ttl=60))
+    monkeypatch.setattr(ai_crop_service, 'recommendation_flights', SingleFlight())
+    monkeypatch.setattr(ai_crop_service, 'model_rate_limiter', RateLimiter(6000))
+    return model
+
+FIELD = {'location': 'Nashik, Maharashtra', 'area': '2.5', 'soil_type': 'loamy', 'irrigation': 'drip', 'soil_ph': 6.8}
+
+def test_fingerprint_normalizes_equivalent_inputs():
+    equivalent = {
+        'location': '  nashik,   MAHARASHTRA ', 'area': 2.53, 'soil_type': 'Loam soil',
+        'irrigation': 'Drip Irrigation', 'soil_ph': '6.81', 'previous_crop': 'ignored: not in the prompt'
+    }
+    season = 'Winter (Rabi season)'
+    assert recommendation_fingerprint(FIELD, season=season) == recommendation_fingerprint(equivalent, season=season)
+    assert recommendation_fingerprint(FIELD, season=season) != recommendation_fingerprint(dict(FIELD, area=3), season=season)
+    assert recommendation_fingerprint(FIELD, season=season) != recommendation_fingerprint(FIELD, season='Summer (Zaid season)')
+    assert (recommendation_fingerprint(FIELD, {'avg_temp': 28.2, 'rainfall': 651}, season=season)
+            == recommendation_fingerprint(FIELD, {'avg_temp': 27.8, 'rainfall': 648}, season=season))
+    assert (recommendation_fingerprint(FIELD, season=season, prompt_mode='verbose')
+            != recommendation_fingerprint(FIELD, season=season, prompt_mode='compact'))
+    with pytest.raises(ValueError):
+        recommendation_fingerprint(FIELD, season=season, prompt_mode='terse')
+
+def test_fingerprint_changes_with_the_prompt_month_and_year():
+    # March and May are both Zaid season, but the prompt names the month
+    march, may = datetime(2025, 3, 10), datetime(2025, 5, 10)
+    assert recommendation_fingerprint(FIELD, now=march) != recommendation_fingerprint(FIELD, now=may)
+    assert recommendation_fingerprint(FIELD, now=march) != recommendation_fingerprint(FIELD, now=datetime(2026, 3, 10))
+    assert recommendation_fingerprint(FIELD, now=march) == recommendation_fingerprint(FIELD, now=datetime(2025, 3, 28))
+
+def test_empty_optional_inputs_count_as_missing_in_prompt_and_fingerprint():
+    season = 'Winter (Rabi season)'
+    bare_prompt = build_crop_recommendation_prompt(FIELD, None, None)
+    assert 'CURRENT WEATHER CONDITIONS' not in bare_prompt and 'FIELD HEALTH INDICATORS' not in bare_prompt
+    for empty in ({}, {'source': 'manual'}, {'avg_temp': '', 'ndvi': None}):
+        assert (recommendation_fingerprint(FIELD, empty, empty, season=season)
+                == recommendation_fingerprint(FIELD, season=season))
+        assert build_crop_recommendation_prompt(FIELD, empty, empty) == bare_prompt
+
+    partial = build_crop_recommendation_prompt(FIELD, {'avg_temp': '', 'rainfall': 650}, None)
+    assert 'Average Temperature: N/A°C' in partial and 'Expected Rainfall: 650mm' in partial
+
+def test_current_season_buckets():
+    assert get_current_season(datetime(2024, 4, 1))[0] == 'Summer (Zaid season)'
+    assert get_current_season(datetime(2024, 7, 1))[0] == 'Monsoon (Kharif season)'
+    assert get_current_season(datetime(2024, 1, 1))[0] == 'Winter (Rabi season)'
+
+def test_repeat_requests_are_served_from_cache(fake_model):
+    first = ai_crop_service.generate_ai_crop_recommendations(FIELD)
+    repeat = ai_crop_service.generate_ai_crop_recommendations(dict(FIELD, soil_type='Loamy Soil'))
+    assert fake_model.calls == 1
+    assert first['cached'] is False and repeat['cached'] is True
+    assert repeat['recommendations'] == first['recommendations']
+    assert ai_crop_service.recommendation_cache_stats()['hits'] == 1
+
+    ai_crop_service.generate_ai_crop_recommendations(FIELD, use_cache=False)
+    assert fake_model.calls == 2
+
+def test_failures_are_not_cached(fake_model):
+    fake_model.error = RuntimeError('quota exceeded')
+    failed = ai_crop_service.generate_ai_crop_recommendations(FIELD)
+    assert failed['fallback'] is True
+
+    fake_model.error = None
+    recovered = ai_crop_service.generate_ai_crop_recommendations(FIELD)
+    assert recovered['status'] == 'success' and recovered['cached'] is False
+    assert fake_model.calls == 2
+
+def test_concurrent_duplicates_make_one_gemini_call(fake_model, monkeypatch):
+    release = threading.Event()
+    generate = fake_model.generate_content
+
+    def slow_generate(prompt, **options):
+        release.wait(5)
+        return generate(prompt, **options)
+
+    monkeypatch.setattr(fake_model, 'generate_content', slow_generate)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(ai_crop_service.generate_ai_crop_recommendations, FIELD) for _ in range(4)]
+        # Three duplicates wait on the first request's Gemini call
+        while ai_crop_service.recommendation_flights.stats()['coalesced'] < 3:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert fake_model.calls == 1
+    assert all(result['status'] == 'success' for result in results)
+
+def test_stream_emits_sections_then_caches_the_result(fake_model):
+    events = list(ai_crop_service.stream_ai_crop_recommendations(FIELD))
+    assert [event['type'] for event in events] == ['started', 'preliminary', 'section', 'crop', 'section', 'done']
+    assert events[0]['cached'] is False
+    assert len(events[1]['recommended_crops']) == 3
+    assert events[3] == {'type': 'crop', 'index': 0, 'value': {'name': 'Wheat'}}
+    assert events[-1]['result']['recommendations']['recommended_crops'] == [{'name': 'Wheat'}]
+
+    replayed = list(ai_crop_service.stream_ai_crop_recommendations(FIELD))
+    assert replayed[0]['cached'] is True and replayed[-1]['result']['cached'] is True
+    assert [event['type'] for event in replayed] == ['started', 'section', 'crop', 'section', 'done']
+    assert fake_model.calls == 1
+
+    # The non-streaming endpoint shares the cache
+    assert ai_crop_service.generate_ai_crop_recommendations(FIELD)['cached'] is True
+
+def test_concurrent_duplicate_streams_make_one_gemini_call(fake_model, monkeypatch):
+    release = threading.Event()
+    generate = fake_model.generate_content
+
+    def slow_generate(prompt, **options):
+        release.wait(5)
+        return generate(prompt, **options)
+
+    monkeypatch.setattr(fake_model, 'generate_content', slow_generate)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(lambda: list(ai_crop_service.stream_ai_crop_recommendations(FIELD))) for _ in range(2)]
+        futures.append(pool.submit(ai_crop_service.generate_ai_crop_recommendations, FIELD))
+        while ai_crop_service.recommendation_flights.stats()['coalesced'] < 2:
+            threading.Event().wait(0.01)
+        release.set()
+        streams = [future.result() for future in futures[:2]]
+        plain = futures[2].result()
+
+    assert fake_model.calls == 1
+    # Waiting streams replay the leader's answer with the same event sequence
+    assert [event['type'] for event in streams[0]] == [event['type'] for event in streams[1]]
+    assert all(stream[-1]['type'] == 'done' and stream[-1]['result']['cached'] is False for stream in streams)
+    assert plain['status'] == 'success'
+    assert ai_crop_service.recommendation_flights.in_flight() == 0
+
+@pytest.mark.parametrize('events_read', [1, 2, 3])
+def test_closing_a_stream_early_releases_its_flight(fake_model, events_read):
+    stream = ai_crop_service.stream_ai_crop_recommendations(FIELD)
+    for _ in range(events_read):
+        next(stream)
+    stream.close()
+    assert ai_crop_service.recommendation_flights.in_flight() == 0
+
+    # An identical request is not left waiting on the abandoned one
+    events = list(ai_crop_service.stream_ai_crop_recommendations(FIELD))
+    assert events[-1]['type'] == 'done'
+
+def test_waiting_streams_give_up_on_a_stuck_leader(fake_model, monkeypatch):
+    monkeypatch.setattr(ai_crop_service, 'recommendation_flights', SingleFlight(timeout=0.05))
+    cache_key = recommendation_fingerprint(FIELD, prompt_mode=ai_crop_service.resolve_prompt_mode(None))
+    ai_crop_service.recommendation_flights.join(cache_key)
+
+    events = list(ai_crop_service.stream_ai_crop_recommendations(FIELD))
+    assert [event['type'] for event in events] == ['started', 'preliminary', 'error']
+    assert ai_crop_service.generate_ai_crop_recommendations(FIELD)['fallback'] is True
+    assert fake_model.calls == 0
+
+def test_stream_reports_errors(fake_model):
+    fake_model.error = RuntimeError('quota exceeded')
+    events = list(ai_crop_service.stream_ai_crop_recommendations(FIELD))
+    assert [event['type'] for event in events] == ['started', 'preliminary', 'error']
+    assert 'quota exceeded' in events[-1]['error']
+
+def gemini_calls(outcome):
+    return REGISTRY.get_sample_value('agriscope_gemini_calls_total', {'kind': 'stream', 'outcome': outcome}) or 0
+
+def test_stream_outcome_is_counted_when_the_stream_ends(fake_model, monkeypatch):
+    def failing_stream(prompt, **options):
+        yield FakeResponse(AI_JSON[:16])
+        raise RuntimeError('connection reset')
+
+    before = {outcome: gemini_calls(outcome) for outcome in ('ok', 'error')}
+    list(ai_crop_service.stream_ai_crop_recommendations(FIELD, use_cache=False))
+    assert gemini_calls('ok') == before['ok'] + 1
+
+    monkeypatch.setattr(fake_model, 'generate_content', failing_stream)
+    events = list(ai_crop_service.stream_ai_crop_recommendations(FIELD, use_cache=False))
+    assert events[-1]['type'] == 'error'
+    assert gemini_calls('ok') == before['ok'] + 1
+    assert gemini_calls('error') == before['error'] + 1
+
+COMPACT_JSON = (
+    '```json\n{"la": {"sa": "Fertile loam", "wr": "Moderate"}, "c": [{"n": "Wheat", "m": "Strong mandi demand", '
+    '"d": "H", "x": "L"}, {"n": "Chickpea", "q": "l"}], "mk": {"tr": "Rising pulse prices"}, "zz": {}}\n```'
+)
+
+def test_compact_mode_expands_to_the_verbose_shape(fake_model):
+    fake_model.text = COMPACT_JSON
+    result = ai_crop_service.generate_ai_crop_recommendations(FIELD, prompt_mode='compact')
+    recommendations = result['recommendations']
+    assert result['status'] == 'success'
+    assert recommendations['land_analysis'] == {'soil_assessment': 'Fertile loam', 'water_requirements': 'Moderate'}
+    assert recommendations['recommended_crops'][0] == {
+        'name': 'Wheat', 'market_potential': 'High demand. Strong mandi demand', 'risk_factors': 'Low risk.'
+    }
+    assert recommendations['market_insights'] == {'current_trends': 'Rising pulse prices'}
+    assert fake_model.options[0]['generation_config']['max_output_tokens'] == ai_crop_service.COMPACT_MAX_OUTPUT_TOKENS
+
+    # Compact and verbose answers are cached separately
+    ai_crop_service.generate_ai_crop_recommendations(FIELD, prompt_mode='compact')
+    fake_model.text = AI_JSON
+    ai_crop_service.generate_ai_crop_recommendations(FIELD, prompt_mode='verbose')
+    assert fake_model.calls == 2
+
+def test_compact_stream_emits_expanded_sections(fake_model):
+    fake_model.text = COMPACT_JSON
+    events = list(ai_crop_service.stream_ai_crop_recommendations(FIELD, prompt_mode='compact'))
+    assert [event['type'] for event in events] == ['started', 'preliminary', 'section', 'crop', 'crop', 'section', 'done']
+    assert events[2]['key'] == 'land_analysis'
+    assert events[4]['value'] == {'name': 'Chickpea', 'growing_tips': 'Low water need.'}
+    assert events[5]['key'] == 'market_insights'
+    assert events[-1]['result']['recommendations']['recommended_crops'][1]['name'] == 'Chickpea'
+
+def test_parse_salvages_sections_before_a_malformed_tail():
+    text = AI_JSON[:-1] + ', "action_plan": {"immediate_steps": "Test soil", "timeline": }, "sustainability_advice": {"soil'
+    parsed = parse_ai_response(text)
+    assert parsed['recommended_crops'] == [{'name': 'Wheat'}]
+    assert 'action_plan' not in parsed and 'ai_full_response' not in str(parsed)
+    assert 'missing: season_analysis, action_plan, sustainability_advice' in parsed['ai_note']
+    assert parse_ai_response(AI_JSON) == {'land_analysis': {}, 'recommended_crops': [{'name': 'Wheat'}], 'market_insights': {}}
+
+def test_parse_fills_missing_required_sections_from_the_text_fallback():
+    parsed = parse_ai_response('{"land_analysis": {"soil_assessment": "Loam"}, "recommended_crops": [{"name": "Rice"}, {"na')
+    assert parsed['land_analysis'] == {'soil_assessment': 'Loam'}
+    assert parsed['recommended_crops'] == [{'name': 'Rice'}]
+    assert parsed['market_insights']['current_trends']  # text fallback placeholder
+    assert parse_ai_response('no json here')['recommended_crops'][0]['ai_full_response'] == 'no json here'
+
+def test_stream_caches_a_salvaged_answer(fake_model):
+    fake_model.text = AI_JSON[:-1] + ', "action_plan": {"immediate_steps": '
+    events = list(ai_crop_service.stream_ai_crop_recommendations(FIELD))
+    assert events[-1]['type'] == 'done'
+    assert events[-1]['result']['recommendations']['recommended_crops'] == [{'name': 'Wheat'}]
+    assert ai_crop_service.generate_ai_crop_recommendations(FIELD)['cached'] is True
+
+    # The replay only carries response sections, not the salvage note
+    replayed = list(ai_crop_service.stream_ai_crop_recommendations(FIELD))
+    live_types = [event['type'] for event in events if event['type'] != 'preliminary']
+    assert [event['type'] for event in replayed] == live_types
+    assert 'ai_note' not in {event.get('key') for event in replayed}
+
+def test_fallback_ranks_crops_for_the_field():
+    fallback = ai_crop_service.get_fallback_recommendations(
+        {'soil_type': 'Black Cotton Soil', 'soil_ph': '7.2', 'irrigation': 'Rainfed'},
+        {'avg_temp': 29, 'rainfall': 900}, {'ndvi': 0.6}
+    )
+    assert fallback['status'] == 'fallback' and fallback['ai_generated'] is False
+    crops = fallback['recommended_crops']
+    assert len(crops) == 3 and crops[0]['suitability_score'] >= crops[-1]['suitability_score']
+    assert 'black soil' in crops[0]['why_suitable']
+
+COMPACT_ANSWER = {"la": {"sa": "Loam"}, "c": [{"n": "Wheat"}], "mk": {"tr": "Stable"}}
+
+def packed_answer(prompt, drop=()):
+    """Answer every field label in a packed prompt (except those in drop) with the field's location as crop name."""
+    if 'one object with keys' not in prompt:
+        location = re.search(r'location=([^;|\n]+)', prompt).group(1)
+        return json.dumps(dict(COMPACT_ANSWER, c=[{"n": location}]))
+    answer = {}
+    for label, location in re.findall(r'^(f\d+): Field: location=([^;|]+)', prompt, flags=re.M):
+        if label not in drop:
+            answer[label] = dict(COMPACT_ANSWER, c=[{"n": location}])
+    return json.dumps(answer)[:-1] + ', "f9": {"la": '  # truncated tail
+
+def batch_items(count, duplicates=0):
+    items = [{'id': f'field-{i}', 'field_data': dict(FIELD, location=f'Village {i}')} for i in range(count)]
+    items += [{'id': f'copy-{i}', 'field_data': dict(FIELD, location=f'Village {i}')} for i in range(duplicates)]
+    return items
+
+def test_batch_dedups_and_packs_compact_fields(fake_model):
+    fake_model.respond = packed_answer
+    events = list(ai_crop_service.batch_ai_crop_recommendations(batch_items(6, duplicates=2), pack_size=4))
+    fields = {event['id']: event for event in events if event['type'] == 'field'}
+    assert len(fields) == 8
+    assert all(event['result']['status'] == 'success' for event in fields.values())
+    assert fields['copy-1']['duplicate'] and fields['copy-1']['result'] == fields['field-1']['result']
+    assert fields['field-5']['result']['recommendations']['recommended_crops'] == [{'name': 'Village 5'}]
+    assert events[-1] == {'type': 'done', 'fields': 8, 'unique': 6, 'cached': 0, 'model_calls': 2, 'failed': 0}
+    assert fake_model.calls == 2
+
+    # Every field is now cached, also for single compact requests
+    repeat = list(ai_crop_service.batch_ai_crop_recommendations(batch_items(6)))
+    assert repeat[-1]['cached'] == 6 and fake_model.calls == 2
+    assert ai_crop_service.generate_ai_crop_recommendations(
+        dict(FIELD, location='Village 2'), prompt_mode='compact'
+    )['cached'] is True
+
+def test_batch_retries_fields_missing_from_a_packed_answer(fake_model):
+    fake_model.respond = lambda prompt: packed_answer(prompt, drop=('f2',))
+    events = list(ai_crop_service.batch_ai_crop_recommendations(batch_items(3), pack_size=3))
+    fields = {event['id']: event['result'] for event in events if event['type'] == 'field'}
+    assert fields['field-1']['recommendations']['recommended_crops'] == [{'name': 'Village 1'}]
+    assert events[-1]['model_calls'] == 2 and events[-1]['failed'] == 0
+
+def test_batch_retries_every_field_when_a_packed_call_fails(fake_model):
+    def fail_once(prompt):
+        if fake_model.calls == 1:
+            raise RuntimeError('response blocked')
+        return packed_answer(prompt)
+
+    fake_model.respond = fail_once
+    events = list(ai_crop_service.batch_ai_crop_recommendations(batch_items(3), pack_size=3))
+    fields = {event['id']: event['result'] for event in events if event['type'] == 'field'}
+    assert all(result['status'] == 'success' for result in fields.values())
+    assert events[-1]['model_calls'] == 4 and events[-1]['failed'] == 0
+
+def test_batch_reports_failures_per_field(fake_model):
+    fake_model.error = RuntimeError('quota exceeded')
+    events = list(ai_crop_service.batch_ai_crop_recommendations(batch_items(3), prompt_mode='verbose'))
+    assert [event['result']['fallback'] for event in events[:-1]] == [True, True, True]
+    assert events[-1]['failed'] == 3 and events[-1]['model_calls'] == 3
+
+def test_batch_does_not_count_calls_it_shared(fake_model):
+    item = batch_items(1)[0]
+    key = recommendation_fingerprint(item['field_data'], prompt_mode='verbose')
+    answer = ai_crop_service.request_ai_crop_recommendations(item['field_data'], prompt_mode='verbose')
+    flights = ai_crop_service.recommendation_flights
+
+    # Another request is already asking Gemini about this field
+    call, leader = flights.join(key)
+    assert leader
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(ai_crop_service.run_batch_unit, [key], {key: item}, 'verbose')
+        while flights.stats()['coalesced'] < 1:
+            threading.Event().wait(0.01)
+        flights.finish(key, call, answer)
+        results, calls = future.result()
+
+    assert results[key] is answer and calls == 0
+    assert fake_model.calls == 1
+
+def test_quota_errors_are_retried_with_backoff(fake_model, monkeypatch):
+    from google.api_core.exceptions import ResourceExhausted
+    sleeps = []
+    monkeypatch.setattr(ai_crop_service.time, 'sleep', sleeps.append)
+    generate = fake_model.generate_content
+    failures = [ResourceExhausted('429 quota'), ResourceExhausted('429 quota')]
+
+    def flaky_generate(prompt, **options):
+        if failures:
+            raise failures.pop()
+        return generate(prompt, **options)
+
+    monkeypatch.setattr(fake_model, 'generate_content', flaky_generate)
+    assert ai_crop_service.generate_ai_crop_recommendations(FIELD)['status'] == 'success'
+    assert sleeps == [2, 4]
@@ -0,0 +1,161 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+import band_store
+from band_store import STORE_BANDS, BandStore, chip_grid
+from fake_backends import install_fakes, scenes_between, synthetic_bands
+from geometry import polygon_coverage, polygon_mask
+from reduction import AOI_BUFFER_METERS
+from vegetation_indices import compute_indices
+
+FIELD = [[77.5900, 12.9700], [77.5930, 12.9700], [77.5930, 12.9725], [77.5900, 12.9725]]
+
+def synthetic_chips(scene_count, shape, seed=0):
+    rng = np.random.default_rng(seed)
+    bands = rng.integers(1, 10000, size=(scene_count, len(STORE_BANDS)) + shape, dtype=np.uint16)
+    bands[:, STORE_BANDS.index('SCL')] = 4  # vegetation
+    return bands
+
+@pytest.fixture
+def stored_field(tmp_path):
+    store = BandStore(root=str(tmp_path))
+    bounds, shape = chip_grid(FIELD)
+    bands = synthetic_chips(4, shape)
+    bands[1, STORE_BANDS.index('SCL'), :3] = 9  # cloud over the first rows of the second scene
+    # Written out of order; the store sorts scenes by date
+    scenes = [
+        {'id': 'S_C', 'date': '2024-03-11', 'time_start': 3},
+        {'id': 'S_A', 'date': '2024-03-01', 'time_start': 1},
+        {'id': 'S_D', 'date': '2024-03-16', 'time_start': 4},
+        {'id': 'S_B', 'date': '2024-03-06', 'time_start': 2},
+    ]
+    chips = store.write(FIELD, scenes, bands, bounds, '2024-03-01', '2024-04-01')
+    return store, chips, bands, scenes
+
+def test_chip_grid_is_about_ten_meters_and_covers_the_field():
+    bounds, (height, width) = chip_grid(FIELD)
+    # ~325 m x ~280 m field plus the 10 m AOI buffer and a pixel of padding on every side
+    assert 34 <= width <= 38 and 30 <= height <= 34
+    assert bounds[0] < 77.5900 and bounds[2] > 77.5930 and bounds[1] < 12.9700 and bounds[3] > 12.9725
+
+def test_polygon_mask_matches_rectangle():
+    mask = polygon_mask([[0, 0], [2, 0], [2, 1], [0, 1]], [0, 0, 4, 2], (4, 8))
+    expected = np.zeros((4, 8), dtype=bool)
+    expected[2:, :4] = True
+    np.testing.assert_array_equal(mask, expected)
+
+def test_reads_are_memory_mapped_and_sorted_by_date(stored_field):
+    store, chips, bands, scenes = stored_field
+    assert isinstance(chips.bands, np.memmap)
+    assert chips.dates == ['2024-03-01', '2024-03-06', '2024-03-11', '2024-03-16']
+
+    window = chips.window('2024-03-05', '2024-03-12')
+    assert [chips.scenes[i]['id'] for i in range(*chips.date_range('2024-03-05', '2024-03-12'))] == ['S_B', 'S_C']
+    assert np.shares_memory(window, chips.bands)
+    np.testing.assert_array_equal(window[0], bands[3])
+    assert np.shares_memory(chips.scene_bands(0)['B8'], chips.bands)
+
+    # Re-opening returns the same mapped field until it is rewritten
+    assert store.open(list(reversed(FIELD))) is chips
+
+def test_local_time_series_matches_direct_computation(stored_field):
+    store, chips, bands, scenes = stored_field
+    series = store.time_series(FIELD, '2024-03-01', '2024-03-12', ['NDVI', 'NDRE'])
+    assert [scene['id'] for scene in series['NDVI']] == ['S_A', 'S_B', 'S_C']
+
+    position = 1  # S_B, partly clouded
+    scene_bands = {band: bands[3, i] for i, band in enumerate(STORE_BANDS) if band != 'SCL'}
+    clear = bands[3, STORE_BANDS.index('SCL')] != 9
+    expected = compute_indices(['NDVI', 'NDRE'], scene_bands, mask=clear)
+    coverage = polygon_coverage(FIELD, chips.meta['bounds'], chips.bands.shape[2:], buffer_meters=AOI_BUFFER_METERS)
+    for name in ('NDVI', 'NDRE'):
+        weights = np.where(np.isfinite(expected[name]), coverage, 0.0)
+        weighted_mean = np.nansum(expected[name] * weights) / weights.sum()
+        assert series[name][position]['value'] == pytest.approx(weighted_mean, rel=1e-12)
+        assert series[name][position]['stats']['pixel_count'] == np.count_nonzero(weights)
+        assert series[name][position]['stats']['p10'] <= series[name][position]['stats']['p90']
+
+def test_only_serves_ranges_inside_the_exported_span(stored_field):
+    store, chips, bands, scenes = stored_field
+    assert store.covers(FIELD, '2024-03-05', '2024-04-01')
+    assert not store.covers(FIELD, '2024-02-20', '2024-03-10')
+    assert store.time_series(FIELD, '2024-03-20', '2024-04-10', ['NDVI']) is None
+    assert store.time_series([[0, 0], [1, 0], [1, 1]], '2024-03-01', '2024-03-10', ['NDVI']) is None
+
+def test_rewrite_replaces_field(stored_field, tmp_path):
+    store, chips, bands, scenes = stored_field
+    bounds, shape = chip_grid(FIELD)
+    rewritten = store.write(FIELD, scenes[:1], synthetic_chips(1, shape, seed=1), bounds, '2024-03-10', '2024-03-20')
+    assert rewritten is not chips
+    assert rewritten.dates == ['2024-03-11']
+    assert [field['scene_count'] for field in store.fields()] == [1]
+
+def test_local_series_reduces_the_same_buffered_area_as_earth_engine(tmp_path):
+    # NIR rises from west to east, so including or missing the buffer ring moves the mean
+    store = BandStore(root=str(tmp_path))
+    bounds, (height, width) = chip_grid(FIELD)
+    bands = np.zeros((1, len(STORE_BANDS), height, width), dtype=np.uint16)
+    bands[0, STORE_BANDS.index('SCL')] = 4
+    bands[0, STORE_BANDS.index('B4')] = 800
+    bands[0, STORE_BANDS.index('B8')] = np.linspace(1000, 6000, width, dtype=np.uint16)
+    store.write(FIELD, [{'id': 'S_A', 'date': '2024-03-01', 'time_start': 1}], bands, bounds, '2024-03-01', '2024-04-01')
+    local = store.time_series(FIELD, '2024-03-01', '2024-04-01', ['NDVI'])['NDVI'][0]['value']
+
+    # Reference for reduceRegion(mean) over aoi.buffer(10): pixel weights are the share of
+    # 16x16 sub-pixels within 10 m of the rectangular field, measured in meters
+    sub = 16
+    west, south, east, north = bounds
+    lngs = west + (np.arange(width * sub) + 0.5) * (east - west) / (width * sub)
+    lats = north - (np.arange(height * sub) + 0.5) * (north - south) / (height * sub)
+    meters_lng, meters_lat = 111320.0 * np.cos(np.radians(12.97125)), 110574.0
+    dx = np.maximum(np.maximum(77.5900 - lngs, lngs - 77.5930), 0) * meters_lng
+    dy = np.maximum(np.maximum(12.9700 - lats, lats - 12.9725), 0) * meters_lat
+    inside = dy[:, np.newaxis] ** 2 + dx[np.newaxis, :] ** 2 <= AOI_BUFFER_METERS ** 2
+    weights = inside.reshape(height, sub, width, sub).mean(axis=(1, 3))
+    ndvi = compute_indices(['NDVI'], {'B4': bands[0, STORE_BANDS.index('B4')], 'B8': bands[0, STORE_BANDS.index('B8')]})['NDVI']
+    earth_engine = float((ndvi * weights).sum() / weights.sum())
+
+    unbuffered = polygon_coverage(FIELD, bounds, (height, width))
+    unbuffered_mean = float((ndvi * unbuffered).sum() / unbuffered.sum())
+    assert local == pytest.approx(earth_engine, abs=5e-4)
+    assert abs(unbuffered_mean - earth_engine) > 10 * abs(local - earth_engine)
+
+def test_export_writes_each_request_straight_into_the_store(monkeypatch, tmp_path):
+    fake_ee, _ = install_fakes(monkeypatch.setattr)
+    store = BandStore(root=str(tmp_path))
+    _, shape = chip_grid(FIELD)
+    # Two scenes per computePixels request
+    monkeypatch.setattr(band_store, 'EXPORT_MAX_BYTES', 2 * len(STORE_BANDS) * 2 * shape[0] * shape[1])
+
+    chips = store.export(FIELD, '2024-04-01', '2024-06-30')
+    expected = scenes_between('2024-04-01', '2024-06-30')
+    assert [scene['id'] for scene in chips.scenes] == [scene['id'] for scene in expected]
+    assert fake_ee.calls['computePixels'] == math.ceil(len(expected) / 2)
+    for position, scene in enumerate(expected):
+        synthetic = synthetic_bands(scene['id'], shape)
+        for i, band in enumerate(STORE_BANDS):
+            np.testing.assert_array_equal(chips.bands[position, i], synthetic[band])
+
+def test_failed_export_keeps_the_stored_field(stored_field, monkeypatch, tmp_path):
+    store, chips, bands, scenes = stored_field
+    install_fakes(monkeypatch.setattr)
+    monkeypatch.setattr(band_store, 'EXPORT_MAX_BYTES', 1)
+    compute_pixels = band_store.compute_pixels
+    requests = []
+
+    def failing_compute_pixels(request):
+        requests.append(request)
+        if len(requests) == 2:
+            raise RuntimeError('computePixels quota exceeded')
+        return compute_pixels(request)
+
+    monkeypatch.setattr(band_store, 'compute_pixels', failing_compute_pixels)
+    with pytest.raises(RuntimeError):
+        store.export(FIELD, '2024-04-01', '2024-06-30')
+
+    # The staged copy is gone and the field still holds the earlier chips
+    assert os.listdir(tmp_path) == [chips.meta['field_key']]
+    assert store.open(FIELD) is chips and chips.dates[0] == '2024-03-01'
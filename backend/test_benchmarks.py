@@ -0,0 +1,122 @@
+import os
+import tracemalloc
+
+import pytest
+
+import ai_crop_service
+import app as app_module
+from fake_backends import install_fakes
+from jobs import JobManager
+
+# Offline benchmarks of every route in app.py against FakeEarthEngine and
+# FakeGeminiModel (see fake_backends.py). Each benchmark records, next to the
+# timing, the Earth Engine and Gemini calls and the allocation peak of one
+# request in extra_info. Compare against a stored baseline with:
+#   python -m pytest test_benchmarks.py --benchmark-autosave            (store)
+#   python -m pytest test_benchmarks.py --benchmark-compare --benchmark-compare-fail=mean:10%
+# BENCH_EE_LATENCY / BENCH_GEMINI_LATENCY add a per-call delay; the default
+# of 0 measures only the server's own work.
+BENCH_ROUNDS = int(os.getenv('BENCH_ROUNDS', '5'))
+EE_LATENCY = float(os.getenv('BENCH_EE_LATENCY', '0'))
+GEMINI_LATENCY = float(os.getenv('BENCH_GEMINI_LATENCY', '0'))
+
+FIELD = [[-93.098, 41.878], [-93.088, 41.878], [-93.088, 41.888], [-93.098, 41.888], [-93.098, 41.878]]
+AREA = {'coordinates': FIELD, 'start_date': '2024-04-01', 'end_date': '2024-09-30'}
+FIELD_DATA = {'location': 'Story County, Iowa', 'area': 2.5, 'soil_type': 'loamy', 'soil_ph': 6.6, 'irrigation': 'rainfed'}
+WEATHER = {'avg_temp': 24, 'rainfall': 820, 'humidity': 70}
+VEGETATION = {'ndvi': 0.62}
+RECOMMENDATION = {'field_data': FIELD_DATA, 'weather_data': WEATHER, 'vegetation_data': VEGETATION, 'use_cache': False}
+
+def submit_job(client):
+    response = client.post('/api/indices/timeseries', json=dict(AREA, index_name='NDVI', use_cache=False, **{'async': True}))
+    return f"/api/jobs/{response.get_json()['job_id']}"
+
+# (name, method, path or callable(client) -> path, JSON body, expected status, keep caches between rounds)
+ENDPOINTS = [
+    ('root', 'GET', '/', None, 200, False),
+    ('health', 'GET', '/health', None, 200, False),
+    ('ready', 'GET', '/ready', None, 200, False),
+    ('metrics', 'GET', '/metrics', None, 200, False),
+    ('process_ndvi', 'POST', '/process_ndvi', AREA, 200, False),
+    ('process_ndvi_cached', 'POST', '/process_ndvi', AREA, 200, True),
+    ('ndvi_time_series', 'POST', '/ndvi_time_series', AREA, 200, False),
+    ('indices_calculate', 'POST', '/api/indices/calculate', dict(AREA, index_name='EVI'), 200, False),
+    ('indices_timeseries', 'POST', '/api/indices/timeseries', dict(AREA, index_name='NDVI', use_cache=False), 200, False),
+    ('indices_timeseries_multi', 'POST', '/api/indices/timeseries',
+     dict(AREA, index_names=['NDVI', 'EVI', 'SAVI', 'NDRE'], use_cache=False), 200, False),
+    ('indices_timeseries_cached', 'POST', '/api/indices/timeseries', dict(AREA, index_name='NDVI'), 200, True),
+    ('indices_timeseries_async', 'POST', '/api/indices/timeseries',
+     dict(AREA, index_name='NDVI', use_cache=False, **{'async': True}), 202, False),
+    ('job_status', 'GET', submit_job, None, 200, False),
+    ('job_cancel', 'DELETE', submit_job, None, 200, False),
+    ('indices_timeseries_stream', 'POST', '/api/indices/timeseries/stream',
+     dict(AREA, index_names=['NDVI', 'EVI'], use_cache=False), 200, False),
+    ('indices_timeseries_batch', 'POST', '/api/indices/timeseries/batch', {
+        'fields': [{'id': f"field-{i}", 'coordinates': [[x + i * 0.02, y] for x, y in FIELD]} for i in range(10)],
+        'start_date': AREA['start_date'], 'end_date': AREA['end_date'], 'index_names': ['NDVI', 'EVI']
+    }, 200, False),
+    ('indices_list', 'GET', '/api/indices/list', None, 200, False),
+    ('band_store_export', 'POST', '/api/band-store/fields', AREA, 202, False),
+    ('band_store_list', 'GET', '/api/band-store/fields', None, 200, False),
+    ('crop_recommendations', 'POST', '/api/crop-recommendations', RECOMMENDATION, 200, False),
+    ('crop_recommendations_cached', 'POST', '/api/crop-recommendations', dict(RECOMMENDATION, use_cache=True), 200, True),
+    ('crop_recommendations_stream', 'POST', '/api/crop-recommendations/stream', RECOMMENDATION, 200, False),
+    ('crop_recommendations_batch', 'POST', '/api/crop-recommendations/batch', {
+        'fields': [{'id': f"field-{i}", 'field_data': dict(FIELD_DATA, area=1 + i)} for i in range(6)],
+        'weather_data': WEATHER, 'vegetation_data': VEGETATION, 'prompt_mode': 'verbose', 'use_cache': False
+    }, 200, False),
+    ('crop_recommendations_cache_stats', 'GET', '/api/crop-recommendations/cache', None, 200, False),
+    ('debug_auth', 'GET', '/debug/auth', None, 200, False),
+    ('debug_ndvi_stats', 'GET', '/api/debug/ndvi-stats/12.971/77.594', None, 200, False),
+]
+
+@pytest.fixture
+def fakes(monkeypatch, tmp_path):
+    jobs = JobManager()
+    monkeypatch.setattr(app_module, 'job_manager', jobs)
+    yield install_fakes(monkeypatch.setattr, ee_latency=EE_LATENCY, gemini_latency=GEMINI_LATENCY,
+                        band_store_root=str(tmp_path))
+    # Let background jobs finish while the fakes are still installed
+    for job in list(jobs._jobs.values()):
+        job.wait(30)
+
+def clear_caches():
+    app_module.map_id_cache.clear()
+    app_module.time_series_cache.clear()
+    ai_crop_service.recommendation_cache.clear()
+
+@pytest.mark.parametrize('name, method, path, body, expected_status, warm', ENDPOINTS, ids=[e[0] for e in ENDPOINTS])
+def test_endpoint(benchmark, fakes, name, method, path, body, expected_status, warm):
+    fake_ee, fake_model = fakes
+    client = app_module.app.test_client()
+    clear_caches()
+
+    def prepare():
+        if not warm:
+            clear_caches()
+        return (path(client) if callable(path) else path,), {}
+
+    def request_once(url):
+        response = client.open(url, method=method, json=body)
+        response.get_data()  # drain streamed responses
+        return response
+
+    response = benchmark.pedantic(request_once, setup=prepare, rounds=BENCH_ROUNDS, warmup_rounds=1)
+    assert response.status_code == expected_status, response.get_data(as_text=True)
+
+    # Upstream calls and allocations of one more request, outside the timed rounds
+    (url,), _ = prepare()
+    fake_ee.reset_calls()
+    gemini_calls = fake_model.calls
+    tracemalloc.start()
+    response = request_once(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    benchmark.extra_info.update({
+        'status': response.status_code,
+        'ee_calls': dict(fake_ee.calls),
+        'ee_round_trips': sum(fake_ee.calls.values()),
+        'gemini_calls': fake_model.calls - gemini_calls,
+        'response_bytes': len(response.get_data()),
+        'peak_alloc_kib': round(peak / 1024, 1)
+    })
@@ -0,0 +1,62 @@
+import time
+
+import tracing
+from cache import TTLCache
+
+def test_lru_eviction_and_stats():
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 1 and stats['misses'] == 1
+
+def test_get_or_load_skips_none_and_expires():
+    cache = TTLCache(maxsize=4, ttl=0.05)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return 'url' if len(calls) > 1 else None
+
+    assert cache.get_or_load('k', loader) == (None, False)
+    assert cache.get_or_load('k', loader) == ('url', False)
+    assert cache.get_or_load('k', loader) == ('url', True)
+    time.sleep(0.06)
+    assert cache.get_or_load('k', loader) == ('url', False)
+    assert len(calls) == 3
+
+def test_refresh_ahead_replaces_entry_in_background():
+    cache = TTLCache(maxsize=4, ttl=0.2)
+    versions = iter(['v1', 'v2'])
+    cache.get_or_load('k', lambda: next(versions))
+
+    value, hit = cache.get_or_load('k', lambda: next(versions), refresh_ahead=1)
+    assert (value, hit) == ('v1', True)
+
+    deadline = time.monotonic() + 1
+    while cache.get('k') != 'v2' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get('k') == 'v2'
+    assert cache.stats()['refreshes'] == 1
+
+def test_failed_refresh_is_logged_as_error(monkeypatch):
+    records = []
+    monkeypatch.setattr(tracing, '_emit', lambda level, entry: records.append((level, entry)))
+    cache = TTLCache(maxsize=4, ttl=0.2)
+    cache.set('k', 'v1')
+
+    def failing_loader():
+        raise RuntimeError('upstream down')
+
+    assert cache.get_or_load('k', failing_loader, refresh_ahead=1) == ('v1', True)
+    deadline = time.monotonic() + 1
+    while cache._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Other threads may log meanwhile (e.g. the EE initializer), so only look at refresh events
+    assert [(level, entry['error']) for level, entry in records if entry['event'] == 'cache_refresh_failed'] == [
+        ('error', 'upstream down')]
+    assert cache.get('k') == 'v1' and cache.stats()['refreshes'] == 0
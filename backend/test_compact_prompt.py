@@ -0,0 +1,32 @@
+import json
+from datetime import datetime
+
+from ai_crop_service import build_crop_recommendation_prompt
+from compact_prompt import (
+    COMPACT_SCHEMA_TEXT, CROP_FIELDS, SECTION_FIELDS, build_compact_prompt, expand_compact_response, expand_crop
+)
+
+FIELD = {'location': 'Nashik, Maharashtra', 'area': '2.5', 'soil_type': 'loamy', 'irrigation': 'drip', 'soil_ph': 6.8}
+WEATHER = {'avg_temp': 28, 'rainfall': 650}
+
+def test_compact_prompt_is_much_shorter_than_verbose():
+    compact = build_compact_prompt(FIELD, WEATHER, None, 'Winter (Rabi season)', now=datetime(2024, 11, 1))
+    verbose = build_crop_recommendation_prompt(FIELD, WEATHER, None)
+    assert len(compact) < len(verbose) / 2
+    assert 'Not specified' not in compact and 'Health:' not in compact
+    assert 'location=Nashik, Maharashtra' in compact and 'rain mm=650' in compact
+
+def test_schema_lists_every_short_key_once():
+    schema = json.loads(COMPACT_SCHEMA_TEXT)
+    assert set(schema) == {short_key for short_key, _, _ in SECTION_FIELDS} | {'c'}
+    for short_key, _, fields in SECTION_FIELDS:
+        assert set(schema[short_key]) == {field for field, _, _ in fields}
+    assert {field for field, _, _ in CROP_FIELDS} <= set(schema['c'][0])
+
+def test_expansion_drops_unknown_and_malformed_sections():
+    expanded = expand_compact_response({'la': {'sa': 'Loam', 'ch': ''}, 'sn': 'not a dict', 'c': [{'n': 'Rice'}, 7], 'q': 1})
+    assert expanded == {'land_analysis': {'soil_assessment': 'Loam'}, 'recommended_crops': [{'name': 'Rice'}]}
+
+def test_enum_levels_are_folded_into_text_fields():
+    crop = expand_crop({'n': 'Maize', 'g': 'Mulch early', 'q': 'medium', 'd': '?', 'x': 'H'})
+    assert crop == {'name': 'Maize', 'growing_tips': 'Moderate water need. Mulch early', 'risk_factors': 'High risk.'}
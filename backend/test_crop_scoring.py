@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from crop_scoring import CROP_CATALOG, FACTORS, recommend_crops, score_crops, season_key, soil_columns
+
+def names(crops):
+    return [crop['name'] for crop in crops]
+
+def test_season_and_soil_parsing():
+    assert season_key('Winter (Rabi season)') == 'rabi'
+    assert season_key('Monsoon (Kharif season)') == 'kharif'
+    assert season_key(None) is None
+    assert soil_columns('sandy loam') == soil_columns('loam sand')
+    assert soil_columns('unknown') == []
+
+def test_unknown_inputs_are_left_out_of_the_score():
+    scores, factors = score_crops(ph=7.0)
+    assert np.isnan(factors[FACTORS.index('soil')]).all()
+    # Only pH is known, so each score is the pH factor itself
+    np.testing.assert_allclose(scores, factors[FACTORS.index('ph')])
+    assert np.all(score_crops()[0] == 0.5)
+
+def test_off_season_crops_are_penalised():
+    rabi, _ = score_crops(soil='loamy', season='rabi')
+    kharif, _ = score_crops(soil='loamy', season='kharif')
+    wheat = names(CROP_CATALOG).index('Wheat')
+    assert rabi[wheat] > kharif[wheat]
+    assert recommend_crops(soil='loamy', season='rabi')[0]['name'] != 'Rice'
+
+def test_dry_sandy_field_prefers_drought_tolerant_crops():
+    crops = recommend_crops(soil='sandy', ph=7.8, rainfall=300, irrigation='rainfed', avg_temp=32, season='zaid')
+    assert crops[0]['name'] == 'Pearl Millet (Bajra)'
+    assert 'Sugarcane' not in names(recommend_crops(soil='sandy', rainfall=300, irrigation='rainfed', top=8))
+
+@pytest.mark.parametrize('rainfall, irrigation', [(200, 'canal'), (None, 'drip')])
+def test_irrigation_covers_a_rainfall_deficit(rainfall, irrigation):
+    scores, factors = score_crops(rainfall=rainfall, irrigation=irrigation)
+    rice = names(CROP_CATALOG).index('Rice')
+    assert factors[FACTORS.index('water'), rice] > score_crops(rainfall=200)[1][FACTORS.index('water'), rice]
+
+def test_weak_factors_are_reported_as_risks():
+    crop = recommend_crops(soil='black', ph=9.0, season='kharif', top=1)[0]
+    assert 'pH 9' in crop['risk_factors'] and 0 <= crop['suitability_score'] <= 100
@@ -0,0 +1,51 @@
+import os
+import threading
+
+from ee_init import FAILED, PENDING, READY, EarthEngineInitializer
+
+def flaky(failures):
+    calls = []
+
+    def authenticate():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise RuntimeError(f'auth failure {len(calls)}')
+        return 'test credentials'
+    return authenticate, calls
+
+def test_retries_with_capped_exponential_backoff():
+    authenticate, calls = flaky(failures=4)
+    sleeps = []
+    initializer = EarthEngineInitializer(authenticate, max_attempts=6, backoff_seconds=1,
+                                         max_backoff_seconds=5, sleep=sleeps.append)
+    initializer.start()
+    assert initializer.wait(5)
+    assert sleeps == [1, 2, 4, 5]
+    assert initializer.status()['status'] == READY and initializer.status()['attempts'] == 5
+    assert initializer.status()['method'] == 'test credentials'
+
+def test_gives_up_after_max_attempts():
+    authenticate, calls = flaky(failures=10)
+    initializer = EarthEngineInitializer(authenticate, max_attempts=3, sleep=lambda seconds: None)
+    assert not initializer.wait(5)
+    assert initializer.state == FAILED and len(calls) == 3
+    assert initializer.status()['last_error'] == 'auth failure 3'
+
+def test_wait_returns_after_the_timeout_while_pending():
+    release = threading.Event()
+    initializer = EarthEngineInitializer(lambda: release.wait(5) and 'late', max_attempts=1)
+    assert not initializer.wait(0.05)
+    assert initializer.state == PENDING
+    release.set()
+    assert initializer.wait(5)
+
+def test_start_is_idempotent_per_process():
+    authenticate, calls = flaky(failures=0)
+    initializer = EarthEngineInitializer(authenticate)
+    initializer.start()
+    initializer.start()
+    assert initializer.wait(5) and len(calls) == 1
+    # After a fork the child starts its own attempt
+    initializer._pid = os.getpid() + 1
+    initializer.start()
+    assert initializer.wait(5) and len(calls) == 2
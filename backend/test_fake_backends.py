@@ -0,0 +1,29 @@
+import pytest
+
+import app as app_module
+from fake_backends import FakeBackendError, FakeEarthEngine, install_fakes
+
+FIELD = [[-93.098, 41.878], [-93.088, 41.878], [-93.088, 41.888], [-93.098, 41.888], [-93.098, 41.878]]
+AREA = {'coordinates': FIELD, 'start_date': '2024-04-01', 'end_date': '2024-09-30'}
+
+@pytest.fixture
+def fake_ee(monkeypatch, tmp_path):
+    fake_ee, _ = install_fakes(monkeypatch.setattr, band_store_root=str(tmp_path))
+    app_module.time_series_cache.clear()
+    return fake_ee
+
+def test_time_series_is_one_round_trip(fake_ee):
+    response = app_module.app.test_client().post(
+        '/api/indices/timeseries', json=dict(AREA, index_names=['NDVI', 'EVI'], use_cache=False)
+    )
+    body = response.get_json()
+    assert response.status_code == 200
+    assert fake_ee.calls == {'getInfo': 1}
+    assert set(body['series']) == {'NDVI', 'EVI'} and len(body['series']['NDVI']) > 20
+
+def test_unmodelled_expressions_fail_with_the_supported_ops():
+    fake = FakeEarthEngine()
+    with pytest.raises(FakeBackendError, match='supported: Dictionary'):
+        fake.Image('COPERNICUS/S2_SR/x').reduceRegion(reducer=fake.Reducer.mean()).getInfo()
+    with pytest.raises(FakeBackendError, match='system:index'):
+        fake.ImageCollection('COPERNICUS/S2_SR').aggregate_array('CLOUD_COVER').getInfo()
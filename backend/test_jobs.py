@@ -0,0 +1,68 @@
+import threading
+
+import tracing
+from jobs import JobManager, QueueFullError
+
+def test_job_runs_and_reports_result():
+    manager = JobManager(max_workers=1, queue_limit=5)
+    job = manager.submit('test', lambda job: ({'value': 42}, 200))
+    assert job.wait(2)
+    info = manager.get(job.id).to_dict()
+    assert info['status'] == 'succeeded'
+    assert info['result'] == {'value': 42}
+    assert info['progress'] == 1.0
+
+def test_running_job_stops_at_next_checkpoint_when_cancelled():
+    manager = JobManager(max_workers=1, queue_limit=5)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(job):
+        started.set()
+        release.wait(2)
+        job.report_progress(0.5, 'halfway')
+        return {}, 200
+
+    job = manager.submit('test', slow)
+    assert started.wait(2)
+    manager.cancel(job.id)
+    release.set()
+    assert job.wait(2)
+    assert job.status == 'cancelled'
+
+def test_queue_limit_and_queued_cancellation():
+    manager = JobManager(max_workers=1, queue_limit=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking(job):
+        started.set()
+        release.wait(2)
+        return {}, 200
+
+    running = manager.submit('test', blocking)
+    assert started.wait(2)
+    queued = manager.submit('test', lambda job: ({}, 200))
+    try:
+        manager.submit('test', lambda job: ({}, 200))
+        assert False, 'expected QueueFullError'
+    except QueueFullError:
+        pass
+    manager.cancel(queued.id)
+    assert queued.status == 'cancelled'
+    release.set()
+    assert running.wait(2)
+
+def test_failed_job_is_logged_as_error(monkeypatch):
+    records = []
+    monkeypatch.setattr(tracing, '_emit', lambda level, entry: records.append((level, entry)))
+    manager = JobManager(max_workers=1, queue_limit=5)
+
+    def fail(job):
+        raise RuntimeError('quota exceeded')
+
+    job = manager.submit('test', fail)
+    assert job.wait(2)
+    assert manager.get(job.id).to_dict()['status'] == 'failed'
+    [(level, entry)] = [record for record in records if record[1]['event'] == 'job_failed']
+    assert level == 'error' and entry['job_id'] == job.id and entry['error'] == 'quota exceeded'
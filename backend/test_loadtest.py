@@ -0,0 +1,40 @@
+import random
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from fake_backends import install_fakes
+from geometry import canonicalize_polygon
+from loadtest import DEFAULT_MIX, build_request, field_pool, find_knee, parse_mix
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    install_fakes(monkeypatch.setattr, band_store_root=str(tmp_path))
+    return app_module.app.test_client()
+
+def test_field_pool_is_deterministic_and_closed():
+    fields = field_pool(20, seed=3)
+    assert fields == field_pool(20, seed=3)
+    for field in fields:
+        ring = field['coordinates']
+        assert ring[0] == ring[-1] and 6 <= len(ring) <= 10
+        assert canonicalize_polygon(ring)
+
+@pytest.mark.parametrize('kind', list(parse_mix(DEFAULT_MIX)))
+def test_every_request_kind_is_served(client, kind):
+    rng = random.Random(7)
+    fields = field_pool(10, seed=7)
+    for _ in range(3):
+        method, path, body = build_request(kind, rng, fields, datetime(2026, 6, 1))
+        response = client.open(path, method=method, json=body)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+def test_knee_is_where_throughput_stops_growing():
+    levels = [
+        {'concurrency': 1, 'throughput': 2.0, 'p95': 1.0},
+        {'concurrency': 4, 'throughput': 7.5, 'p95': 1.1},
+        {'concurrency': 16, 'throughput': 8.0, 'p95': 3.5},
+        {'concurrency': 64, 'throughput': 12.0, 'p95': 9.0},
+    ]
+    assert find_knee(levels)['concurrency'] == 4
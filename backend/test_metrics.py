@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from flask import Flask, jsonify
+from prometheus_client import REGISTRY
+
+import metrics
+from cache import TTLCache
+from metrics import cache_observer, stage
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def make_app():
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.route('/fields/<field_id>')
+    def field(field_id):
+        with stage('ee.getInfo'):
+            pass
+        return jsonify({'id': field_id})
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return metrics.metrics_response()
+
+    return app
+
+def test_requests_are_labelled_by_route_template():
+    client = make_app().test_client()
+    before = sample('agriscope_request_duration_seconds_count', route='/fields/<field_id>', method='GET', status='200')
+    stage_before = sample('agriscope_stage_duration_seconds_count', route='/fields/<field_id>', stage='ee.getInfo')
+
+    assert client.get('/fields/a').status_code == 200
+    assert client.get('/fields/b').status_code == 200
+
+    assert sample('agriscope_request_duration_seconds_count',
+                  route='/fields/<field_id>', method='GET', status='200') == before + 2
+    assert sample('agriscope_stage_duration_seconds_count',
+                  route='/fields/<field_id>', stage='ee.getInfo') == stage_before + 2
+    assert sample('agriscope_stage_duration_seconds_count', route='/fields/<field_id>', stage='serialize') >= 2
+    assert sample('agriscope_requests_in_flight', route='/fields/<field_id>') == 0
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'agriscope_request_duration_seconds_bucket{' in body
+    assert 'route="/fields/<field_id>"' in body
+
+def test_cache_observer_counts_hits_and_misses():
+    cache = TTLCache(maxsize=4, on_lookup=cache_observer('test_cache'))
+    cache.get('a')
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get_or_load('a', lambda: 2)
+    cache.get_or_load('b', lambda: 3)
+    assert sample('agriscope_cache_lookups_total', cache='test_cache', result='hit') == 2
+    assert sample('agriscope_cache_lookups_total', cache='test_cache', result='miss') == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+
+def test_multiprocess_mode_merges_workers(tmp_path):
+    # Each "worker" is a separate interpreter writing to the shared directory
+    worker = textwrap.dedent('''
+        from metrics import EE_ROUND_TRIPS
+        EE_ROUND_TRIPS.labels('/fields', 'getInfo').inc(3)
+    ''')
+    env = {'PROMETHEUS_MULTIPROC_DIR': str(tmp_path)}
+    for _ in range(2):
+        result = subprocess.run([sys.executable, '-c', worker], capture_output=True, text=True,
+                                timeout=60, env=dict(os.environ, **env))
+        assert result.returncode == 0, result.stderr
+
+    scrape = textwrap.dedent('''
+        from metrics import metrics_response
+        print(metrics_response().get_data(as_text=True))
+    ''')
+    result = subprocess.run([sys.executable, '-c', scrape], capture_output=True, text=True,
+                            timeout=60, env=dict(os.environ, **env))
+    assert result.returncode == 0, result.stderr
+    assert 'agriscope_ee_round_trips_total{operation="getInfo",route="/fields"} 6.0' in result.stdout
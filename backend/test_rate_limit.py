@@ -0,0 +1,30 @@
+from rate_limit import RateLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_burst_then_spaced_to_the_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(60, burst=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        assert limiter.acquire()
+    assert clock.now == 0
+    limiter.acquire()
+    limiter.acquire()
+    # One token per second once the burst is spent
+    assert clock.now == 2.0
+    assert limiter.stats()['acquired'] == 5 and limiter.stats()['waited_seconds'] == 2.0
+
+def test_acquire_times_out():
+    clock = FakeClock()
+    limiter = RateLimiter(6, burst=1, clock=clock, sleep=clock.sleep)
+    assert limiter.acquire()
+    assert not limiter.acquire(timeout=4)
+    assert limiter.acquire(timeout=10)
@@ -0,0 +1,83 @@
+import pytest
+
+import app as app_module
+from fake_backends import install_fakes, walk
+from geometry import polygon_area, polygon_perimeter
+from index_registry import index_registry
+from reduction import MAX_TILE_SCALE, reduction_plan
+
+FIELD = [[-93.098, 41.878], [-93.088, 41.878], [-93.088, 41.888], [-93.098, 41.888], [-93.098, 41.878]]
+
+def square(size_degrees, lng=-93.0, lat=41.0):
+    return [[lng, lat], [lng + size_degrees, lat], [lng + size_degrees, lat + size_degrees],
+            [lng, lat + size_degrees], [lng, lat]]
+
+def test_polygon_area_and_perimeter_are_geodesic():
+    # 1° x 1° at the equator is about 12,364 km² with 111.2 km sides
+    assert polygon_area(square(1, 0, 0)) == pytest.approx(12364e6, rel=0.002)
+    assert polygon_perimeter(square(1, 0, 0)) == pytest.approx(4 * 111195, rel=0.002)
+    assert polygon_area(FIELD) == pytest.approx(92e4, rel=0.01)
+    assert polygon_area(list(reversed(FIELD))) == pytest.approx(polygon_area(FIELD))
+    assert polygon_area(FIELD[:-1]) == pytest.approx(polygon_area(FIELD))
+
+def test_native_scale_follows_the_coarsest_band():
+    assert index_registry.native_scale(['NDVI', 'EVI']) == 10
+    assert index_registry.native_scale(['NDVI', 'NDRE']) == 20
+
+def test_small_fields_reduce_at_native_scale():
+    plan = reduction_plan(FIELD, ['NDVI'], buffer_meters=10)
+    assert plan['scale_m'] == plan['native_scale_m'] == 10
+    assert plan['tile_scale'] == 1
+    assert plan['pixels'] <= plan['pixel_budget']
+
+    assert reduction_plan(FIELD, ['NDRE'])['scale_m'] == 20
+
+def test_large_fields_coarsen_within_budget_and_tile():
+    plan = reduction_plan(square(0.2), ['NDVI'])
+    assert plan['scale_m'] > 10 and plan['scale_m'] % 10 == 0
+    assert plan['pixels'] <= plan['pixel_budget']
+    # One step finer would blow the budget
+    assert polygon_area(square(0.2)) / (plan['scale_m'] - 10) ** 2 > plan['pixel_budget']
+    assert 1 < plan['tile_scale'] <= MAX_TILE_SCALE
+
+    assert reduction_plan(square(2), ['NDVI'])['tile_scale'] == MAX_TILE_SCALE
+    assert reduction_plan(square(0.2), ['NDVI'], pixel_budget=10 ** 9)['scale_m'] == 10
+
+def test_time_series_reports_plan_and_caches_per_scale(monkeypatch, tmp_path):
+    install_fakes(monkeypatch.setattr, band_store_root=str(tmp_path))
+    app_module.time_series_cache.clear()
+    client = app_module.app.test_client()
+    area = {'coordinates': FIELD, 'start_date': '2024-04-01', 'end_date': '2024-06-30'}
+
+    body = client.post('/api/indices/timeseries', json=dict(area, index_name='NDVI')).get_json()
+    assert body['cache']['reduction']['scale_m'] == 10
+
+    # A 20 m index is a different reduction, so it is not served from the 10 m entry
+    body = client.post('/api/indices/timeseries', json=dict(area, index_names=['NDVI', 'NDRE'])).get_json()
+    assert body['cache']['reduction']['scale_m'] == 20
+    assert body['cache']['status'] == 'miss'
+
+def test_band_store_and_earth_engine_report_the_same_buffer(monkeypatch, tmp_path):
+    install_fakes(monkeypatch.setattr, band_store_root=str(tmp_path))
+    app_module.time_series_cache.clear()
+    client = app_module.app.test_client()
+    area = {'coordinates': FIELD, 'start_date': '2024-04-01', 'end_date': '2024-06-30', 'index_name': 'NDVI'}
+
+    remote = client.post('/api/indices/timeseries', json=area).get_json()['cache']
+    app_module.band_store.export(FIELD, '2024-03-01', '2024-07-01')
+    local = client.post('/api/indices/timeseries', json=area).get_json()['cache']
+    assert local['source'] == 'band_store'
+    assert local['reduction'] == {'scale_m': 10, 'buffer_m': 10}
+    assert remote['reduction']['buffer_m'] == 10 and remote['reduction']['scale_m'] == 10
+
+def test_reduce_region_uses_the_plan(monkeypatch, tmp_path):
+    fake_ee, _ = install_fakes(monkeypatch.setattr, band_store_root=str(tmp_path))
+    evaluated = []
+    get_info = fake_ee.get_info
+    monkeypatch.setattr(fake_ee, 'get_info', lambda node: evaluated.append(node) or get_info(node))
+
+    plan = reduction_plan(FIELD, ['NDRE'], buffer_meters=10)
+    app_module.fetch_index_time_series(FIELD, [('2024-04-01', '2024-05-01')], ['NDRE'], plan)
+    [reduction] = [node for node in walk(evaluated) if node._op == 'reduceRegion']
+    assert reduction._kwargs['scale'] == plan['scale_m'] == 20
+    assert reduction._kwargs['tileScale'] == plan['tile_scale']
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+import textwrap
+
+from serving import gevent_active, offload, offload_iter, serving_stats
+
+def test_sync_mode_runs_inline():
+    assert not gevent_active()
+    assert offload(divmod, 7, 2) == (3, 1)
+    assert list(offload_iter(iter([1, 2, 3]))) == [1, 2, 3]
+    assert serving_stats()['mode'] == 'sync' and serving_stats()['offload']['completed'] == 0
+
+def test_gevent_mode_overlaps_thread_blocking_calls():
+    # Run in a fresh interpreter: monkey-patching cannot be undone
+    script = textwrap.dedent('''
+        from gevent import monkey
+        monkey.patch_all()
+        import time
+        import gevent
+        from serving import offload, serving_stats
+
+        blocking_sleep = monkey.get_original('time', 'sleep')
+        start = time.perf_counter()
+        gevent.joinall([gevent.spawn(offload, blocking_sleep, 0.2) for _ in range(10)])
+        elapsed = time.perf_counter() - start
+        stats = serving_stats()
+        assert stats['mode'] == 'gevent', stats
+        assert stats['offload']['peak_in_flight'] == 10, stats
+        assert elapsed < 1.0, elapsed
+    ''')
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
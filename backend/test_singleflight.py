@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+def test_concurrent_callers_share_one_execution():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return {'value': 42}
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(flights.do, 'key', slow) for _ in range(5)]
+        # Wait until the four followers are queued behind the leader
+        while flights.stats()['coalesced'] < 4:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0][0] for result, _ in results)
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert flights.stats() == {'in_flight': 0, 'executions': 1, 'coalesced': 4}
+
+def test_errors_reach_every_waiter_and_are_not_remembered():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError('quota exceeded')
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flights.do, 'key', failing) for _ in range(3)]
+        while flights.stats()['coalesced'] < 2:
+            threading.Event().wait(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    assert flights.do('key', lambda: 'recovered') == ('recovered', False)
+
+def test_waiters_time_out_on_a_leader_that_never_finishes():
+    flights = SingleFlight(timeout=0.05)
+    call, leader = flights.join('key')
+    assert leader
+    with pytest.raises(TimeoutError):
+        flights.do('key', lambda: 'never run')
+
+    flights.finish('key', call, 'late')
+    assert flights.do('key', lambda: 'fresh') == ('fresh', False)
+
+def test_different_keys_and_sequential_calls_run_separately():
+    flights = SingleFlight()
+    assert flights.do('a', lambda: 1) == (1, False)
+    assert flights.do('a', lambda: 2) == (2, False)
+    assert flights.do('b', lambda: 3) == (3, False)
+    assert flights.stats()['executions'] == 3
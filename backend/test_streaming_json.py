@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from streaming_json import SectionStreamer
+
+RESPONSE = {
+    "land_analysis": {"soil_assessment": "Loamy, pH 6.8 {well drained}", "challenges": "Quote \" and \\ escapes"},
+    "season_analysis": {"current_season_suitability": "Good"},
+    "recommended_crops": [
+        {"name": "Wheat", "tips": ["sow early", {"spacing_cm": 20}]},
+        {"name": "Mustard", "why_suitable": "Low water [needs]"}
+    ],
+    "score": 0.82,
+    "note": None
+}
+TEXT = "```json\n" + json.dumps(RESPONSE, indent=2) + "\n```"
+
+def collect(chunks):
+    streamer = SectionStreamer(item_keys=['recommended_crops'])
+    events = []
+    for chunk in chunks:
+        events.extend(streamer.feed(chunk))
+    return streamer, events
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, len(TEXT)])
+def test_sections_and_items_complete_regardless_of_chunking(chunk_size):
+    streamer, events = collect(TEXT[i:i + chunk_size] for i in range(0, len(TEXT), chunk_size))
+    assert events == [
+        ('section', 'land_analysis', RESPONSE['land_analysis']),
+        ('section', 'season_analysis', RESPONSE['season_analysis']),
+        ('item', 'recommended_crops', 0, RESPONSE['recommended_crops'][0]),
+        ('item', 'recommended_crops', 1, RESPONSE['recommended_crops'][1]),
+        ('section', 'recommended_crops', RESPONSE['recommended_crops']),
+        ('section', 'score', 0.82),
+    ]
+    assert streamer.finished and streamer.text == TEXT
+
+def test_section_is_reported_as_soon_as_it_closes():
+    prefix = '{"land_analysis": {"soil_assessment": "ok"}'
+    streamer, events = collect([prefix])
+    assert events == []  # the value may still be followed by more keys
+    assert streamer.feed(', "season_analysis": {') == [('section', 'land_analysis', {'soil_assessment': 'ok'})]
+
+def test_malformed_section_is_skipped():
+    streamer, events = collect(['{"a": {"x": 1,}, "b": [1, 2]}'])
+    assert events == [('section', 'b', [1, 2])]
+
+def test_schema_rejects_wrong_types_and_keeps_scanning():
+    streamer = SectionStreamer(item_keys=['crops'], schema={'a': dict, 'crops': list})
+    events = streamer.feed('{"a": [1], "crops": [{"n": 1}, 2], "b": "ok"}')
+    assert events == [('item', 'crops', 0, {'n': 1}), ('section', 'b', 'ok')]
+    assert streamer.rejected == ['a', 'crops'] and streamer.finished and not streamer.complete
+    # The whole array was rejected, but its complete object items are salvaged
+    assert streamer.salvage() == {'crops': [{'n': 1}], 'b': 'ok'}
+
+def test_salvage_keeps_sections_before_a_truncated_tail():
+    streamer, _ = collect([TEXT[:TEXT.index('Mustard') + 20]])
+    assert not streamer.finished
+    assert streamer.salvage() == {
+        'land_analysis': RESPONSE['land_analysis'],
+        'season_analysis': RESPONSE['season_analysis'],
+        'recommended_crops': RESPONSE['recommended_crops'][:1]
+    }
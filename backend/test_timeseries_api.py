@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+import app as app_module
+from fake_backends import install_fakes
+
+FIELD = [[-93.098, 41.878], [-93.088, 41.878], [-93.088, 41.888], [-93.098, 41.888], [-93.098, 41.878]]
+AREA = {'coordinates': FIELD, 'start_date': '2024-04-01', 'end_date': '2024-06-30'}
+
+@pytest.fixture
+def fake_ee(monkeypatch, tmp_path):
+    fake_ee, _ = install_fakes(monkeypatch.setattr, band_store_root=str(tmp_path))
+    app_module.time_series_cache.clear()
+    app_module.map_id_cache.clear()
+    return fake_ee
+
+@pytest.fixture
+def client(fake_ee):
+    return app_module.app.test_client()
+
+def test_multi_index_series_match_single_index_requests(client):
+    multi = client.post('/api/indices/timeseries', json=dict(AREA, index_names=['NDVI', 'EVI'], use_cache=False))
+    body = multi.get_json()
+    assert multi.status_code == 200
+    assert set(body['series']) == {'NDVI', 'EVI'}
+    assert body['measurement_counts'] == {name: len(points) for name, points in body['series'].items()}
+
+    for name in ('NDVI', 'EVI'):
+        single = client.post('/api/indices/timeseries', json=dict(AREA, index_name=name, use_cache=False)).get_json()
+        assert [(point['date'], point['value']) for point in single['time_series']] == [
+            (point['date'], point['value']) for point in body['series'][name]]
+
+def test_unknown_index_names_are_rejected(client):
+    response = client.post('/api/indices/timeseries', json=dict(AREA, index_names=['NDVI', 'XYZ']))
+    assert response.status_code == 400
+    assert 'XYZ' in response.get_json()['error']
+
+@pytest.mark.parametrize('path, body', [
+    ('/api/indices/calculate', dict(AREA, index_name='EVI')),
+    ('/api/indices/timeseries', dict(AREA, index_name='NDVI')),
+    ('/api/indices/timeseries', dict(AREA, index_names=['NDVI', 'EVI', 'SAVI'])),
+])
+def test_index_requests_take_one_round_trip(client, fake_ee, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 200
+    assert response.headers['X-EE-Round-Trips'] == '1'
+    assert sum(fake_ee.calls.values()) == 1
+
+def test_cached_time_series_needs_no_round_trip(client, fake_ee):
+    client.post('/api/indices/timeseries', json=dict(AREA, index_name='NDVI'))
+    fake_ee.reset_calls()
+    response = client.post('/api/indices/timeseries', json=dict(AREA, index_name='NDVI'))
+    assert response.headers['X-EE-Round-Trips'] == '0'
+    assert not fake_ee.calls
+
+def batch_body(count, **extra):
+    fields = [{'id': f"field-{i}", 'coordinates': [[lng + i * 0.02, lat] for lng, lat in FIELD]} for i in range(count)]
+    return dict({'fields': fields, 'start_date': AREA['start_date'], 'end_date': AREA['end_date'],
+                 'index_names': ['NDVI', 'EVI']}, **extra)
+
+def test_batch_series_are_keyed_by_field_id_in_one_round_trip(client, fake_ee):
+    response = client.post('/api/indices/timeseries/batch', json=batch_body(5))
+    body = response.get_json()
+    assert response.status_code == 200
+    assert fake_ee.calls == {'getInfo': 1} and response.headers['X-EE-Round-Trips'] == '1'
+    assert body['total_fields'] == 5 and set(body['fields']) == {f"field-{i}" for i in range(5)}
+    for result in body['fields'].values():
+        assert set(result['series']) == {'NDVI', 'EVI'}
+        assert result['measurement_counts'] == {name: len(points) for name, points in result['series'].items()}
+        dates = [point['date'] for point in result['series']['NDVI']]
+        assert dates == sorted(dates) and len(dates) == body['scene_count']
+    # Every field is reduced over its own polygon
+    assert body['fields']['field-0']['series']['NDVI'] != body['fields']['field-1']['series']['NDVI']
+
+def test_batch_rejects_duplicate_field_ids(client):
+    body = batch_body(2)
+    body['fields'][1]['id'] = body['fields'][0]['id']
+    response = client.post('/api/indices/timeseries/batch', json=body)
+    assert response.status_code == 400 and 'unique' in response.get_json()['error']
+
+def test_stream_sends_one_ndjson_line_per_window_then_done(client):
+    response = client.post('/api/indices/timeseries/stream', json=dict(AREA, index_names=['NDVI', 'EVI'], use_cache=False))
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    # Windows are sent in completion order
+    windows, done = sorted(events[:-1], key=lambda event: event['start_date']), events[-1]
+    assert [(event['start_date'], event['end_date']) for event in windows] == [
+        ('2024-04-01', '2024-05-01'), ('2024-05-01', '2024-06-01'), ('2024-06-01', '2024-06-30')]
+    assert all(event['type'] == 'window' for event in windows)
+    assert done == {'type': 'done', 'windows': 3, 'failed_windows': 0,
+                    'measurement_counts': {'NDVI': 12, 'EVI': 12}}
+
+    # The windows add up to the non-streamed series
+    whole = client.post('/api/indices/timeseries', json=dict(AREA, index_names=['NDVI', 'EVI'], use_cache=False))
+    for name in ('NDVI', 'EVI'):
+        assert [point for event in windows for point in event['series'][name]] == whole.get_json()['series'][name]
+
+def test_stream_uses_server_sent_events_when_asked(client):
+    response = client.post('/api/indices/timeseries/stream', json=dict(AREA, index_name='NDVI', format='sse'))
+    assert response.mimetype == 'text/event-stream'
+    frames = response.get_data(as_text=True).split('\n\n')
+    assert frames[-1] == ''
+    frames = [frame.split('\n') for frame in frames[:-1]]
+    assert [frame[0] for frame in frames] == ['event: window'] * 3 + ['event: done']
+    assert all(frame[1].startswith('data: ') and len(frame) == 2 for frame in frames)
+    assert json.loads(frames[-1][1][len('data: '):])['windows'] == 3
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from geometry import canonicalize_polygon, polygon_hash
+from timeseries_cache import TimeSeriesCache
+
+FIELD = [[-93.098, 41.878], [-93.088, 41.878], [-93.088, 41.888], [-93.098, 41.888], [-93.098, 41.878]]
+TODAY = datetime(2025, 9, 1)
+
+def scene(scene_id, date, ndvi):
+    return {'id': scene_id, 'date': date, 'time_start': int(datetime.strptime(date, '%Y-%m-%d').timestamp() * 1000),
+            'values': {'NDVI': ndvi}}
+
+def test_polygon_hash_ignores_closing_vertex_orientation_and_start():
+    rotated = FIELD[2:-1] + FIELD[:2]
+    assert polygon_hash(FIELD) == polygon_hash(FIELD[:-1])
+    assert polygon_hash(FIELD) == polygon_hash(rotated)
+    assert polygon_hash(FIELD) == polygon_hash(list(reversed(FIELD)))
+    assert canonicalize_polygon(FIELD)[0] == [-93.098, 41.878]
+    assert polygon_hash(FIELD) != polygon_hash([[0, 0], [1, 0], [1, 1]])
+
+def test_sliding_window_only_fetches_delta():
+    cache = TimeSeriesCache(maxsize=10)
+    key = polygon_hash(FIELD)
+
+    assert cache.missing_ranges(key, ['NDVI'], '2025-06-01', '2025-07-01') == [('2025-06-01', '2025-07-01')]
+    cache.merge(key, ['NDVI'], [scene('a', '2025-06-05', 0.5), scene('b', '2025-06-20', 0.6)],
+                [('2025-06-01', '2025-07-01')], today=TODAY)
+
+    assert cache.missing_ranges(key, ['NDVI'], '2025-06-01', '2025-07-01') == []
+    assert cache.missing_ranges(key, ['NDVI'], '2025-06-10', '2025-07-15') == [('2025-07-01', '2025-07-15')]
+    assert cache.missing_ranges(key, ['NDVI'], '2025-05-20', '2025-07-15') == [
+        ('2025-05-20', '2025-06-01'), ('2025-07-01', '2025-07-15')]
+
+    cache.merge(key, ['NDVI'], [scene('c', '2025-07-03', 0.7)], [('2025-07-01', '2025-07-15')], today=TODAY)
+    scenes = cache.scenes(key, 'NDVI', '2025-06-10', '2025-07-15')
+    assert [s['id'] for s in scenes] == ['b', 'c']
+
+def test_unsettled_dates_are_not_marked_covered():
+    cache = TimeSeriesCache(maxsize=10)
+    cache.merge('k', ['NDVI'], [scene('a', '2025-08-30', 0.4)], [('2025-08-01', '2025-09-01')], today=TODAY)
+    assert cache.missing_ranges('k', ['NDVI'], '2025-08-01', '2025-09-01') == [('2025-08-27', '2025-09-01')]
+
+def test_multi_index_request_fetches_union_of_gaps():
+    cache = TimeSeriesCache(maxsize=10)
+    cache.merge('k', ['NDVI'], [], [('2025-06-01', '2025-07-01')], today=TODAY)
+    assert cache.missing_ranges('k', ['NDVI', 'EVI'], '2025-06-01', '2025-07-01') == [('2025-06-01', '2025-07-01')]
@@ -0,0 +1,88 @@
+import logging
+import queue
+
+import pytest
+from flask import Flask, jsonify
+
+import tracing
+from tracing import DroppingQueueHandler, log, span
+
+@pytest.fixture
+def emitted(monkeypatch):
+    records = []
+    monkeypatch.setattr(tracing, '_emit', lambda level, entry: records.append((level, entry)))
+    return records
+
+def make_app():
+    app = Flask(__name__)
+    tracing.init_app(app)
+
+    @app.route('/analysis')
+    def analysis():
+        with span('ee.getInfo', operation='getInfo'):
+            with span('ee.compute'):
+                pass
+        with span('ee.getInfo'):
+            pass
+        log('scenes', level='debug', count=3)
+        return jsonify({'ok': True})
+
+    @app.route('/broken')
+    def broken():
+        log('upstream_failed', level='error', error='boom')
+        return jsonify({'error': 'boom'}), 502
+
+    return app
+
+def test_request_id_is_echoed_or_generated(emitted):
+    client = make_app().test_client()
+    assert client.get('/analysis', headers={'X-Request-ID': 'abc-123'}).headers['X-Request-ID'] == 'abc-123'
+    generated = client.get('/analysis').headers['X-Request-ID']
+    assert len(generated) == 32
+
+def test_unsampled_fast_requests_are_not_written(monkeypatch, emitted):
+    monkeypatch.setattr(tracing, 'TRACE_SAMPLE_RATE', 0)
+    make_app().test_client().get('/analysis')
+    assert emitted == []
+
+def test_sampled_trace_nests_spans(monkeypatch, emitted):
+    monkeypatch.setattr(tracing, 'TRACE_SAMPLE_RATE', 1)
+    make_app().test_client().get('/analysis', headers={'X-Request-ID': 'r1'})
+
+    [(level, record)] = emitted
+    assert level == 'info'
+    assert record['request_id'] == 'r1' and record['route'] == '/analysis' and record['status'] == 200
+    assert [(s['name'], s['parent']) for s in record['spans']] == [('ee.getInfo', None), ('ee.compute', 0), ('ee.getInfo', None)]
+    assert record['spans'][0]['attrs'] == {'operation': 'getInfo'}
+    assert all(s['duration_ms'] >= 0 for s in record['spans'])
+    assert record['events'][0]['event'] == 'scenes' and record['events'][0]['count'] == 3
+
+def test_error_events_force_the_trace_out(monkeypatch, emitted):
+    monkeypatch.setattr(tracing, 'TRACE_SAMPLE_RATE', 0)
+    make_app().test_client().get('/broken')
+    [(level, record)] = emitted
+    assert level == 'error' and record['status'] == 502
+    assert record['events'][0]['event'] == 'upstream_failed'
+
+def test_server_timing_summarizes_spans(monkeypatch, emitted):
+    monkeypatch.setattr(tracing, 'TRACE_SERVER_TIMING', True)
+    header = make_app().test_client().get('/analysis').headers['Server-Timing']
+    names = [entry.split(';')[0] for entry in header.split(', ')]
+    assert names == ['ee.getInfo', 'ee.compute', 'total']
+    assert 'desc="2x"' in header.split(', ')[0]
+
+def test_server_timing_is_off_by_default(emitted):
+    assert 'Server-Timing' not in make_app().test_client().get('/analysis').headers
+
+def test_full_queue_drops_records():
+    handler = DroppingQueueHandler(queue.Queue(1))
+    record = logging.LogRecord('t', logging.INFO, __file__, 1, {'event': 'x'}, None, None)
+    handler.emit(record)
+    handler.emit(record)
+    assert handler.queue.qsize() == 1 and handler.dropped == 1
+
+def test_records_are_written_as_json_lines(capsys):
+    tracing.flush_logs()
+    log('background_refresh', level='info', fields=2)
+    tracing.flush_logs()
+    assert '"event":"background_refresh"' in capsys.readouterr().out
@@ -0,0 +1,89 @@
+import json
+import numpy as np
+import pytest
+
+from index_registry import BUILTIN_INDICES, EXPRESSION_BANDS, IndexRegistry, index_registry
+from vegetation_indices import compute_index, compute_indices, required_bands
+
+def reference_index(expression, bands, reflectance_scale=0.0001):
+    """Evaluate an expression string directly over NumPy arrays."""
+    namespace = {variable: bands[band].astype(np.float64) * reflectance_scale
+                 for variable, band in EXPRESSION_BANDS.items() if band in bands}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = eval(expression, {'__builtins__': {}}, namespace)
+    return np.where(np.isfinite(result), result, np.nan)
+
+def random_bands(shape, seed=0):
+    rng = np.random.default_rng(seed)
+    return {band: rng.integers(0, 10000, size=shape, dtype=np.uint16) for band in EXPRESSION_BANDS.values()}
+
+@pytest.mark.parametrize('index_name', sorted(index_registry.names()))
+def test_matches_formula_and_ee_expression(index_name):
+    bands = random_bands((37, 53))
+    compiled = index_registry.get(index_name)
+    # Chunk size smaller than, and not dividing, the array exercises chunk edges
+    result = compute_index(index_name, bands, chunk_size=100)
+    np.testing.assert_allclose(result, reference_index(compiled.formula, bands), rtol=1e-12, equal_nan=True)
+    np.testing.assert_allclose(result, reference_index(compiled.ee_expression, bands), rtol=1e-12, equal_nan=True)
+
+def test_mask_nodata_and_zero_denominator_become_nan():
+    bands = random_bands((4, 4), seed=1)
+    bands['B8'][0, 0] = 0
+    bands['B4'][0, 0] = 0          # NDVI 0 / 0
+    bands['B4'][0, 1] = 65535      # nodata
+    mask = np.ones((4, 4), dtype=bool)
+    mask[3, 3] = False             # cloud
+
+    ndvi = compute_index('NDVI', bands, mask=mask, nodata=65535)
+    assert np.isnan(ndvi[0, 0]) and np.isnan(ndvi[0, 1]) and np.isnan(ndvi[3, 3])
+    assert np.isfinite(ndvi).sum() == 13
+
+def test_multiple_indices_share_one_pass_and_only_need_their_bands():
+    bands = random_bands((8, 8), seed=2)
+    results = compute_indices(['NDVI', 'EVI', 'SR'], bands)
+    assert set(results) == {'NDVI', 'EVI', 'SR'}
+    assert required_bands('SR') == ['B4', 'B8']
+
+    only_red_nir = {band: bands[band] for band in ('B4', 'B8')}
+    np.testing.assert_array_equal(compute_index('NDVI', only_red_nir), results['NDVI'])
+    with pytest.raises(ValueError):
+        compute_index('MAVI', only_red_nir)
+
+def test_custom_index_registration():
+    registry = IndexRegistry(BUILTIN_INDICES)
+    compiled = registry.register({'id': 'CUSTOM', 'formula': '-(2 * 3 - NIR) ** 2 / (RE + 1)', 'name': 'Custom'})
+    assert compiled.bands == ['B5', 'B8']
+    assert registry.describe()['CUSTOM']['bands'] == ['B5', 'B8']
+
+    bands = random_bands((16, 16), seed=3)
+    result = compute_index('CUSTOM', bands, registry=registry, chunk_size=50)
+    np.testing.assert_allclose(result, reference_index(compiled.formula, bands), rtol=1e-12, equal_nan=True)
+
+    with pytest.raises(ValueError):
+        registry.register({'id': 'CUSTOM', 'formula': 'NIR'})
+    registry.register({'id': 'CUSTOM', 'formula': 'NIR'}, replace=True)
+    np.testing.assert_allclose(compute_index('CUSTOM', bands, registry=registry), bands['B8'] * 0.0001)
+
+@pytest.mark.parametrize('formula', [
+    '__import__("os").system("true")',
+    'NIR.real',
+    'abs(NIR)',
+    'NIR if R else B',
+    'THERMAL - R',
+    '2 * 3',
+    'NIR * (1 / 0)',
+    'NIR +'
+])
+def test_rejects_invalid_formulas(formula):
+    with pytest.raises(ValueError):
+        IndexRegistry().register({'id': 'BAD', 'formula': formula})
+
+def test_load_config_skips_bad_entries(tmp_path):
+    config = tmp_path / 'indices.json'
+    config.write_text(json.dumps([
+        {'id': 'CIRE', 'formula': 'NIR / RE - 1', 'name': 'Chlorophyll Index Red Edge'},
+        {'id': 'BROKEN', 'formula': 'NIR / TIR'}
+    ]))
+    registry = IndexRegistry(BUILTIN_INDICES)
+    assert registry.load_config(str(config)) == ['CIRE']
+    assert 'CIRE' in registry and 'BROKEN' not in registry
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from zonal_stats import ZonalStats, rasterize, reduce, reduce_many, reduce_values
+
+GRID_BOUNDS = [0.0, 0.0, 10.0, 10.0]
+GRID_SHAPE = (10, 10)  # one unit per pixel, row 0 at the top
+
+def test_fractional_edge_coverage():
+    # Covers columns 2..4.5 and rows 7..8 (from the top), so column 4 is half covered
+    mask = rasterize([[2, 2], [4.5, 2], [4.5, 3], [2, 3]], GRID_BOUNDS, GRID_SHAPE)
+    coverage = mask.to_array()
+    assert mask.covered_pixels == pytest.approx(2.5)
+    np.testing.assert_allclose(coverage[7, 2:5], [1.0, 1.0, 0.5])
+    assert coverage.sum() == pytest.approx(coverage[7].sum())
+
+def test_polygon_outside_grid_is_empty():
+    mask = rasterize([[20, 20], [21, 20], [21, 21]], GRID_BOUNDS, GRID_SHAPE)
+    assert mask.pixel_count == 0
+    stats = reduce(mask, np.ones((3,) + GRID_SHAPE))
+    assert np.isnan(stats['mean']).all() and (stats['count'] == 0).all()
+
+def test_weighted_mean_percentiles_and_counts_over_a_stack():
+    mask = rasterize([[2, 2], [4.5, 2], [4.5, 3], [2, 3]], GRID_BOUNDS, GRID_SHAPE)
+    stack = np.zeros((2,) + GRID_SHAPE)
+    stack[:, 7, 2:5] = [[1.0, 2.0, 4.0], [1.0, np.nan, 4.0]]
+
+    stats = reduce(mask, stack, percentiles=(0, 50, 100))
+    np.testing.assert_allclose(stats['mean'], [(1 + 2 + 4 * 0.5) / 2.5, (1 + 4 * 0.5) / 1.5])
+    np.testing.assert_array_equal(stats['count'], [3, 2])
+    np.testing.assert_allclose(stats['coverage'], [2.5, 1.5])
+    np.testing.assert_allclose(stats['p0'], [1.0, 1.0])
+    np.testing.assert_allclose(stats['p50'], [2.0, 1.0])
+    np.testing.assert_allclose(stats['p100'], [4.0, 4.0])
+
+    # A validity mask behaves like NaN
+    valid = np.ones(GRID_SHAPE, dtype=bool)
+    valid[7, 3] = False
+    masked = reduce(mask, stack[:1], valid=valid)
+    assert masked['mean'][0] == pytest.approx((1 + 4 * 0.5) / 1.5)
+
+def test_unweighted_percentiles_match_numpy():
+    rng = np.random.default_rng(0)
+    values = rng.random((4, 101))
+    values[1, ::7] = np.nan
+    stats = reduce_values(values, np.ones(101), percentiles=(10, 50, 90))
+    for percentile in (10, 50, 90):
+        expected = np.nanpercentile(values, percentile, axis=-1, method='inverted_cdf')
+        np.testing.assert_allclose(stats[f"p{percentile}"], expected)
+
+def test_reduce_many_matches_per_field_reduce():
+    rng = np.random.default_rng(1)
+    stack = rng.random((3, 64, 64))
+    stack[0, 10:20, 10:20] = np.nan
+    bounds = [0.0, 0.0, 64.0, 64.0]
+    fields = [
+        [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+        for x, y, w, h in rng.uniform([0, 0, 0.5, 0.5], [56, 56, 8, 8], size=(40, 4))
+    ]
+    fields.append([[100, 100], [101, 100], [101, 101]])  # off the grid
+    masks = [rasterize(field, bounds, (64, 64)) for field in fields]
+
+    batched = reduce_many(masks, stack)
+    for position, mask in enumerate(masks):
+        single = reduce(mask, stack, percentiles=None)
+        np.testing.assert_allclose(batched['mean'][:, position], single['mean'], equal_nan=True)
+        np.testing.assert_array_equal(batched['count'][:, position], single['count'])
+
+def test_masks_are_cached_per_polygon_and_grid():
+    zonal = ZonalStats()
+    field = [[2, 2], [4.5, 2], [4.5, 3], [2, 3]]
+    first = zonal.mask(field, GRID_BOUNDS, GRID_SHAPE)
+    assert zonal.mask(list(reversed(field)), GRID_BOUNDS, GRID_SHAPE) is first
+    assert zonal.mask(field, GRID_BOUNDS, (20, 20)) is not first
+    assert zonal.stats()['hits'] == 1
+
+def test_buffer_grows_the_mask_by_the_buffered_area():
+    # ~10 m pixels at the equator; a ~44 m square field buffered by 10 m like aoi.buffer(10)
+    bounds, shape = [0.0, 0.0, 0.0011, 0.0011], (11, 11)
+    field = [[0.0003, 0.0003], [0.0007, 0.0003], [0.0007, 0.0007], [0.0003, 0.0007]]
+    pixel_area = (0.0001 * 111320.0) * (0.0001 * 110574.0)
+    side_lng, side_lat = 0.0004 * 111320.0, 0.0004 * 110574.0
+
+    plain = rasterize(field, bounds, shape)
+    buffered = rasterize(field, bounds, shape, supersample=16, buffer_meters=10)
+    assert plain.covered_pixels * pixel_area == pytest.approx(side_lng * side_lat, rel=0.02)
+    expected = (side_lng + 20) * (side_lat + 20) - (4 - np.pi) * 100  # rounded corners
+    assert buffered.covered_pixels * pixel_area == pytest.approx(expected, rel=0.02)
+    assert set(plain.indices) < set(buffered.indices)
+
+    zonal = ZonalStats()
+    assert zonal.mask(field, bounds, shape, buffer_meters=10) is not zonal.mask(field, bounds, shape)
@@ -0,0 +1,129 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from cache import TTLCache
+
+# Sentinel-2 scenes can still be ingested for a few days after acquisition,
+# so coverage is only recorded up to this many days before today
+SETTLE_DAYS = 5
+
+TIMESERIES_CACHE_MAX_ENTRIES = int(os.getenv('TIMESERIES_CACHE_MAX_ENTRIES', '1024'))
+
+def _merge_ranges(ranges):
+    """Merge overlapping or touching [start, end) date ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class TimeSeriesCache:
+    """
+    Per-field, per-index cache of scene values with append-only extension.
+
+    Each entry stores the [start, end) date span that has been fetched from
+    Earth Engine together with every scene seen in that span, keyed by scene ID.
+    Dates are 'YYYY-MM-DD' strings, which compare correctly as text.
+
+    Args:
+        maxsize: Maximum number of (field, index) entries kept in memory
+    """
+
+    def __init__(self, maxsize=TIMESERIES_CACHE_MAX_ENTRIES):
+        self._entries = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def missing_ranges(self, field_key, index_names, start_date, end_date):
+        """
+        Date ranges that still need to be fetched to answer a request.
+
+        Args:
+            field_key: Canonical polygon hash plus pipeline variant
+            index_names: List of index names requested together
+            start_date: Inclusive start, 'YYYY-MM-DD'
+            end_date: Exclusive end, 'YYYY-MM-DD'
+
+        Returns:
+            Sorted list of non-overlapping (start, end) tuples, empty on a full hit
+        """
+        ranges = []
+        for index_name in index_names:
+            entry = self._entries.get((field_key, index_name))
+            if entry is None or entry['start'] is None:
+                ranges.append((start_date, end_date))
+                continue
+            if start_date < entry['start']:
+                ranges.append((start_date, entry['start']))
+            if end_date > entry['end']:
+                ranges.append((entry['end'], end_date))
+        return _merge_ranges(ranges)
+
+    def merge(self, field_key, index_names, scenes, fetched_ranges, today=None):
+        """
+        Merge freshly fetched scenes into the cache and extend coverage.
+
+        Args:
+            field_key: Canonical polygon hash plus pipeline variant
+            index_names: Index names that were fetched for every scene
+            scenes: List of dicts with 'id', 'date', 'time_start' and 'values'
+            fetched_ranges: The (start, end) ranges the scenes were fetched for
+            today: Optional datetime used to compute the settled cut-off
+        """
+        if not fetched_ranges:
+            return
+
+        settled_until = ((today or datetime.now()) - timedelta(days=SETTLE_DAYS)).strftime('%Y-%m-%d')
+
+        with self._lock:
+            for index_name in index_names:
+                key = (field_key, index_name)
+                entry = self._entries.get(key) or {'start': None, 'end': None, 'scenes': {}}
+
+                for scene in scenes:
+                    entry['scenes'][scene['id']] = {
+                        'date': scene['date'],
+                        'time_start': scene['time_start'],
+                        'value': (scene.get('values') or {}).get(index_name)
+                    }
+
+                spans = list(fetched_ranges)
+                if entry['start'] is not None:
+                    spans.append((entry['start'], entry['end']))
+                new_start = min(span[0] for span in spans)
+                new_end = min(max(span[1] for span in spans), settled_until)
+                if entry['start'] is not None:
+                    new_end = max(new_end, entry['end'])
+
+                # Only a gap-free span may be recorded as covered
+                if new_end > new_start and len(_merge_ranges(spans)) == 1:
+                    entry['start'], entry['end'] = new_start, new_end
+
+                self._entries.set(key, entry)
+
+    def scenes(self, field_key, index_name, start_date, end_date):
+        """
+        Cached scenes for one index within [start_date, end_date), oldest first.
+
+        Returns:
+            List of dicts with 'id', 'date', 'time_start' and 'value'; value may be None
+            when the scene had no valid pixels over the field
+        """
+        entry = self._entries.get((field_key, index_name))
+        if entry is None:
+            return []
+        with self._lock:
+            selected = [
+                dict(scene, id=scene_id)
+                for scene_id, scene in entry['scenes'].items()
+                if start_date <= scene['date'] < end_date
+            ]
+        return sorted(selected, key=lambda scene: (scene['time_start'] or 0, scene['id']))
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return self._entries.stats()
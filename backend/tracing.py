@@ -0,0 +1,267 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+from metrics import current_route, stage
+
+# ✅ Request tracing
+# Every request gets an ID (X-Request-ID, taken from the caller when given)
+# and a trace of nested spans around Earth Engine, Gemini and local work.
+# A sampled fraction of traces, plus every failed or slow request, is
+# written as one JSON line per request. Records go through a bounded queue
+# to a background thread, so a request never waits on stdout; when the
+# queue is full records are dropped and counted instead.
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.1'))
+TRACE_SLOW_MS = float(os.getenv('TRACE_SLOW_MS', '2000'))
+TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', '200'))
+TRACE_SERVER_TIMING = os.getenv('TRACE_SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+SERVER_TIMING_HEADER = 'Server-Timing'
+
+LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO, 'warning': logging.WARNING, 'error': logging.ERROR}
+
+logger = logging.getLogger('agriscope.trace')
+logger.setLevel(logging.DEBUG)
+logger.propagate = False
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking or raising."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Records carry a dict that is serialized on the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JSONLineFormatter(logging.Formatter):
+    def format(self, record):
+        entry = record.msg if isinstance(record.msg, dict) else {'message': record.getMessage()}
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+logger.addHandler(_handler)
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+def _start_listener():
+    """Start the writer thread, again after a fork since threads do not survive it."""
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JSONLineFormatter())
+        _listener = QueueListener(_handler.queue, output)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+def flush_logs():
+    """Write out every queued record (tests, shutdown)."""
+    global _listener_pid
+    with _listener_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+            _listener_pid = None
+
+atexit.register(flush_logs)
+
+def _emit(level, entry):
+    _start_listener()
+    logger.log(LEVELS[level], entry)
+
+class Trace:
+    """Spans and events recorded while serving one request."""
+
+    def __init__(self, request_id, route, method, sampled):
+        self.request_id = request_id
+        self.route = route
+        self.method = method
+        self.sampled = sampled
+        self.start = time.perf_counter()
+        self.spans = []
+        self.events = []
+        self.dropped_spans = 0
+        self.errors = 0
+        self._stack = []
+
+    def _offset_ms(self, at):
+        return round((at - self.start) * 1000, 2)
+
+    def open_span(self, name, attrs):
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped_spans += 1
+            return None
+        span = {
+            'name': name,
+            'parent': self._stack[-1] if self._stack else None,
+            'start_ms': self._offset_ms(time.perf_counter())
+        }
+        if attrs:
+            span['attrs'] = attrs
+        self.spans.append(span)
+        self._stack.append(len(self.spans) - 1)
+        return span
+
+    def close_span(self, span, error=None):
+        if span is None:
+            return
+        self._stack.pop()
+        span['duration_ms'] = round(self._offset_ms(time.perf_counter()) - span['start_ms'], 2)
+        if error is not None:
+            span['error'] = repr(error)
+
+    def add_event(self, level, event, fields):
+        if len(self.events) < TRACE_MAX_SPANS:
+            self.events.append(dict(fields, event=event, level=level, at_ms=self._offset_ms(time.perf_counter())))
+
+    def timing_summary(self):
+        """Total duration and call count per span name, in first-seen order."""
+        totals = {}
+        for span in self.spans:
+            total = totals.setdefault(span['name'], [0.0, 0])
+            total[0] += span.get('duration_ms', 0)
+            total[1] += 1
+        return totals
+
+    def record(self, status, duration_ms):
+        return {
+            'type': 'trace',
+            'time': datetime.now(timezone.utc).isoformat(),
+            'request_id': self.request_id,
+            'route': self.route,
+            'method': self.method,
+            'status': status,
+            'duration_ms': round(duration_ms, 2),
+            'sampled': self.sampled,
+            'spans': self.spans,
+            'events': self.events,
+            'dropped_spans': self.dropped_spans
+        }
+
+def current_trace():
+    return g.get('trace') if has_request_context() else None
+
+def request_id():
+    """ID of the current request, or None outside of one."""
+    trace = current_trace()
+    return trace.request_id if trace is not None else None
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a block as one stage of the current request.
+
+    The duration always feeds the per-stage latency histogram (metrics.stage);
+    inside a request it is also recorded in the trace, nested under the
+    enclosing span.
+    """
+    trace = current_trace()
+    opened = trace.open_span(name, attrs) if trace is not None else None
+    error = None
+    try:
+        with stage(name):
+            yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if trace is not None:
+            trace.close_span(opened, error)
+
+def log(event, level='info', **fields):
+    """
+    Record a structured event.
+
+    Inside a request the event is added to the trace and written with it;
+    'error' events also mark the trace so it is written whatever the
+    sampling decision. Outside a request, debug events are dropped and the
+    rest are written on their own.
+    """
+    trace = current_trace()
+    if trace is not None:
+        trace.add_event(level, event, fields)
+        if level == 'error':
+            trace.errors += 1
+        return
+    if level != 'debug':
+        _emit(level, dict(fields, type='event', event=event, level=level,
+                          time=datetime.now(timezone.utc).isoformat()))
+
+def server_timing(trace, total_ms):
+    """Server-Timing header value for a trace: one entry per span name plus the total."""
+    entries = [
+        f'{name};dur={duration:.1f};desc="{count}x"'
+        for name, (duration, count) in trace.timing_summary().items()
+    ]
+    entries.append(f'total;dur={total_ms:.1f}')
+    return ', '.join(entries)
+
+def init_app(app):
+    """Install request hooks that start, report and write traces."""
+
+    @app.before_request
+    def start_trace():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        # Keep caller IDs that are reasonably sized; otherwise make our own
+        rid = incoming if 0 < len(incoming) <= 128 else uuid.uuid4().hex
+        g.trace = Trace(rid, current_route(), request.method, random.random() < TRACE_SAMPLE_RATE)
+
+    @app.after_request
+    def add_trace_headers(response):
+        trace = current_trace()
+        if trace is None:
+            return response
+        response.headers[REQUEST_ID_HEADER] = trace.request_id
+        if TRACE_SERVER_TIMING:
+            response.headers[SERVER_TIMING_HEADER] = server_timing(
+                trace, (time.perf_counter() - trace.start) * 1000
+            )
+        g.trace_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_trace(error=None):
+        trace = g.pop('trace', None)
+        if trace is None:
+            return
+        duration_ms = (time.perf_counter() - trace.start) * 1000
+        status = 500 if error is not None else g.get('trace_status', 500)
+        if error is not None:
+            trace.add_event('error', 'unhandled_exception', {'error': repr(error)})
+        failed = error is not None or trace.errors or status >= 500
+        if trace.sampled or failed or duration_ms >= TRACE_SLOW_MS:
+            _emit('error' if failed else 'info', trace.record(status, duration_ms))
+
+def tracing_stats():
+    return {
+        'sample_rate': TRACE_SAMPLE_RATE,
+        'slow_ms': TRACE_SLOW_MS,
+        'server_timing': TRACE_SERVER_TIMING,
+        'queued_records': _handler.queue.qsize(),
+        'dropped_records': _handler.dropped
+    }
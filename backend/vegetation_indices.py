@@ -0,0 +1,97 @@
+import numpy as np
+
+from index_registry import EXPRESSION_BANDS, index_registry
+
+# Sentinel-2 L2A digital numbers -> surface reflectance, as in the EE pipeline
+REFLECTANCE_SCALE = 0.0001
+
+# Pixels per chunk; the scratch buffers for one chunk stay in L2 cache
+CHUNK_PIXELS = 1 << 16
+
+def required_bands(index_name):
+    """Sentinel-2 band names referenced by an index formula."""
+    return index_registry.get(index_name).bands
+
+def compute_indices(index_names, bands, mask=None, nodata=None, reflectance_scale=REFLECTANCE_SCALE,
+                    dtype=np.float64, chunk_size=CHUNK_PIXELS, registry=index_registry):
+    """
+    Evaluate vegetation indices locally over Sentinel-2 band arrays.
+
+    Each chunk of every band is converted to reflectance once and shared by
+    all requested indices, which run as compiled kernels from the index
+    registry. Invalid pixels (masked, nodata, non-finite input or a zero
+    denominator) come back as NaN, matching masked pixels in Earth Engine.
+
+    Args:
+        index_names: List of registered index names
+        bands: Dict of band name ('B2', 'B4', 'B8', ...) -> array, all the same shape
+        mask: Optional boolean array, True where the pixel is valid (e.g. cloud-free)
+        nodata: Optional raw band value marking missing pixels
+        reflectance_scale: Multiplier applied to raw band values; use 1.0 for reflectance input
+        dtype: Floating point type used for computation and output
+        chunk_size: Number of pixels processed per chunk
+        registry: IndexRegistry to compile formulas from
+
+    Returns:
+        Dict of index name -> array with the input shape
+    """
+    compiled = [registry.get(index_name) for index_name in index_names]
+
+    needed = registry.bands_for(index_names)
+    missing = [band for band in needed if band not in bands]
+    if missing:
+        raise ValueError(f"Missing bands for {index_names}: {missing}")
+
+    shape = np.shape(bands[needed[0]])
+    for band in needed:
+        if np.shape(bands[band]) != shape:
+            raise ValueError(f"Band {band} has shape {np.shape(bands[band])}, expected {shape}")
+    if mask is not None and np.shape(mask) != shape:
+        raise ValueError(f"Mask has shape {np.shape(mask)}, expected {shape}")
+
+    flat_bands = {band: np.ravel(bands[band]) for band in needed}
+    flat_mask = np.ravel(mask) if mask is not None else None
+    size = int(np.prod(shape))
+    outputs = {index.id: np.empty(size, dtype=dtype) for index in compiled}
+
+    chunk_size = max(1, min(chunk_size, size))
+    scaled = {band: np.empty(chunk_size, dtype=dtype) for band in needed}
+    scratch = [np.empty(chunk_size, dtype=dtype) for _ in range(max(index.scratch_buffers for index in compiled))]
+    valid = np.empty(chunk_size, dtype=bool)
+    invalid = np.empty(chunk_size, dtype=bool)
+    band_variables = {band: variable for variable, band in EXPRESSION_BANDS.items()}
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for start in range(0, size, chunk_size):
+            stop = min(start + chunk_size, size)
+            n = stop - start
+
+            chunk_valid = valid[:n]
+            chunk_invalid = invalid[:n]
+            if flat_mask is not None:
+                np.copyto(chunk_valid, flat_mask[start:stop])
+            else:
+                chunk_valid.fill(True)
+
+            for band in needed:
+                raw = flat_bands[band][start:stop]
+                if nodata is not None:
+                    np.not_equal(raw, nodata, out=chunk_invalid)
+                    chunk_valid &= chunk_invalid
+                np.multiply(raw, reflectance_scale, out=scaled[band][:n], casting='unsafe')
+
+            variables = {band_variables[band]: scaled[band][:n] for band in needed}
+            chunk_scratch = [buffer[:n] for buffer in scratch]
+            for index in compiled:
+                out = outputs[index.id][start:stop]
+                index.kernel(variables, out, chunk_scratch)
+                np.isfinite(out, out=chunk_invalid)
+                chunk_invalid &= chunk_valid
+                np.logical_not(chunk_invalid, out=chunk_invalid)
+                np.copyto(out, np.nan, where=chunk_invalid)
+
+    return {index_id: output.reshape(shape) for index_id, output in outputs.items()}
+
+def compute_index(index_name, bands, **kwargs):
+    """Evaluate a single vegetation index; see compute_indices for arguments."""
+    return compute_indices([index_name], bands, **kwargs)[index_name]
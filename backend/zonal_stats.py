@@ -0,0 +1,233 @@
+import os
+import math
+import numpy as np
+
+from cache import TTLCache
+from geometry import canonicalize_polygon, polygon_coverage, polygon_hash
+from metrics import cache_observer
+
+ZONAL_MASK_CACHE_SIZE = int(os.getenv('ZONAL_MASK_CACHE_SIZE', '4096'))
+
+# Sub-pixels per axis used to estimate edge coverage (1/16 steps)
+SUPERSAMPLE = 4
+
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+class ZonalMask:
+    """
+    Pixels of a grid touched by a polygon.
+
+    Attributes:
+        shape: (height, width) of the grid
+        indices: Flat (row * width + col) indices of every pixel with coverage > 0
+        weights: Fraction of each of those pixels inside the polygon
+    """
+
+    __slots__ = ('shape', 'indices', 'weights')
+
+    def __init__(self, shape, indices, weights):
+        self.shape = tuple(shape)
+        self.indices = indices
+        self.weights = weights
+
+    @property
+    def pixel_count(self):
+        return len(self.indices)
+
+    @property
+    def covered_pixels(self):
+        """Polygon area in pixels."""
+        return float(self.weights.sum())
+
+    def to_array(self):
+        """Dense coverage array of the grid shape."""
+        coverage = np.zeros(self.shape[0] * self.shape[1])
+        coverage[self.indices] = self.weights
+        return coverage.reshape(self.shape)
+
+def rasterize(coordinates, bounds, shape, supersample=SUPERSAMPLE, buffer_meters=0):
+    """
+    Rasterize a polygon onto a lng/lat grid with fractional edge coverage.
+
+    Only the window of the grid under the polygon's bounding box is
+    rasterized, so cost depends on the field size and not on the grid size.
+
+    Args:
+        coordinates: List of [lng, lat] pairs
+        bounds: Grid extent as [west, south, east, north]
+        shape: Grid size as (height, width); row 0 is the northern edge
+        supersample: Sub-pixels per axis for edge coverage
+        buffer_meters: Positive buffer around the polygon, as in the Earth
+            Engine pipeline's aoi.buffer()
+
+    Returns:
+        ZonalMask
+    """
+    west, south, east, north = bounds
+    height, width = shape
+    pixel_lng = (east - west) / width
+    pixel_lat = (north - south) / height
+
+    ring = canonicalize_polygon(coordinates)
+    lngs = [point[0] for point in ring]
+    lats = [point[1] for point in ring]
+    # Widen the bounding box by the buffer (plus 1% for the metric approximation)
+    pad_lat = buffer_meters * 1.01 / 110574.0
+    pad_lng = pad_lat * 110574.0 / (111320.0 * max(math.cos(math.radians(max(map(abs, lats)))), 1e-6))
+    col0 = max(0, int(math.floor((min(lngs) - pad_lng - west) / pixel_lng)))
+    col1 = min(width, int(math.ceil((max(lngs) + pad_lng - west) / pixel_lng)))
+    row0 = max(0, int(math.floor((north - max(lats) - pad_lat) / pixel_lat)))
+    row1 = min(height, int(math.ceil((north - min(lats) + pad_lat) / pixel_lat)))
+    if col0 >= col1 or row0 >= row1:
+        return ZonalMask(shape, np.empty(0, dtype=np.intp), np.empty(0))
+
+    window_bounds = [west + col0 * pixel_lng, north - row1 * pixel_lat, west + col1 * pixel_lng, north - row0 * pixel_lat]
+    coverage = polygon_coverage(coordinates, window_bounds, (row1 - row0, col1 - col0), supersample, buffer_meters)
+    rows, cols = np.nonzero(coverage)
+    indices = ((rows + row0) * width + (cols + col0)).astype(np.intp)
+    return ZonalMask(shape, indices, coverage[rows, cols])
+
+def gather(mask, stack):
+    """
+    Pick a mask's pixels out of a (..., height, width) stack.
+
+    Returns:
+        Array of shape (..., mask.pixel_count)
+    """
+    stack = np.asarray(stack)
+    if stack.shape[-2:] != mask.shape:
+        raise ValueError(f"Stack grid {stack.shape[-2:]} does not match mask grid {mask.shape}")
+    flat = stack.reshape(stack.shape[:-2] + (-1,))
+    return np.take(flat, mask.indices, axis=-1)
+
+def reduce_values(values, weights, percentiles=DEFAULT_PERCENTILES):
+    """
+    Coverage-weighted statistics over gathered pixel values.
+
+    Args:
+        values: Array of shape (..., pixels); NaN marks invalid pixels
+        weights: Coverage of each pixel, shape (pixels,)
+        percentiles: Percentiles to compute, or None/() to skip them
+
+    Returns:
+        Dict with 'mean', 'count' (valid pixels), 'coverage' (valid area in
+        pixels) and 'p<N>' per percentile, each of shape values.shape[:-1].
+        Statistics with no valid pixel are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    valid_weights = np.where(valid, weights, 0.0)
+    covered = valid_weights.sum(axis=-1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (np.where(valid, values, 0.0) * valid_weights).sum(axis=-1) / covered
+    mean = np.where(covered > 0, mean, np.nan)
+    result = {'mean': mean, 'count': valid.sum(axis=-1), 'coverage': covered}
+
+    if percentiles and values.shape[-1]:
+        # NaN sorts last, where its zero weight leaves the cumulative sum unchanged
+        order = np.argsort(values, axis=-1)
+        sorted_values = np.take_along_axis(values, order, axis=-1)
+        cumulative = np.cumsum(np.take_along_axis(valid_weights, order, axis=-1), axis=-1)
+        total = cumulative[..., -1:]
+        last_valid = np.maximum(result['count'][..., np.newaxis] - 1, 0)
+        for percentile in percentiles:
+            position = (cumulative < total * (percentile / 100.0)).sum(axis=-1, keepdims=True)
+            position = np.minimum(position, last_valid)
+            picked = np.take_along_axis(sorted_values, position, axis=-1)[..., 0]
+            result[f"p{percentile}"] = np.where(covered > 0, picked, np.nan)
+    elif percentiles:
+        for percentile in percentiles:
+            result[f"p{percentile}"] = np.full(values.shape[:-1], np.nan)
+    return result
+
+def reduce(mask, stack, valid=None, percentiles=DEFAULT_PERCENTILES):
+    """
+    Zonal statistics of one field over a (..., height, width) stack.
+
+    Args:
+        mask: ZonalMask for the stack's grid
+        stack: Values, e.g. (scene, row, col) index values; NaN is invalid
+        valid: Optional boolean array broadcastable to stack, False for masked pixels
+        percentiles: See reduce_values
+
+    Returns:
+        See reduce_values
+    """
+    values = gather(mask, stack).astype(np.float64)
+    if valid is not None:
+        values[~gather(mask, np.broadcast_to(valid, np.shape(stack)))] = np.nan
+    return reduce_values(values, mask.weights, percentiles)
+
+def reduce_many(masks, stack):
+    """
+    Coverage-weighted mean and valid-pixel count for many fields on one grid.
+
+    All fields are gathered in a single take and summed per field with
+    np.add.reduceat, so the per-field Python overhead is a few slices.
+
+    Args:
+        masks: List of ZonalMask on the stack's grid
+        stack: Array of shape (..., height, width); NaN is invalid
+
+    Returns:
+        Dict with 'mean', 'count' and 'coverage' of shape (..., len(masks))
+    """
+    stack = np.asarray(stack)
+    lead = stack.shape[:-2]
+    mean = np.full(lead + (len(masks),), np.nan)
+    count = np.zeros(lead + (len(masks),), dtype=np.int64)
+    covered = np.zeros(lead + (len(masks),))
+
+    nonempty = [position for position, mask in enumerate(masks) if mask.pixel_count]
+    if not nonempty:
+        return {'mean': mean, 'count': count, 'coverage': covered}
+
+    indices = np.concatenate([masks[position].indices for position in nonempty])
+    weights = np.concatenate([masks[position].weights for position in nonempty])
+    offsets = np.cumsum([0] + [masks[position].pixel_count for position in nonempty[:-1]])
+
+    values = np.take(stack.reshape(lead + (-1,)), indices, axis=-1).astype(np.float64)
+    valid = ~np.isnan(values)
+    valid_weights = np.where(valid, weights, 0.0)
+    np.copyto(values, 0.0, where=~valid)
+    values *= valid_weights
+
+    sums = np.add.reduceat(values, offsets, axis=-1)
+    field_covered = np.add.reduceat(valid_weights, offsets, axis=-1)
+    field_count = np.add.reduceat(valid, offsets, axis=-1, dtype=np.int64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        field_mean = np.where(field_covered > 0, sums / field_covered, np.nan)
+
+    mean[..., nonempty] = field_mean
+    count[..., nonempty] = field_count
+    covered[..., nonempty] = field_covered
+    return {'mean': mean, 'count': count, 'coverage': covered}
+
+class ZonalStats:
+    """
+    Cache of rasterized field masks, keyed by polygon, buffer and grid.
+
+    Args:
+        maxsize: Number of masks kept
+        supersample: Sub-pixels per axis for edge coverage
+    """
+
+    def __init__(self, maxsize=ZONAL_MASK_CACHE_SIZE, supersample=SUPERSAMPLE):
+        self.supersample = supersample
+        self._masks = TTLCache(maxsize=maxsize, on_lookup=cache_observer('zonal_masks'))
+
+    def mask(self, coordinates, bounds, shape, buffer_meters=0):
+        """Return the cached ZonalMask for a (buffered) polygon on a grid, rasterizing it on first use."""
+        key = (polygon_hash(coordinates), buffer_meters, tuple(round(float(edge), 9) for edge in bounds), tuple(shape))
+        mask, _ = self._masks.get_or_load(
+            key, lambda: rasterize(coordinates, bounds, shape, self.supersample, buffer_meters)
+        )
+        return mask
+
+    def reduce(self, coordinates, bounds, stack, valid=None, percentiles=DEFAULT_PERCENTILES):
+        """Zonal statistics for a polygon over a stack on the given grid; see reduce()."""
+        return reduce(self.mask(coordinates, bounds, np.shape(stack)[-2:]), stack, valid, percentiles)
+
+    def stats(self):
+        return self._masks.stats()
@@ -1,5 +1,4 @@
 import React, { useState } from 'react';
-import axios from 'axios';
 import { getFlaskApiUrl } from '../config/api';
 import '../styles/CropSuggestion.css';
 
@@ -34,19 +33,39 @@ const CropSuggestion = () => {
         setRecommendations(null);
 
         try {
-            const response = await axios.post(`${getFlaskApiUrl()}/api/crop-recommendations`, {
-                field_data: formData,
-                weather_data: null,
-                vegetation_data: null
+            // Sections arrive over Server-Sent Events as soon as Gemini finishes
+            // each one, so the first cards render long before the full answer
+            const response = await fetch(`${getFlaskApiUrl()}/api/crop-recommendations/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    field_data: formData,
+                    weather_data: null,
+                    vegetation_data: null
+                })
             });
 
-            if (response.data.status === 'success') {
-                setRecommendations(response.data.recommendations);
-            } else if (response.data.fallback) {
-                setRecommendations(response.data);
-                setError('AI service not available. Showing fallback recommendations.');
-            } else {
-                setError(response.data.error || 'Failed to get recommendations');
+            if (!response.ok) {
+                const body = await response.json().catch(() => ({}));
+                throw new Error(body.error || `Request failed with status ${response.status}`);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = '';
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffered += decoder.decode(value, { stream: true });
+                const messages = buffered.split('\n\n');
+                buffered = messages.pop();
+
+                for (const message of messages) {
+                    const dataLine = message.split('\n').find(line => line.startsWith('data: '));
+                    if (!dataLine) continue;
+                    handleStreamEvent(JSON.parse(dataLine.slice(6)));
+                }
             }
         } catch (err) {
             console.error('Error getting AI recommendations:', err);
@@ -56,6 +75,43 @@ const CropSuggestion = () => {
         }
     };
 
+    const handleStreamEvent = (event) => {
+        if (event.type === 'preliminary') {
+            // Locally ranked crops, shown until Gemini's first crop arrives
+            setRecommendations(previous => ({
+                ...(previous || {}),
+                recommended_crops: event.recommended_crops,
+                preliminary_crops: true
+            }));
+        } else if (event.type === 'section') {
+            setRecommendations(previous => ({ ...(previous || {}), [event.key]: event.value }));
+        } else if (event.type === 'crop') {
+            setRecommendations(previous => {
+                const preliminary = !previous || previous.preliminary_crops;
+                const crops = preliminary ? [] : [...(previous.recommended_crops || [])];
+                crops[event.index] = event.value;
+                return { ...(previous || {}), recommended_crops: crops, preliminary_crops: false };
+            });
+        } else if (event.type === 'done') {
+            const result = event.result;
+            if (result.status === 'success') {
+                setRecommendations(result.recommendations);
+            } else if (result.fallback || result.status === 'fallback') {
+                setRecommendations(result);
+                setError('AI service not available. Showing fallback recommendations.');
+            } else {
+                setError(result.error || 'Failed to get recommendations');
+            }
+        } else if (event.type === 'error') {
+            if (event.fallback) {
+                setRecommendations(event.fallback);
+                setError('AI service not available. Showing fallback recommendations.');
+            } else {
+                setError(event.error || 'Failed to get recommendations');
+            }
+        }
+    };
+
     const renderAnalysisSection = (title, data, icon) => {
         if (!data) return null;
 
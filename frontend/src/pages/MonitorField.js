@@ -606,19 +606,60 @@ const MonitorField = () => {
     try {
       setError("");
       setLoading(true);
-
-      const response = await axios.post(`${getFlaskApiUrl()}/api/indices/timeseries`, {
-        coordinates: geoJSON.coordinates[0],
-        start_date: startDate.toISOString().split("T")[0],
-        end_date: endDate.toISOString().split("T")[0],
-        index_name: selectedIndex,
+      setTimeSeriesData([]);
+
+      // Windows stream back as NDJSON records as soon as each one is reduced,
+      // so the chart can render before the whole range has been processed
+      const response = await fetch(`${getFlaskApiUrl()}/api/indices/timeseries/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          coordinates: geoJSON.coordinates[0],
+          start_date: startDate.toISOString().split("T")[0],
+          end_date: endDate.toISOString().split("T")[0],
+          index_name: selectedIndex,
+        }),
       });
 
-      setTimeSeriesData(response.data.time_series);
-      
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.error || `Request failed with status ${response.status}`);
+      }
+
       // Also fetch weather data
-      await fetchWeatherData();
-      
+      const weatherRequest = fetchWeatherData();
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = "";
+      let popupShown = false;
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split("\n");
+        buffered = lines.pop();
+
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const record = JSON.parse(line);
+          if (record.type === "window") {
+            const points = record.series[selectedIndex] || [];
+            setTimeSeriesData((previous) =>
+              [...previous, ...points].sort((a, b) => a.date.localeCompare(b.date))
+            );
+            if (!popupShown) {
+              popupShown = true;
+              setShowPopup(true);
+            }
+          } else if (record.type === "error") {
+            console.error(`Window ${record.start_date} to ${record.end_date} failed:`, record.error);
+          }
+        }
+      }
+
+      await weatherRequest;
       setShowPopup(true);
       showNotification(`${selectedIndex} time series data generated successfully`);
     } catch (err) {